@@ -0,0 +1,30 @@
+"""Add input_hash and model_version to risk_predictions
+
+Revision ID: 7c1e9a2b4d60
+Revises: 330156c9312a
+Create Date: 2026-10-17 09:12:40.512337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e9a2b4d60'
+down_revision: Union[str, None] = '330156c9312a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('risk_predictions', sa.Column('input_hash', sa.String(), nullable=True))
+    op.add_column('risk_predictions', sa.Column('model_version', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('risk_predictions', 'model_version')
+    op.drop_column('risk_predictions', 'input_hash')
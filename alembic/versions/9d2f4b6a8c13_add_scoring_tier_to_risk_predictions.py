@@ -0,0 +1,28 @@
+"""Add scoring_tier to risk_predictions
+
+Revision ID: 9d2f4b6a8c13
+Revises: 7c1e9a2b4d60
+Create Date: 2026-10-17 11:03:27.184905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2f4b6a8c13'
+down_revision: Union[str, None] = '7c1e9a2b4d60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('risk_predictions', sa.Column('scoring_tier', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('risk_predictions', 'scoring_tier')
@@ -0,0 +1,92 @@
+"""Add shap_importance and shap_units to risk_predictions
+
+Revision ID: a8c2e7f4b915
+Revises: f3a9d6e1b8c4
+Create Date: 2026-10-17 18:42:16.530871
+
+"""
+from collections import defaultdict
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c2e7f4b915'
+down_revision: Union[str, None] = 'f3a9d6e1b8c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Units of the stored explanations, frozen here rather than read from the app config:
+# screened rows were explained by the logistic regression screen (log-odds), the
+# others by the default random forest (probability). Deployments that served a phase
+# with a logistic regression can correct those rows' shap_units and then run
+# scripts/rebuild_shap_importance.py.
+LINEAR_SHAP_UNITS = "log_odds"
+TREE_SHAP_UNITS = "probability"
+
+
+def shap_units(scoring_tier):
+    return LINEAR_SHAP_UNITS if scoring_tier == "screen" else TREE_SHAP_UNITS
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('risk_predictions', sa.Column('shap_units', sa.String(), nullable=True))
+    shap_importance = op.create_table('shap_importance',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('phase', sa.String(), nullable=False),
+    sa.Column('risk_level', sa.String(), nullable=False),
+    sa.Column('units', sa.String(), nullable=False),
+    sa.Column('feature', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('sum_abs', sa.Float(), nullable=False),
+    sa.Column('sum_signed', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('phase', 'risk_level', 'units', 'feature', name='uq_shap_importance_bucket')
+    )
+    op.create_index(op.f('ix_shap_importance_id'), 'shap_importance', ['id'], unique=False)
+
+    # Stamp the explanations already stored and seed the aggregates from them
+    risk_predictions = sa.table(
+        'risk_predictions',
+        sa.column('model_phase', sa.String),
+        sa.column('risk_level', sa.String),
+        sa.column('scoring_tier', sa.String),
+        sa.column('shap_values', sa.JSON),
+        sa.column('shap_units', sa.String),
+    )
+    connection = op.get_bind()
+    explained = risk_predictions.c.shap_values.isnot(None)
+    connection.execute(
+        risk_predictions.update().where(explained)
+        .values(shap_units=sa.case((risk_predictions.c.scoring_tier == 'screen', LINEAR_SHAP_UNITS),
+                                   else_=TREE_SHAP_UNITS))
+    )
+    rows = connection.execute(
+        sa.select(risk_predictions.c.model_phase, risk_predictions.c.risk_level, risk_predictions.c.scoring_tier,
+                  risk_predictions.c.shap_values)
+        .where(explained)
+    ).fetchall()
+    totals = defaultdict(lambda: [0, 0.0, 0.0])
+    for phase, risk_level, scoring_tier, shap_values in rows:
+        units = shap_units(scoring_tier)
+        for feature, value in (shap_values or {}).items():
+            total = totals[(phase, risk_level, units, feature)]
+            total[0] += 1
+            total[1] += abs(value)
+            total[2] += value
+    if totals:
+        op.bulk_insert(shap_importance, [
+            {"phase": phase, "risk_level": risk_level, "units": units, "feature": feature,
+             "count": count, "sum_abs": sum_abs, "sum_signed": sum_signed}
+            for (phase, risk_level, units, feature), (count, sum_abs, sum_signed) in totals.items()
+        ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_shap_importance_id'), table_name='shap_importance')
+    op.drop_table('shap_importance')
+    op.drop_column('risk_predictions', 'shap_units')
@@ -0,0 +1,30 @@
+"""Add shap_mode and shap_error_bound to risk_predictions
+
+Revision ID: b4e8c1f07a25
+Revises: 9d2f4b6a8c13
+Create Date: 2026-10-17 13:41:09.627318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e8c1f07a25'
+down_revision: Union[str, None] = '9d2f4b6a8c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('risk_predictions', sa.Column('shap_mode', sa.String(), nullable=True))
+    op.add_column('risk_predictions', sa.Column('shap_error_bound', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('risk_predictions', 'shap_error_bound')
+    op.drop_column('risk_predictions', 'shap_mode')
@@ -0,0 +1,28 @@
+"""Add shap_pending to risk_predictions
+
+Revision ID: c7a3e5d91f48
+Revises: b4e8c1f07a25
+Create Date: 2026-10-17 15:22:51.903114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a3e5d91f48'
+down_revision: Union[str, None] = 'b4e8c1f07a25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('risk_predictions', sa.Column('shap_pending', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('risk_predictions', 'shap_pending')
@@ -0,0 +1,41 @@
+"""Add student_feature_vectors
+
+Revision ID: d1f6a9b3e2c7
+Revises: c7a3e5d91f48
+Create Date: 2026-10-17 17:05:33.418206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1f6a9b3e2c7'
+down_revision: Union[str, None] = 'c7a3e5d91f48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('student_feature_vectors',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('student_number', sa.String(), nullable=False),
+    sa.Column('phase', sa.String(), nullable=False),
+    sa.Column('preprocessing_version', sa.String(), nullable=False),
+    sa.Column('input_hash', sa.String(), nullable=False),
+    sa.Column('vector', sa.LargeBinary(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['student_number'], ['students.student_number'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('student_number', 'phase', 'preprocessing_version', name='uq_feature_vector_per_version')
+    )
+    op.create_index(op.f('ix_student_feature_vectors_id'), 'student_feature_vectors', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_student_feature_vectors_id'), table_name='student_feature_vectors')
+    op.drop_table('student_feature_vectors')
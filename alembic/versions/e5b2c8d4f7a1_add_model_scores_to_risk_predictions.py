@@ -0,0 +1,28 @@
+"""Add model_scores to risk_predictions
+
+Revision ID: e5b2c8d4f7a1
+Revises: d1f6a9b3e2c7
+Create Date: 2026-10-17 16:42:08.519302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b2c8d4f7a1'
+down_revision: Union[str, None] = 'd1f6a9b3e2c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('risk_predictions', sa.Column('model_scores', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('risk_predictions', 'model_scores')
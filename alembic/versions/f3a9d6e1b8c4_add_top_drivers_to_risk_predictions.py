@@ -0,0 +1,52 @@
+"""Add top_drivers to risk_predictions
+
+Revision ID: f3a9d6e1b8c4
+Revises: e5b2c8d4f7a1
+Create Date: 2026-10-17 18:05:51.307624
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9d6e1b8c4'
+down_revision: Union[str, None] = 'e5b2c8d4f7a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Matches the shap.top_drivers default in config.yaml
+TOP_DRIVERS = 5
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('risk_predictions', sa.Column('top_drivers', sa.JSON(), nullable=True))
+
+    # Summarise the explanations already stored
+    risk_predictions = sa.table(
+        'risk_predictions',
+        sa.column('id', sa.Integer),
+        sa.column('shap_values', sa.JSON),
+        sa.column('top_drivers', sa.JSON),
+    )
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(risk_predictions.c.id, risk_predictions.c.shap_values).where(risk_predictions.c.shap_values.isnot(None))
+    ).fetchall()
+    for row_id, shap_values in rows:
+        if not shap_values:
+            continue
+        ranked = sorted(shap_values.items(), key=lambda item: abs(item[1]), reverse=True)[:TOP_DRIVERS]
+        connection.execute(
+            risk_predictions.update()
+            .where(risk_predictions.c.id == row_id)
+            .values(top_drivers=[{"feature": feature, "value": float(value)} for feature, value in ranked])
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('risk_predictions', 'top_drivers')
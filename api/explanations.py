@@ -0,0 +1,225 @@
+import threading
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import update
+
+from db.models import Student, RiskPrediction
+from db.database import SessionLocal
+from models.utils.system.inference import explain_scored_students, get_served_version
+from models.utils.system.shap_explainer import top_drivers
+from models.utils.system.prediction import get_phase_features
+from models.utils.system.prediction_cache import hash_input
+from models.utils.system.model_config import get_shap_config, get_shap_units
+from api.feature_vectors import load_phase_vectors
+from api.shap_importance import prediction_contribution, update_shap_importance
+
+
+# === On-demand materialization ===
+def _student_dict(student) -> dict:
+    student_dict = student.__dict__.copy()
+    student_dict.pop("_sa_instance_state", None)
+    return student_dict
+
+def materialize_explanations(db, predictions: list, base_model_dir: str = "models/") -> int:
+    """
+    Computes SHAP values for the pending rows among `predictions`, one batched
+    explainer pass per phase, and clears their pending flag. The caller commits.
+
+    A row is only explained while its student's features still hash to the stored
+    input_hash and the served model still has the stored model_version, so an explanation
+    always describes the input and the model that produced the score. Rows whose student
+    or model changed since scoring stay pending until they are re-scored.
+
+    Every other row is claimed with a conditional UPDATE before it is explained, so when
+    several workers or on-read requests race for it, only the one that cleared the flag
+    explains it and applies its aggregate deltas; the others reload the winner's values.
+
+    Returns:
+        int: Number of rows explained.
+    """
+    # Id order: concurrent callers claim shared rows in the same order
+    pending = sorted((p for p in predictions if p.shap_pending), key=lambda p: p.id)
+    if not pending:
+        return 0
+
+    students = {
+        s.student_number: s for s in
+        db.query(Student).filter(Student.student_number.in_({p.student_number for p in pending})).all()
+    }
+
+    served_versions = {}
+    by_phase = defaultdict(list)
+    for prediction in pending:
+        student = students.get(prediction.student_number)
+        if student is None:
+            continue
+        student_dict = _student_dict(student)
+        phase = prediction.model_phase
+        if hash_input(student_dict, get_phase_features(phase, base_model_dir), phase) != prediction.input_hash:
+            continue
+        if phase not in served_versions:
+            served_versions[phase] = get_served_version(phase, base_model_dir)
+        if prediction.model_version != served_versions[phase]:
+            continue
+        by_phase[(phase, prediction.shap_mode or "exact")].append((prediction, student_dict))
+
+    claimed = {}
+    for key, members in by_phase.items():
+        members = [(prediction, student) for prediction, student in members if _claim_pending(db, prediction)]
+        if members:
+            claimed[key] = members
+    return _fill_explanations(db, claimed, base_model_dir, caller="materialize_explanations")
+
+def _claim_pending(db, prediction) -> bool:
+    """
+    Clears the row's pending flag only if it is still set. The row stays locked until the
+    caller commits, and a rollback hands it back to the other workers.
+    """
+    result = db.execute(
+        update(RiskPrediction)
+        .where(RiskPrediction.id == prediction.id, RiskPrediction.shap_pending == True)
+        .values(shap_pending=False)
+    )
+    if result.rowcount == 1:
+        return True
+    db.refresh(prediction)
+    return False
+
+def backfill_explanations(db, predictions: list, shap_mode: str = "exact", base_model_dir: str = "models/") -> int:
+    """
+    Computes SHAP values for legacy rows that were scored without an explanation and
+    are not pending (scripts/backfill_shap.py). Each row is explained on its own
+    model_phase and scoring tier in `shap_mode`. Such rows predate input_hash and
+    model_version, so unlike materialize_explanations nothing can be checked against
+    the score. Pending rows are left to materialize_explanations. The caller commits.
+
+    Returns:
+        int: Number of rows explained.
+    """
+    legacy = [p for p in predictions if p.shap_values is None and not p.shap_pending and p.model_phase]
+    if not legacy:
+        return 0
+
+    students = {
+        s.student_number: s for s in
+        db.query(Student).filter(Student.student_number.in_({p.student_number for p in legacy})).all()
+    }
+    by_phase = defaultdict(list)
+    for prediction in legacy:
+        student = students.get(prediction.student_number)
+        if student is not None:
+            by_phase[(prediction.model_phase, shap_mode)].append((prediction, _student_dict(student)))
+
+    return _fill_explanations(db, by_phase, base_model_dir, caller="backfill_explanations")
+
+def _fill_explanations(db, by_phase: dict, base_model_dir: str, caller: str) -> int:
+    """Explains each (phase, shap_mode) group of (prediction, student dict) pairs and writes the results."""
+    explained = 0
+    for (phase, shap_mode), members in by_phase.items():
+        rows = [prediction for prediction, _ in members]
+        students = [student for _, student in members]
+        vectors = load_phase_vectors(db, students, phase, base_model_dir)
+        results = explain_scored_students(students, phase, [p.scoring_tier for p in rows], base_model_dir,
+                                          shap_mode, vectors=vectors)
+        removed = [prediction_contribution(p) for p in rows]
+        for prediction, shap_dict, mode, error_bound in zip(rows, *results):
+            prediction.shap_values = shap_dict
+            prediction.top_drivers = top_drivers(shap_dict)
+            prediction.shap_mode = mode
+            prediction.shap_error_bound = error_bound
+            prediction.shap_units = get_shap_units(phase, prediction.scoring_tier)
+            prediction.shap_pending = False
+        update_shap_importance(db, removed, [prediction_contribution(p) for p in rows])
+        explained += len(rows)
+        print(f"[{caller}] Phase: {phase}, Explanations filled: {len(rows)}")
+
+    return explained
+
+
+# === Background materialization ===
+class ExplanationWorker:
+    """
+    Low-priority background thread that fills pending explanations.
+
+    It sweeps pending rows in id order in small batches, committing after each
+    batch, and sleeps once a sweep reaches the end. Bulk scoring therefore returns
+    immediately while explanations trickle in without monopolising the CPU or the
+    database, and rows that must stay pending never block the ones behind them.
+    """
+
+    def __init__(self, base_model_dir: str = "models/", batch_size: int = 32, interval_s: float = 2.0,
+                 session_factory=SessionLocal):
+        self.base_model_dir = base_model_dir
+        self.batch_size = max(1, int(batch_size))
+        self.interval_s = max(0.0, float(interval_s))
+        self.session_factory = session_factory
+        self.explained = 0
+        self._cursor = 0  # last prediction id looked at in the current sweep
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="explanation-worker", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def run_once(self) -> int:
+        """Explains one batch of pending rows. Returns how many were explained."""
+        db = self.session_factory()
+        try:
+            pending = (
+                db.query(RiskPrediction)
+                .filter(RiskPrediction.shap_pending == True, RiskPrediction.id > self._cursor)
+                .order_by(RiskPrediction.id.asc())
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            self._cursor = pending[-1].id if pending else 0
+            explained = materialize_explanations(db, pending, self.base_model_dir)
+            db.commit()
+            self.explained += explained
+            return explained
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[ExplanationWorker] ❌ {type(e).__name__}: {e}")
+                self._cursor = 0
+            # Go straight to the next batch mid-sweep, otherwise idle
+            if self._cursor == 0:
+                self._stop.wait(self.interval_s)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+_worker: Optional[ExplanationWorker] = None
+
+def start_explanation_worker(config: dict = None, base_model_dir: str = "models/") -> Optional[ExplanationWorker]:
+    """Starts the background worker unless shap.background_worker is false in config.yaml."""
+    global _worker
+    settings = get_shap_config(config)
+    if not settings.get("background_worker", True) or _worker is not None:
+        return _worker
+    _worker = ExplanationWorker(
+        base_model_dir,
+        batch_size=settings.get("background_batch_size", 32),
+        interval_s=settings.get("background_interval_s", 2.0)
+    ).start()
+    return _worker
+
+def stop_explanation_worker():
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker = None
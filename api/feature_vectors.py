@@ -0,0 +1,133 @@
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+from db.database import dialect_insert
+from db.models import StudentFeatureVector
+from models.utils.system.artifact_registry import get_preprocessing_version
+from models.utils.system.prediction import get_phase_features, prepare_phase_batch, select_phase
+from models.utils.system.prediction_cache import hash_input
+
+# Stored vectors are little-endian float32 in the phase model's feature order
+VECTOR_DTYPE = np.dtype("<f4")
+
+# Small refreshes look their students up by number; whole cohorts read the phase's vectors
+IN_CLAUSE_LIMIT = 500
+
+
+def pack_vector(row) -> bytes:
+    return np.asarray(row, dtype=VECTOR_DTYPE).tobytes()
+
+
+def unpack_vector(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=VECTOR_DTYPE)
+
+
+def load_phase_vectors(db, students: list, phase: str, base_model_dir: str = "models/", persist: bool = True) -> list:
+    """
+    Returns the preprocessed vector of each student for `phase` from the feature store.
+
+    A stored vector is reused only for the current preprocessing version and while the
+    student's raw inputs still hash to the stored input_hash. Missing or stale vectors are
+    preprocessed in one batch and upserted, replacing the student's vectors of other
+    preprocessing versions; the caller commits.
+
+    Args:
+        students (list[dict]): Student records exposing student_number and the phase features.
+        persist (bool): False for read-only callers: missing or stale vectors are computed
+            on the fly and the store is left untouched.
+
+    Returns:
+        list[np.ndarray]: One float32 vector per student, in model feature order.
+    """
+    version = get_preprocessing_version(phase, base_model_dir)
+    features = get_phase_features(phase, base_model_dir)
+    query = db.query(StudentFeatureVector).filter(
+        StudentFeatureVector.phase == phase,
+        StudentFeatureVector.preprocessing_version == version
+    )
+    if len(students) <= IN_CLAUSE_LIMIT:
+        query = query.filter(StudentFeatureVector.student_number.in_([s["student_number"] for s in students]))
+    # Vectors are upserted in SQL, so rows already in the session are re-read
+    stored = {entry.student_number: entry for entry in query.populate_existing().all()}
+
+    hashes = [hash_input(student, features, phase) for student in students]
+    stale = [
+        i for i, (student, input_hash) in enumerate(zip(students, hashes))
+        if stored.get(student["student_number"]) is None or stored[student["student_number"]].input_hash != input_hash
+    ]
+
+    vectors = {number: entry.vector for number, entry in stored.items()}
+    if stale:
+        _, preprocessed_df = prepare_phase_batch([(i, students[i]) for i in stale], phase, base_model_dir, caller="feature_store")
+        refreshed = []
+        for i, row in zip(stale, preprocessed_df.to_numpy()):
+            student_number = students[i]["student_number"]
+            vectors[student_number] = pack_vector(row)
+            refreshed.append({
+                "student_number": student_number, "phase": phase, "preprocessing_version": version,
+                "input_hash": hashes[i], "vector": vectors[student_number], "updated_at": datetime.now()
+            })
+        if persist:
+            _write_vectors(db, refreshed, phase, version)
+        print(f"[feature_store] Phase: {phase}, Vectors {'refreshed' if persist else 'computed'}: {len(stale)}/{len(students)}")
+
+    return [unpack_vector(vectors[student["student_number"]]) for student in students]
+
+
+def _write_vectors(db, rows: list, phase: str, version: str):
+    # Upserts, so concurrent refreshes of a student (bulk runs, the explanation worker,
+    # edits, uploads) never collide on the unique key
+    table = StudentFeatureVector.__table__.c
+    for start in range(0, len(rows), IN_CLAUSE_LIMIT):
+        stmt = dialect_insert(db, StudentFeatureVector).values(rows[start:start + IN_CLAUSE_LIMIT])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.student_number, table.phase, table.preprocessing_version],
+            set_={"input_hash": stmt.excluded.input_hash, "vector": stmt.excluded.vector,
+                  "updated_at": stmt.excluded.updated_at}
+        ))
+
+    # Vectors of other preprocessing versions are never read again
+    outdated = db.query(StudentFeatureVector).filter(
+        StudentFeatureVector.phase == phase,
+        StudentFeatureVector.preprocessing_version != version
+    )
+    if len(rows) <= IN_CLAUSE_LIMIT:
+        outdated = outdated.filter(StudentFeatureVector.student_number.in_([row["student_number"] for row in rows]))
+    outdated.delete(synchronize_session=False)
+
+
+def refresh_feature_vectors(db, students: list, base_model_dir: str = "models/") -> int:
+    """
+    Rebuilds the stored vectors of Student rows whose inputs changed, for the phase each
+    student is currently routed to, and drops their vectors of every other phase (a
+    student moved to a later phase is never read on the earlier one again). The caller commits.
+
+    Returns:
+        int: Number of students checked.
+    """
+    by_phase = defaultdict(list)
+    unrouted = []
+    for student in students:
+        student_dict = {k: v for k, v in student.__dict__.items() if k != "_sa_instance_state"}
+        try:
+            by_phase[select_phase(student_dict)].append(student_dict)
+        except ValueError:
+            unrouted.append(student_dict["student_number"])  # Not enough data for any phase yet
+
+    for phase, members in by_phase.items():
+        load_phase_vectors(db, members, phase, base_model_dir)
+        _drop_vectors(db, [s["student_number"] for s in members], keep_phase=phase)
+    _drop_vectors(db, unrouted)
+    return sum(len(members) for members in by_phase.values())
+
+
+def _drop_vectors(db, student_numbers: list, keep_phase: str = None):
+    for start in range(0, len(student_numbers), IN_CLAUSE_LIMIT):
+        query = db.query(StudentFeatureVector).filter(
+            StudentFeatureVector.student_number.in_(student_numbers[start:start + IN_CLAUSE_LIMIT])
+        )
+        if keep_phase is not None:
+            query = query.filter(StudentFeatureVector.phase != keep_phase)
+        query.delete(synchronize_session=False)
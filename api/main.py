@@ -1,5 +1,7 @@
 import os
 import time
+import asyncio
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 from fastapi import FastAPI, Request
@@ -11,6 +13,11 @@ from slowapi.util import get_remote_address
 
 from db.database import engine
 from db.models import Base
+from models.utils.system.warmup import warm_up, warmup_state
+from models.utils.system.inference_service import start_inference_service, stop_inference_service
+from models.utils.system.model_config import get_inference_config
+from models.utils.system.sidecar import SidecarError, get_sidecar_client
+from api.explanations import start_explanation_worker, stop_explanation_worker
 
 # === Routers ===
 from api.routes import (
@@ -30,8 +37,25 @@ ENV = os.getenv("ENV", "production")
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:8080')
 print("🌱 Loaded FRONTEND_URL from .env:", FRONTEND_URL)
 
+# === Model Warm-up ===
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if get_inference_config().get("sidecar_socket"):
+        # The sidecar owns the models and runs the explanation worker; /ready asks it for its state
+        yield
+        return
+    # Runs in the background so the health check answers while models load; /ready reports progress
+    warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    start_inference_service()
+    start_explanation_worker()
+    yield
+    stop_explanation_worker()
+    stop_inference_service()
+    if not warmup_task.done():
+        warmup_task.cancel()
+
 # === FastAPI App ===
-app = FastAPI(title="Early Dropout Prediction System", version="1.0")
+app = FastAPI(title="Early Dropout Prediction System", version="1.0", lifespan=lifespan)
 
 # === CORS Middleware ===
 app.add_middleware(
@@ -84,6 +108,25 @@ print(f"🌐 Allowed Frontend Origin: {FRONTEND_URL}")
 def root(request: Request):
     return {"message": "EDPS is live!"}
 
+# === Readiness Endpoint ===
+@app.get("/ready", tags=["Health"])
+def ready():
+    socket_path = get_inference_config().get("sidecar_socket")
+    if socket_path:
+        status = {"ready": False, "sidecar": socket_path}
+        client = get_sidecar_client()
+        if client is None:
+            status["error"] = "Inference sidecar socket not found."
+        else:
+            try:
+                status.update(client.status())
+            except (OSError, SidecarError) as e:
+                status["error"] = f"{type(e).__name__}: {e}"
+        return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+    status = {"ready": warmup_state.ready, **warmup_state.snapshot()}
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 
 from db.database import engine
 from db.models import Base
@@ -3,7 +3,7 @@
 from fastapi import UploadFile, File, APIRouter, Depends, HTTPException
 import pandas as pd
 from sqlalchemy.orm import Session
-from db.models import Student
+from db.models import Student, StudentFeatureVector
 from db.database import SessionLocal
 from api.schemas import StudentCreate, StudentUpdate
 from models.utils.system.prediction import predict_student
@@ -32,14 +32,17 @@ def wipe_students(db: Session = Depends(get_db)):
             detail=f"Cannot wipe students while {prediction_count} predictions exist. Please wipe predictions first."
         )
     
+    # Feature store rows reference their student
+    db.query(StudentFeatureVector).delete()
     db.query(Student).delete()
     db.commit()
     return {"message": "All student records deleted"}
 
 @router.delete("/dev/wipe-predictions")
 def wipe_predictions(db: Session = Depends(get_db)):
-    from db.models import RiskPrediction
+    from db.models import RiskPrediction, ShapImportance
 
     deleted = db.query(RiskPrediction).delete()
+    db.query(ShapImportance).delete()
     db.commit()
     return {"message": f"All {deleted} prediction records deleted"}
@@ -1,8 +1,9 @@
 # api/routes/prediction.py
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import and_, or_, not_
+from sqlalchemy.orm import Session, defer
+from typing import List, Optional
 from datetime import datetime
 import pandas as pd
 import io
@@ -10,9 +11,18 @@ from fastapi.responses import StreamingResponse
 
 from db.models import Student, RiskPrediction, Notification, User
 from db.database import SessionLocal
-from api.schemas import StudentCreate, StudentUpdate, RiskPredictionSchema
-from models.utils.system.prediction import predict_student
-from models.utils.system.shap_explainer import explain_student
+from api.schemas import StudentCreate, StudentUpdate, RiskPredictionSchema, RiskPredictionSummarySchema, WhatIfRequest, WhatIfRange
+from models.utils.system.inference import predict_and_explain_students, get_served_version, to_inference, score_what_if, check_what_if_size
+from models.utils.system.shap_explainer import validate_shap_mode, top_drivers
+from models.utils.system.model_config import get_shap_config, get_inference_config, get_shap_units
+from models.utils.system.prediction import get_phase_features
+from models.utils.system.prediction_cache import hash_input
+from models.utils.system.inference_service import get_inference_service
+from models.utils.system.sidecar import get_sidecar_client, SidecarError
+from api.explanations import materialize_explanations
+from api.feature_vectors import load_phase_vectors
+from api.shap_importance import RISK_LEVELS, prediction_contribution, update_shap_importance, get_shap_importance
+from models.feature_sets import PHASE_FIELDS
 
 router = APIRouter()
 
@@ -32,15 +42,168 @@ def get_risk_level(score: float) -> str:
     else:
         return "high"
 
-def predict_and_save(student, db, force_update=False, notify=True):
+def member_risk_scores(model_scores: Optional[dict]) -> Optional[dict]:
+    """Ensemble members' graduation probabilities as risk scores, like risk_score."""
+    if model_scores is None:
+        return None
+    return {family: 1 - probability for family, probability in model_scores.items()}
+
+def student_to_dict(student) -> dict:
     student_dict = student.__dict__.copy()
     student_dict.pop("_sa_instance_state", None)
+    return student_dict
+
+def phase_ready(phase: str):
+    """SQL form of the phase field check: every field the phase needs is present."""
+    return and_(*[getattr(Student, field).isnot(None) for field in PHASE_FIELDS[phase]])
+
+def phase_filter(phase: str):
+    """SQL predicate matching the students routed to `phase`: its fields are present and no more complete phase applies."""
+    more_complete = []
+    for candidate in PHASE_FIELDS:
+        if candidate == phase:
+            return and_(phase_ready(phase), *[not_(condition) for condition in more_complete])
+        more_complete.append(phase_ready(candidate))
+    raise ValueError(f"Unknown phase: {phase}")
+
+def fetch_phase_cohort(db, phase: str, base_model_dir: str = "models/") -> list:
+    """Loads the students routed to `phase`, selecting only student_number and that phase model's feature columns."""
+    columns = [Student.student_number] + [
+        getattr(Student, feature) for feature in get_phase_features(phase, base_model_dir) if feature in Student.__table__.c
+    ]
+    return db.query(*columns).filter(phase_filter(phase)).all()
+
+def resolve_bulk_shap_mode(shap_mode: Optional[str]) -> str:
+    """SHAP mode for a bulk job: the query parameter, else shap.bulk_mode from config.yaml."""
+    try:
+        return validate_shap_mode(shap_mode or get_shap_config().get("bulk_mode", "exact"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    raw_score, phase = predict_student(student_dict, return_phase=True)
-    risk_score = 1 - raw_score
+def unchanged_students(db, rows: list, phase: str, base_model_dir: str = "models/") -> set:
+    """Student numbers whose stored prediction for `phase` has the same input hash and model version."""
+    model_version = get_served_version(phase, base_model_dir)
+    stored = dict(db.query(RiskPrediction.student_number, RiskPrediction.input_hash).filter(
+        RiskPrediction.model_phase == phase,
+        RiskPrediction.model_version == model_version
+    ).all())
+    if not stored:
+        return set()
+    expected_features = get_phase_features(phase, base_model_dir)
+    return {
+        row.student_number for row in rows
+        if stored.get(row.student_number) == hash_input(row._asdict(), expected_features, phase)
+    }
+
+def dedup_summary(stats: dict) -> dict:
+    """Bulk summary of how many students were scored and how many distinct model inputs they shared."""
+    scored, unique = stats.get("scored_inputs", 0), stats.get("unique_inputs", 0)
+    return {"scored_inputs": scored, "unique_inputs": unique, "dedup_ratio": round(scored / unique, 2) if unique else 1.0}
+
+def resolve_bulk_lazy_shap(lazy_shap: Optional[bool]) -> bool:
+    """Whether a bulk job defers SHAP: the query parameter, else shap.lazy_bulk from config.yaml."""
+    return bool(get_shap_config().get("lazy_bulk", False)) if lazy_shap is None else lazy_shap
+
+def score_phase_batch(db, students: list, phase: str, base_model_dir: str = "models/", shap_mode: str = "exact",
+                      explain: bool = True):
+    """
+    Scores one phase cohort through the inference sidecar when one is configured, and
+    in-process from the feature store otherwise (or when the sidecar fails).
+
+    The sidecar gets the cohort in chunks of inference.sidecar_batch_size students, so
+    each frame is answered well within its timeout. If it fails midway, only the
+    students it has not answered yet are scored in-process.
+
+    Returns:
+        (list, dict): An (Inference, error) pair per student, and the dedup stats.
+    """
+    inferences, stats = [], {"scored_inputs": 0, "unique_inputs": 0}
+    client = get_sidecar_client()
+    if client is not None:
+        batch_size = max(1, int(get_inference_config().get("sidecar_batch_size", 256)))
+        try:
+            for start in range(0, len(students), batch_size):
+                chunk, chunk_stats = client.batch(students[start:start + batch_size], explain=explain,
+                                                  shap_mode=shap_mode, forced_phase=phase)
+                inferences.extend(chunk)
+                for key in stats:
+                    stats[key] += chunk_stats[key]
+        except (OSError, SidecarError) as e:
+            print(f"[score_phase_batch] ⚠️ Inference sidecar failed, scoring {len(students) - len(inferences)} students in-process: {e}")
+        students = students[len(inferences):]
+        if not students:
+            return inferences, stats
+
+    vectors = dict(enumerate(load_phase_vectors(db, students, phase, base_model_dir)))
+    results = predict_and_explain_students(students, base_model_dir, forced_phase=phase,
+                                           shap_mode=shap_mode, explain=explain, vectors=vectors)
+    inferences.extend((to_inference(result), None) for result in results.itertuples())
+    for key in stats:
+        stats[key] += results.attrs[key]
+    return inferences, stats
+
+def score_all_students(db, base_model_dir: str = "models/", skip_unchanged: bool = False, shap_mode: str = "exact",
+                       explain: bool = True, stats: Optional[dict] = None):
+    """
+    Scores and explains every student, one database query and one batched model pass per phase,
+    reading preprocessed inputs from the feature store (refreshed where stale; the caller commits).
+    Yields (student, inference, error) where student is a lightweight row exposing student_number.
+    With skip_unchanged, students whose features and model version match their stored
+    prediction are yielded with no inference and no error, and are not re-scored.
+    shap_mode selects exact or approximate SHAP for the whole job; with explain=False,
+    students are only scored and their inference carries no SHAP values.
+    If given, stats["scored_inputs"] and stats["unique_inputs"] are incremented per phase batch.
+    """
+    for phase in PHASE_FIELDS:
+        # Phases without students never touch their model artifacts
+        if db.query(Student.id).filter(phase_filter(phase)).first() is None:
+            continue
+        rows = fetch_phase_cohort(db, phase, base_model_dir)
+
+        if skip_unchanged:
+            unchanged = unchanged_students(db, rows, phase, base_model_dir)
+            for row in rows:
+                if row.student_number in unchanged:
+                    yield row, None, None
+            rows = [row for row in rows if row.student_number not in unchanged]
+            if not rows:
+                continue
+
+        students = [row._asdict() for row in rows]
+        inferences, batch_stats = score_phase_batch(db, students, phase, base_model_dir, shap_mode, explain)
+        if stats is not None:
+            for key in ("scored_inputs", "unique_inputs"):
+                stats[key] = stats.get(key, 0) + batch_stats[key]
+        for row, (inference, error) in zip(rows, inferences):
+            yield row, inference, error
+
+    unroutable = db.query(Student.student_number).filter(not_(or_(*[phase_ready(p) for p in PHASE_FIELDS]))).all()
+    for row in unroutable:
+        yield row, None, "Not enough data to make a prediction."
+
+def predict_and_save(student, db, force_update=False, notify=True, inference=None):
+    if inference is None:
+        client = get_sidecar_client()
+        if client is not None:
+            try:
+                inference = client.explain(student_to_dict(student))
+            except (OSError, SidecarError) as e:
+                print(f"[predict_and_save] ⚠️ Inference sidecar failed, scoring in-process: {e}")
+    if inference is None:
+        service = get_inference_service()
+        if service is not None:
+            # CPU-bound work runs in the process pool, coalesced with concurrent requests
+            inference = service.predict(student_to_dict(student))
+        else:
+            result = next(predict_and_explain_students([student_to_dict(student)]).itertuples())
+            if result.error:
+                raise ValueError(result.error)
+            inference = to_inference(result)
+    phase = inference.phase
+    risk_score = 1 - inference.probability
     risk_level = get_risk_level(risk_score)
-
-    shap_explanation = explain_student(student_dict)
+    model_scores = member_risk_scores(inference.model_scores)
+    shap_units = get_shap_units(phase, inference.scoring_tier) if inference.shap_values is not None else None
 
     existing = db.query(RiskPrediction).filter(
         RiskPrediction.student_number == student.student_number,
@@ -51,10 +214,21 @@ def predict_and_save(student, db, force_update=False, notify=True):
         return None
 
     if existing and force_update:
+        removed = [prediction_contribution(existing)]
         existing.risk_score = risk_score
         existing.risk_level = risk_level
         existing.timestamp = datetime.now()
-        existing.shap_values = shap_explanation
+        existing.shap_values = inference.shap_values
+        existing.top_drivers = top_drivers(inference.shap_values)
+        existing.input_hash = inference.input_hash
+        existing.model_version = inference.model_version
+        existing.scoring_tier = inference.scoring_tier
+        existing.shap_mode = inference.shap_mode
+        existing.shap_error_bound = inference.shap_error_bound
+        existing.shap_units = shap_units
+        existing.shap_pending = inference.shap_values is None
+        existing.model_scores = model_scores
+        update_shap_importance(db, removed, [prediction_contribution(existing)])
         return RiskPredictionSchema.model_validate(existing)
 
     new_pred = RiskPrediction(
@@ -63,9 +237,19 @@ def predict_and_save(student, db, force_update=False, notify=True):
         risk_level=risk_level,
         model_phase=phase,
         timestamp=datetime.now(),
-        shap_values=shap_explanation
+        shap_values=inference.shap_values,
+        top_drivers=top_drivers(inference.shap_values),
+        input_hash=inference.input_hash,
+        model_version=inference.model_version,
+        scoring_tier=inference.scoring_tier,
+        shap_mode=inference.shap_mode,
+        shap_error_bound=inference.shap_error_bound,
+        shap_units=shap_units,
+        shap_pending=inference.shap_values is None,
+        model_scores=model_scores
     )
     db.add(new_pred)
+    update_shap_importance(db, added=[prediction_contribution(new_pred)])
 
     # Send notification only if not in bulk mode
     if notify and risk_level in ["moderate", "high"]:
@@ -86,16 +270,21 @@ def predict_and_save(student, db, force_update=False, notify=True):
 # --- Endpoints ---
 
 @router.get("/predict/all")
-def bulk_predict_all_students(db: Session = Depends(get_db)):
-    students = db.query(Student).all()
+def bulk_predict_all_students(shap_mode: Optional[str] = Query(default=None), lazy_shap: Optional[bool] = Query(default=None),
+                              db: Session = Depends(get_db)):
+    shap_mode = resolve_bulk_shap_mode(shap_mode)
+    explain = not resolve_bulk_lazy_shap(lazy_shap)
     predictions = []
     skipped = []
     risk_summary = {"high": 0, "moderate": 0, "low": 0}
     last_phase = ""
+    stats = {}
 
-    for student in students:
+    for student, inference, error in score_all_students(db, shap_mode=shap_mode, explain=explain, stats=stats):
         try:
-            result = predict_and_save(student, db, force_update=False, notify=False)
+            if error:
+                raise ValueError(error)
+            result = predict_and_save(student, db, force_update=False, notify=False, inference=inference)
             if result:
                 predictions.append(result)
                 risk_summary[result.risk_level] += 1
@@ -121,19 +310,27 @@ def bulk_predict_all_students(db: Session = Depends(get_db)):
             ))
         db.commit()
 
-    return {"predictions": predictions, "skipped": skipped}
+    return {"predictions": predictions, "skipped": skipped, "summary": {**risk_summary, **dedup_summary(stats)}}
 
 @router.get("/predict/recalculate-all")
-def recalculate_all_predictions(db: Session = Depends(get_db)):
-    students = db.query(Student).all()
+def recalculate_all_predictions(shap_mode: Optional[str] = Query(default=None), lazy_shap: Optional[bool] = Query(default=None),
+                                db: Session = Depends(get_db)):
+    shap_mode = resolve_bulk_shap_mode(shap_mode)
+    explain = not resolve_bulk_lazy_shap(lazy_shap)
     updated = []
     skipped = []
     risk_summary = {"high": 0, "moderate": 0, "low": 0}
     last_phase = ""
+    stats = {}
 
-    for student in students:
+    for student, inference, error in score_all_students(db, skip_unchanged=True, shap_mode=shap_mode, explain=explain, stats=stats):
+        if inference is None and error is None:
+            skipped.append({"student_number": student.student_number, "note": "Prediction unchanged"})
+            continue
         try:
-            result = predict_and_save(student, db, force_update=True, notify=False)
+            if error:
+                raise ValueError(error)
+            result = predict_and_save(student, db, force_update=True, notify=False, inference=inference)
             if result:
                 updated.append(result)
                 risk_summary[result.risk_level] += 1
@@ -157,7 +354,7 @@ def recalculate_all_predictions(db: Session = Depends(get_db)):
             ))
         db.commit()
 
-    return {"predictions_updated_or_created": updated, "skipped": skipped}
+    return {"predictions_updated_or_created": updated, "skipped": skipped, "summary": {**risk_summary, **dedup_summary(stats)}}
 
 @router.get("/predict/by-number/{student_number}")
 def predict_by_student_number(student_number: str, recalculate: bool = Query(default=False), db: Session = Depends(get_db)):
@@ -172,10 +369,47 @@ def predict_by_student_number(student_number: str, recalculate: bool = Query(def
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/predictions")
+@router.post("/predict/what-if/{student_number}")
+def predict_what_if(student_number: str, request: WhatIfRequest, db: Session = Depends(get_db)):
+    """
+    Risk curve of a student over a grid of hypothetical feature values, scored in one
+    batch. Stateless: neither the student nor any prediction is written.
+    """
+    student = db.query(Student).filter(Student.student_number == student_number).first()
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    try:
+        # Bounded on the axis lengths first: ranges are only expanded once the grid is known to be small
+        check_what_if_size({
+            feature: values.size() if isinstance(values, WhatIfRange) else len(values)
+            for feature, values in request.overrides.items()
+        })
+        grid = {
+            feature: values.values() if isinstance(values, WhatIfRange) else values
+            for feature, values in request.overrides.items()
+        }
+        phase, model_version, curve = score_what_if(student_to_dict(student), grid)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    points = []
+    for point in curve.to_dict("records"):
+        risk_score = 1 - point.pop("probability")
+        points.append({"overrides": point, "risk_score": risk_score, "risk_level": get_risk_level(risk_score)})
+
+    return {"student_number": student_number, "model_phase": phase, "model_version": model_version, "points": points}
+
+@router.get("/predictions", response_model=List[RiskPredictionSummarySchema])
 def get_all_predictions(db: Session = Depends(get_db)):
-    predictions = db.query(RiskPrediction).order_by(RiskPrediction.timestamp.desc()).all()
-    return [RiskPredictionSchema.model_validate(p) for p in predictions]
+    # List view: top drivers only, the full SHAP vectors are never loaded
+    predictions = (
+        db.query(RiskPrediction)
+        .options(defer(RiskPrediction.shap_values))
+        .order_by(RiskPrediction.timestamp.desc())
+        .all()
+    )
+    return [RiskPredictionSummarySchema.model_validate(p) for p in predictions]
 
 @router.get("/predictions/{student_number}", response_model=List[RiskPredictionSchema])
 def get_predictions_for_student(student_number: str, db: Session = Depends(get_db)):
@@ -185,6 +419,9 @@ def get_predictions_for_student(student_number: str, db: Session = Depends(get_d
 
     if not predictions:
         raise HTTPException(status_code=404, detail="No predictions found for this student.")
+    # Explanations deferred by a lazy bulk run are computed on first read
+    if materialize_explanations(db, predictions):
+        db.commit()
     return [RiskPredictionSchema.model_validate(p) for p in predictions]
 
 @router.get("/download/predictions")
@@ -201,6 +438,38 @@ def download_predictions(db: Session = Depends(get_db)):
         "Content-Disposition": "attachment; filename=predictions.csv"
     })
 
+@router.get("/download/features/{phase}")
+def download_feature_vectors(phase: str, db: Session = Depends(get_db)):
+    """
+    Preprocessed model inputs of every student routed to `phase`, served from the feature store.
+    Read-only: vectors missing from the store or stale are computed for the response, not saved.
+    """
+    if phase not in PHASE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Unknown phase: {phase}")
+    students = [row._asdict() for row in fetch_phase_cohort(db, phase)]
+    vectors = load_phase_vectors(db, students, phase, persist=False) if students else []
+
+    df = pd.DataFrame(vectors, columns=get_phase_features(phase) if students else None)
+    df.insert(0, "student_number", [s["student_number"] for s in students])
+
+    stream = io.StringIO()
+    df.to_csv(stream, index=False)
+    stream.seek(0)
+
+    return StreamingResponse(stream, media_type="text/csv", headers={
+        "Content-Disposition": f"attachment; filename=features_{phase}.csv"
+    })
+
+@router.get("/insights/shap-importance")
+def get_cohort_shap_importance(phase: Optional[str] = Query(default=None), risk_level: Optional[str] = Query(default=None),
+                               db: Session = Depends(get_db)):
+    """Mean |SHAP| and mean signed SHAP per feature across the cohort, from the running aggregates, per SHAP units."""
+    if phase is not None and phase not in PHASE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Unknown phase: {phase}")
+    if risk_level is not None and risk_level not in RISK_LEVELS:
+        raise HTTPException(status_code=400, detail=f"Unknown risk level: {risk_level}")
+    return get_shap_importance(db, phase, risk_level)
+
 @router.get("/insights/risk-increase")
 def get_biggest_risk_increases(db: Session = Depends(get_db), limit: int = 5):
     from collections import defaultdict
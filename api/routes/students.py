@@ -1,6 +1,6 @@
 from fastapi import UploadFile, File, APIRouter, Depends, HTTPException, Query, Body, Request
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm import Session, aliased, defer
 from typing import List
 import pandas as pd
 import io
@@ -8,8 +8,11 @@ from sqlalchemy import func
 
 from db.models import Student, RiskPrediction
 from db.database import SessionLocal
-from api.schemas import StudentCreate, StudentUpdate, StudentSchema, RiskPredictionSchema
+from api.schemas import StudentCreate, StudentUpdate, StudentSchema, RiskPredictionSchema, RiskPredictionSummarySchema
+from api.explanations import materialize_explanations
+from api.feature_vectors import refresh_feature_vectors
 from models.utils.system.prediction import predict_student
+from models.utils.system.neighbor_index import find_similar_students
 
 router = APIRouter()
 
@@ -51,6 +54,13 @@ def update_student(student_number: str, updates: dict = Body(...), db: Session =
         setattr(student, key, value)
     db.commit()
     db.refresh(student)
+    try:
+        refresh_feature_vectors(db, [student])
+        db.commit()
+    except Exception as e:
+        # The store revalidates vectors on read, so a failed refresh only costs a later rebuild
+        db.rollback()
+        print(f"[update_student] ⚠️ Feature vector refresh failed: {e}")
     return {"message": "Student updated", "student": student.student_number}
 
 @router.get("/students/list")
@@ -119,6 +129,8 @@ def get_student_status(student_number: str, db: Session = Depends(get_db), reque
         .order_by(RiskPrediction.timestamp.desc())
         .first()
     )
+    if latest_prediction and materialize_explanations(db, [latest_prediction]):
+        db.commit()
 
     return {
         "student": StudentSchema.model_validate(student),
@@ -132,16 +144,43 @@ def get_student_history(student_number: str, db: Session = Depends(get_db), requ
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
+    # List view: top drivers only; full SHAP vectors come from /predictions/{student_number}
     predictions = (
         db.query(RiskPrediction)
+        .options(defer(RiskPrediction.shap_values))
         .filter(RiskPrediction.student_number == student_number)
         .order_by(RiskPrediction.timestamp.asc())
         .all()
     )
+    if materialize_explanations(db, predictions):
+        db.commit()
 
     return {
         "student": StudentSchema.model_validate(student),
-        "predictions": [RiskPredictionSchema.model_validate(p) for p in predictions]
+        "predictions": [RiskPredictionSummarySchema.model_validate(p) for p in predictions]
+    }
+
+@router.get("/students/{student_number}/similar")
+def get_similar_students(student_number: str, k: int = Query(None, ge=1, le=50), db: Session = Depends(get_db)):
+    """Returns the k most similar historical students and their outcomes, from the phase's neighbor index."""
+    student = db.query(Student).filter(Student.student_number == student_number).first()
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    student_dict = student.__dict__.copy()
+    student_dict.pop("_sa_instance_state", None)
+    try:
+        result = find_similar_students([student_dict], k=k).iloc[0]
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if result["error"]:
+        raise HTTPException(status_code=400, detail=result["error"])
+
+    return {
+        "student_number": student_number,
+        "phase": result["phase"],
+        "graduation_rate": result["graduation_rate"],
+        "neighbors": result["neighbors"]
     }
 
 @router.get("/students/distinct-values")
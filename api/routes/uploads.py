@@ -5,6 +5,7 @@ from db.database import SessionLocal
 import pandas as pd
 from io import StringIO
 from datetime import datetime
+from api.feature_vectors import refresh_feature_vectors
 
 router = APIRouter()
 
@@ -23,6 +24,7 @@ def upload_grades(file: UploadFile = File(...), db: Session = Depends(get_db)):
 
     updated = []
     skipped = []
+    updated_students = []
 
     for _, row in df.iterrows():
         student_number = row.get("student_number")
@@ -44,11 +46,20 @@ def upload_grades(file: UploadFile = File(...), db: Session = Depends(get_db)):
 
         if was_updated:
             updated.append(student_number)
+            updated_students.append(student)
         else:
             skipped.append(student_number)
 
     db.commit()
 
+    # New grades can move students to a later phase; rebuild their stored model inputs
+    try:
+        refresh_feature_vectors(db, updated_students)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[upload_grades] ⚠️ Feature vector refresh failed: {e}")
+
     # Send summary notification
     recipients = db.query(User).filter(User.role.in_(["admin", "advisor"]), User.is_active == True).all()
     message = f"Grades updated for {len(updated)} students. {len(skipped)} were skipped."
@@ -1,5 +1,6 @@
+import math
 from pydantic import BaseModel, EmailStr, field_validator, ConfigDict
-from typing import Optional, List, Literal
+from typing import Optional, List, Literal, Dict, Union
 from datetime import datetime
 
 # ===============================
@@ -97,17 +98,67 @@ class UserUpdateRequest(BaseModel):
 # 📊 RISK PREDICTION SCHEMA
 # ===============================
 
-class RiskPredictionSchema(BaseModel):
+class ShapDriver(BaseModel):
+    feature: str
+    value: float
+
+
+class RiskPredictionSummarySchema(BaseModel):
+    """List views: the top SHAP drivers only."""
     student_number: str
     risk_score: float
     risk_level: str
     model_phase: str
     timestamp: datetime
-    shap_values: Optional[dict] = None
+    top_drivers: Optional[List[ShapDriver]] = None
+    model_version: Optional[str] = None
+    scoring_tier: Optional[str] = None
+    shap_mode: Optional[str] = None
+    shap_error_bound: Optional[float] = None
+    shap_units: Optional[str] = None
+    shap_pending: bool = False
+    model_scores: Optional[dict] = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class RiskPredictionSchema(RiskPredictionSummarySchema):
+    """Detail views: the full SHAP vector as well."""
+    shap_values: Optional[dict] = None
+
+
+class WhatIfRange(BaseModel):
+    start: float
+    stop: float   # inclusive
+    step: float = 1.0
+
+    @field_validator("start", "stop", "step")
+    @classmethod
+    def finite(cls, v):
+        if not math.isfinite(v):
+            raise ValueError("range bounds and step must be finite")
+        return v
+
+    @field_validator("step")
+    @classmethod
+    def positive_step(cls, v):
+        if v <= 0:
+            raise ValueError("step must be positive")
+        return v
+
+    def size(self) -> int:
+        """Number of values, computed without building them."""
+        return max(math.floor((self.stop - self.start) / self.step + 1e-9) + 1, 0)
+
+    def values(self) -> List[float]:
+        return [round(self.start + i * self.step, 10) for i in range(self.size())]
+
+
+class WhatIfRequest(BaseModel):
+    # feature -> explicit values, or an evenly spaced range
+    overrides: Dict[str, Union[List[float], WhatIfRange]]
+
+
 # ===============================
 # 🔔 NOTIFICATION SCHEMAS
 # ===============================
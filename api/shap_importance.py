@@ -0,0 +1,120 @@
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import case
+
+from db.database import dialect_insert
+from db.models import RiskPrediction, ShapImportance
+
+RISK_LEVELS = ("low", "moderate", "high")
+
+
+# === Incremental maintenance ===
+def prediction_contribution(prediction) -> tuple:
+    """
+    The (phase, risk_level, units, shap_values) a prediction currently adds to the aggregates.
+    Units are the ones stored with the SHAP values, so a later model family change cannot
+    move a row's contribution to another bucket.
+    """
+    units = prediction.shap_units if prediction.shap_values else None
+    return prediction.model_phase, prediction.risk_level, units, prediction.shap_values
+
+
+def update_shap_importance(db, removed=(), added=()):
+    """
+    Applies explanation changes to the per-(phase, risk level, SHAP units, feature) running sums.
+    Log-odds (linear) and probability (tree) explanations are kept in separate buckets.
+    Call it whenever SHAP values are written or replaced, with the row's previous
+    contribution in `removed` and its new one in `added`; the caller commits.
+
+    Each bucket is changed with a single atomic INSERT ... ON CONFLICT DO UPDATE that
+    adds the deltas in SQL, so concurrent writers (bulk jobs, the explanation worker,
+    other API workers) neither lose updates nor collide creating the same bucket.
+
+    Args:
+        removed, added (iterable): (phase, risk_level, units, shap_values) tuples. Entries
+            without SHAP values (pending rows) contribute nothing.
+    """
+    deltas = defaultdict(lambda: [0, 0.0, 0.0])
+    for sign, contributions in ((-1, removed), (1, added)):
+        for phase, risk_level, units, shap_values in contributions:
+            for feature, value in (shap_values or {}).items():
+                delta = deltas[(phase, risk_level, units, feature)]
+                delta[0] += sign
+                delta[1] += sign * abs(value)
+                delta[2] += sign * value
+    deltas = {key: delta for key, delta in deltas.items() if delta != [0, 0.0, 0.0]}
+    if not deltas:
+        return
+
+    # Sorted keys: concurrent transactions lock shared buckets in the same order
+    stmt = dialect_insert(db, ShapImportance).values([
+        {"phase": phase, "risk_level": risk_level, "units": units, "feature": feature,
+         "count": count, "sum_abs": sum_abs, "sum_signed": sum_signed}
+        for (phase, risk_level, units, feature), (count, sum_abs, sum_signed) in sorted(deltas.items())
+    ])
+    table, new = ShapImportance.__table__.c, stmt.excluded
+    emptied = table.count + new.count <= 0
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.phase, table.risk_level, table.units, table.feature],
+        set_={
+            "count": table.count + new.count,
+            # Empty bucket: reset instead of keeping floating-point residue
+            "sum_abs": case((emptied, 0.0), else_=table.sum_abs + new.sum_abs),
+            "sum_signed": case((emptied, 0.0), else_=table.sum_signed + new.sum_signed),
+        }
+    )
+    db.execute(stmt)
+
+
+def rebuild_shap_importance(db) -> int:
+    """
+    Recomputes every aggregate from the stored explanations (scripts/rebuild_shap_importance.py),
+    e.g. after predictions were changed outside the API. The caller commits.
+
+    Returns:
+        int: Number of explained predictions aggregated.
+    """
+    db.query(ShapImportance).delete()
+    predictions = db.query(RiskPrediction).filter(RiskPrediction.shap_values.isnot(None)).all()
+    update_shap_importance(db, added=[prediction_contribution(p) for p in predictions])
+    return len(predictions)
+
+
+# === Queries ===
+def get_shap_importance(db, phase: Optional[str] = None, risk_level: Optional[str] = None) -> dict:
+    """
+    Cohort-level feature importance per phase: mean |SHAP| and mean signed SHAP of each
+    feature over the explained predictions, optionally restricted to one risk level.
+    Reads only the aggregate rows, so its cost does not grow with the cohort.
+
+    Explanations in different units are never averaged together: with the cascade on, a
+    phase reports its log-odds (screened) and probability (escalated) explanations apart.
+
+    Returns:
+        dict: phase -> units ("probability" or "log_odds") -> {"predictions", "features":
+            [{"feature", "mean_abs", "mean_signed"}, ...]}, features sorted by mean |SHAP|.
+    """
+    query = db.query(ShapImportance).filter(ShapImportance.count > 0)
+    if phase is not None:
+        query = query.filter(ShapImportance.phase == phase)
+    if risk_level is not None:
+        query = query.filter(ShapImportance.risk_level == risk_level)
+
+    # Levels are merged by summing their running sums
+    totals = defaultdict(lambda: defaultdict(lambda: [0, 0.0, 0.0]))
+    for row in query.all():
+        total = totals[(row.phase, row.units)][row.feature]
+        total[0] += row.count
+        total[1] += row.sum_abs
+        total[2] += row.sum_signed
+
+    result = defaultdict(dict)
+    for (row_phase, units), features in totals.items():
+        ranked = sorted(
+            ({"feature": feature, "mean_abs": sum_abs / count, "mean_signed": sum_signed / count}
+             for feature, (count, sum_abs, sum_signed) in features.items()),
+            key=lambda entry: entry["mean_abs"], reverse=True
+        )
+        result[row_phase][units] = {"predictions": max(count for count, _, _ in features.values()), "features": ranked}
+    return dict(result)
@@ -12,6 +12,14 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 print("✅ DATABASE_URL:", os.getenv("DATABASE_URL"))
 
+# INSERT supporting ON CONFLICT upserts for the session's database (PostgreSQL, or SQLite in tests)
+def dialect_insert(db, model):
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model)
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -1,7 +1,7 @@
 from datetime import datetime
 from sqlalchemy import (
     Column, Integer, Float, String, Boolean,
-    ForeignKey, DateTime, UniqueConstraint
+    ForeignKey, DateTime, UniqueConstraint, LargeBinary
 )
 from sqlalchemy.orm import relationship
 from db.database import Base
@@ -53,6 +53,15 @@ class RiskPrediction(Base):
     model_phase = Column(String, nullable=False)  # e.g. "early", "mid", "final"
     timestamp = Column(DateTime, default=lambda: datetime.now())
     shap_values = Column(JSON)
+    input_hash = Column(String, nullable=True)     # hash of the model input vector
+    model_version = Column(String, nullable=True)  # content hash of the phase artifacts
+    scoring_tier = Column(String, nullable=True)   # "full" / "ensemble", or "screen" / "escalated" in cascade mode
+    shap_mode = Column(String, nullable=True)      # "exact", "saabas" or "sampled"
+    shap_error_bound = Column(Float, nullable=True)  # max abs SHAP error vs exact on a calibration sample
+    shap_units = Column(String, nullable=True)     # "probability" or "log_odds", fixed when shap_values are written
+    shap_pending = Column(Boolean, default=False, nullable=False)  # scored without SHAP, explained later
+    model_scores = Column(JSON, nullable=True)     # ensemble member -> risk score, for disagreement monitoring
+    top_drivers = Column(JSON, nullable=True)      # top-k signed SHAP values, served by list endpoints
 
     # Relationships
     student = relationship("Student", back_populates="predictions")
@@ -62,6 +71,39 @@ class RiskPrediction(Base):
         UniqueConstraint('student_number', 'model_phase', name='uq_prediction_per_phase'),
     )
 
+# === Preprocessed Feature Vector Store ===
+class StudentFeatureVector(Base):
+    __tablename__ = "student_feature_vectors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_number = Column(String, ForeignKey("students.student_number"), nullable=False)
+    phase = Column(String, nullable=False)                  # e.g. "early", "mid", "final"
+    preprocessing_version = Column(String, nullable=False)  # hash of encoders, scaler and feature order
+    input_hash = Column(String, nullable=False)             # hash of the raw inputs the vector was built from
+    vector = Column(LargeBinary, nullable=False)            # little-endian float32, in model feature order
+    updated_at = Column(DateTime, default=lambda: datetime.now())
+
+    __table_args__ = (
+        UniqueConstraint('student_number', 'phase', 'preprocessing_version', name='uq_feature_vector_per_version'),
+    )
+
+# === Cohort SHAP Importance Aggregates ===
+class ShapImportance(Base):
+    __tablename__ = "shap_importance"
+
+    id = Column(Integer, primary_key=True, index=True)
+    phase = Column(String, nullable=False)       # e.g. "early", "mid", "final"
+    risk_level = Column(String, nullable=False)  # e.g. "low", "moderate", "high"
+    units = Column(String, nullable=False)       # "probability" (tree SHAP) or "log_odds" (linear SHAP)
+    feature = Column(String, nullable=False)
+    count = Column(Integer, default=0, nullable=False)         # explained predictions in the bucket
+    sum_abs = Column(Float, default=0.0, nullable=False)       # running sum of |SHAP|
+    sum_signed = Column(Float, default=0.0, nullable=False)    # running sum of signed SHAP
+
+    __table_args__ = (
+        UniqueConstraint('phase', 'risk_level', 'units', 'feature', name='uq_shap_importance_bucket'),
+    )
+
 # === User Model ===
 class User(Base):
     __tablename__ = "users"
@@ -11,6 +11,13 @@ FINAL_FIELDS = MID_FIELDS + [
     "curricular_units_2nd_sem_grade"
 ]
 
+# Phases from most to least complete; a student is scored by the first phase whose fields are all present
+PHASE_FIELDS = {
+    "final": FINAL_FIELDS,
+    "mid": MID_FIELDS,
+    "early": EARLY_FIELDS
+}
+
 RISK_THRESHOLDS = {
     "low": 0.4,
     "medium": 0.7
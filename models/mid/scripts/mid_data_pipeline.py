@@ -56,7 +56,8 @@ except Exception as e:
     sys.exit(1)
 
 try:
-    df = apply_mice_imputation(df, ["admission_grade", "previous_qualification_grade"])
+    df = apply_mice_imputation(df, ["admission_grade", "previous_qualification_grade"],
+                               kernel_path=os.path.join(ARTIFACTS_DIR, "mice_kernel.pkl"))
     print(f"📈 Imputed: {df.shape}")
 except Exception as e:
     print(f"Error during imputation: {e}")
@@ -48,7 +48,12 @@ train_result = train_random_forest(
     search_type="random",
     n_iter=30,
     cv=5,
-    early_stop_cv_score_threshold=0.7
+    early_stop_cv_score_threshold=0.7,
+    X_val_path=X_val_path,
+    y_val_path=y_val_path,
+    compress=True,
+    compression_metric="f1",
+    compression_tolerance=0.01
 )
 
 check_file_exists(model_path)
@@ -1,13 +1,17 @@
+import os
+import pickle
 import miceforest as mf
 import pandas as pd
 import numpy as np
 
-def apply_mice_imputation(combined_df, impute_columns, num_imputations=1, iterations=5):
+def apply_mice_imputation(combined_df, impute_columns, num_imputations=1, iterations=5, kernel_path=None):
     """
     Applies MICE imputation to the combined dataset on specified columns.
     - Validates columns and missing data
     - Converts data to float for compatibility
     - Applies miceforest MICE kernel and returns updated dataframe
+    - With kernel_path, fits a model for every column (even complete ones) and saves the
+      kernel there, so inference can fill the same gaps with impute_new_data
     """
 
     # ✅ Filter to only existing columns
@@ -24,7 +28,7 @@ def apply_mice_imputation(combined_df, impute_columns, num_imputations=1, iterat
     print("\n🔍 Missing Values Before Imputation:")
     print(missing_summary)
 
-    if total_missing == 0:
+    if total_missing == 0 and kernel_path is None:
         print("ℹ️ No missing values found. Skipping MICE imputation.")
         return combined_df
 
@@ -41,6 +45,7 @@ def apply_mice_imputation(combined_df, impute_columns, num_imputations=1, iterat
         kernel = mf.ImputationKernel(
             data=mice_input,
             num_datasets=num_imputations,
+            variable_schema=impute_columns if kernel_path else None,
             random_state=42
         )
         kernel.mice(iterations=iterations)
@@ -56,4 +61,11 @@ def apply_mice_imputation(combined_df, impute_columns, num_imputations=1, iterat
     # ✅ Update the original dataframe
     combined_df[impute_columns] = imputed_values
 
+    # ✅ Persist the fitted kernel for inference-time imputation
+    if kernel_path:
+        os.makedirs(os.path.dirname(kernel_path), exist_ok=True)
+        with open(kernel_path, "wb") as f:
+            pickle.dump(kernel, f)
+        print(f"✅ MICE kernel saved at: {kernel_path}")
+
     return combined_df
@@ -0,0 +1,220 @@
+import os
+import json
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+from models.utils.system.artifact_registry import (
+    ARRAYS_DIRNAME, ENCODERS_FILENAME, SCALER_FILENAME, FEATURE_NAMES_FILENAME, get_artifact_dir, get_manifest_path
+)
+from models.utils.system.model_config import MODEL_FILENAMES
+from models.utils.system.flat_forest import FlatForest, is_flattenable
+
+FORMAT_VERSION = 1
+
+
+class ArrayLabelEncoder:
+    """Read-only stand-in for a fitted LabelEncoder (classes_ and transform)."""
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+        self._codes = {cls: code for code, cls in enumerate(self.classes_.tolist())}
+
+    def transform(self, values) -> np.ndarray:
+        try:
+            return np.array([self._codes[v] for v in np.asarray(values).tolist()], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"y contains previously unseen labels: {e}")
+
+
+class ArrayStandardScaler:
+    """Read-only stand-in for a fitted StandardScaler (mean_, scale_ and transform)."""
+
+    def __init__(self, mean, scale, feature_names=None):
+        self.mean_ = mean
+        self.scale_ = scale
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    def transform(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            if hasattr(self, "feature_names_in_"):
+                X = X[list(self.feature_names_in_)]
+            X = X.to_numpy()
+        X = np.asarray(X, dtype=np.float64)
+        mean = np.zeros(X.shape[1]) if self.mean_ is None else self.mean_
+        scale = np.ones(X.shape[1]) if self.scale_ is None else self.scale_
+        return (X - mean) / scale
+
+
+class LinearModel:
+    """Read-only binary logistic regression rebuilt from its coefficients."""
+
+    def __init__(self, coef, intercept, classes, feature_names=None):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = np.asarray(classes)
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    def decision_function(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            X = X.to_numpy()
+        return np.asarray(X, dtype=np.float64) @ np.asarray(self.coef_)[0] + np.asarray(self.intercept_)[0]
+
+    def predict_proba(self, X) -> np.ndarray:
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack([1.0 - positive, positive])
+
+
+# === Export ===
+def _model_arrays(model) -> tuple:
+    """Splits a fitted model into (manifest entry, arrays)."""
+    feature_names = [str(f) for f in getattr(model, "feature_names_in_", [])] or None
+    if is_flattenable(model):
+        forest = FlatForest(model)
+        entry = {"type": "flat_forest", "max_depth": int(forest.max_depth)}
+        arrays = forest.to_arrays()
+    elif hasattr(model, "coef_") and np.asarray(model.coef_).shape[0] == 1:
+        entry = {"type": "linear"}
+        arrays = {"coef": np.asarray(model.coef_, dtype=np.float64), "intercept": np.asarray(model.intercept_, dtype=np.float64)}
+    else:
+        raise ValueError(f"Cannot export {type(model).__name__} to the array format.")
+    entry.update({"classes": np.asarray(model.classes_).tolist(), "feature_names": feature_names})
+    return entry, arrays
+
+
+def _write_arrays(arrays_dir: str, prefix: str, arrays: dict) -> dict:
+    files = {}
+    for name, array in arrays.items():
+        filename = f"{prefix}.{name}.npy"
+        path = os.path.join(arrays_dir, filename)
+        np.save(path, np.ascontiguousarray(array), allow_pickle=False)
+        with open(path, "rb") as f:
+            files[name] = {"file": filename, "sha256": hashlib.sha256(f.read()).hexdigest()}
+    return files
+
+
+def export_artifacts(model_dir: str, models: dict, encoders: dict = None, scaler=None, feature_names: list = None) -> str:
+    """
+    Writes models, encoders and scaler to the pickle-free array format.
+
+    Args:
+        model_dir (str): Phase artifact directory; files go to <model_dir>/arrays.
+        models (dict): Mapping of model family (e.g. "random_forest") to fitted model.
+        encoders (dict, optional): Mapping of column name to fitted LabelEncoder.
+        scaler (optional): Fitted StandardScaler.
+        feature_names (list, optional): Column names saved by preprocess_train.
+
+    Returns:
+        str: Path of the written manifest.
+    """
+    arrays_dir = os.path.join(model_dir, ARRAYS_DIRNAME)
+    os.makedirs(arrays_dir, exist_ok=True)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "models": {},
+        "encoders": None,
+        "scaler": None,
+        "feature_names": [str(f) for f in feature_names] if feature_names is not None else None,
+    }
+    for family, model in models.items():
+        entry, arrays = _model_arrays(model)
+        entry["arrays"] = _write_arrays(arrays_dir, family, arrays)
+        manifest["models"][family] = entry
+
+    if encoders is not None:
+        manifest["encoders"] = {col: np.asarray(le.classes_).tolist() for col, le in encoders.items()}
+
+    if scaler is not None:
+        arrays = {name: np.asarray(getattr(scaler, attr), dtype=np.float64)
+                  for name, attr in [("mean", "mean_"), ("scale", "scale_")] if getattr(scaler, attr, None) is not None}
+        names = getattr(scaler, "feature_names_in_", None)
+        manifest["scaler"] = {
+            "feature_names": [str(f) for f in names] if names is not None else None,
+            "arrays": _write_arrays(arrays_dir, "scaler", arrays),
+        }
+
+    # Manifest last, so readers never see a manifest pointing at missing arrays
+    path = get_manifest_path(model_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_phase_artifacts(phase: str, base_model_dir: str = "models/") -> str:
+    """
+    Converts the pickled artifacts of a phase (every servable model family present,
+    encoders, scaler and feature names) to the array format next to them.
+    """
+    model_dir = get_artifact_dir(phase, base_model_dir)
+
+    def read_pickle(filename):
+        path = os.path.join(model_dir, filename)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    models = {family: read_pickle(filename) for family, filename in MODEL_FILENAMES.items()}
+    models = {family: model for family, model in models.items() if model is not None}
+    if not models:
+        raise FileNotFoundError(f"No servable model found in {model_dir}")
+
+    return export_artifacts(
+        model_dir,
+        models,
+        encoders=read_pickle(ENCODERS_FILENAME),
+        scaler=read_pickle(SCALER_FILENAME),
+        feature_names=read_pickle(FEATURE_NAMES_FILENAME)
+    )
+
+
+# === Load (memory-mapped) ===
+def _verify_array(path: str, expected: str):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    if digest.hexdigest() != expected:
+        raise ValueError(f"Array file {path} does not match its manifest checksum. Re-export the phase artifacts.")
+
+
+def _load_arrays(model_dir: str, files: dict) -> dict:
+    """
+    Memory-maps the arrays of a manifest entry after checking them against their recorded
+    sha256. Callers go through the artifact registry, so each manifest version is checked once.
+    """
+    arrays_dir = os.path.join(model_dir, ARRAYS_DIRNAME)
+    arrays = {}
+    for name, info in files.items():
+        path = os.path.join(arrays_dir, info["file"])
+        _verify_array(path, info["sha256"])
+        # mmap_mode="r": pages come from the OS page cache and are shared by every worker on the host
+        arrays[name] = np.load(path, mmap_mode="r", allow_pickle=False)
+    return arrays
+
+
+def load_array_model(model_dir: str, manifest: dict, family: str):
+    entry = manifest["models"][family]
+    arrays = _load_arrays(model_dir, entry["arrays"])
+    if entry["type"] == "flat_forest":
+        return FlatForest.from_arrays(arrays, entry["classes"], entry["feature_names"], entry["max_depth"])
+    if entry["type"] == "linear":
+        return LinearModel(arrays["coef"], arrays["intercept"], entry["classes"], entry["feature_names"])
+    raise ValueError(f"Unknown array model type: {entry['type']}")
+
+
+def load_array_encoders(manifest: dict) -> dict:
+    return {col: ArrayLabelEncoder(classes) for col, classes in (manifest["encoders"] or {}).items()}
+
+
+def load_array_scaler(model_dir: str, manifest: dict):
+    entry = manifest["scaler"]
+    if entry is None:
+        return None
+    arrays = _load_arrays(model_dir, entry["arrays"])
+    return ArrayStandardScaler(arrays.get("mean"), arrays.get("scale"), entry["feature_names"])
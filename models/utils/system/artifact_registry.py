@@ -0,0 +1,246 @@
+import os
+import json
+import hashlib
+import pickle
+import threading
+from models.utils.system.model_config import SCORING_FILENAMES, get_model_family
+
+# === Artifact file names (shared by every phase) ===
+MODEL_FILENAME = "random_forest_model.pkl"
+ENCODERS_FILENAME = "label_encoders.pkl"
+SCALER_FILENAME = "scaler.pkl"
+FEATURE_NAMES_FILENAME = "feature_names.pkl"
+# Fitted miceforest kernel saved by apply_mice_imputation(kernel_path=...) in the phase data pipelines
+MICE_KERNEL_FILENAME = "mice_kernel.pkl"
+
+# Pickle-free export written by array_artifacts.export_artifacts
+ARRAYS_DIRNAME = "arrays"
+MANIFEST_FILENAME = "manifest.json"
+
+
+def get_artifact_dir(phase: str, base_model_dir: str = "models/") -> str:
+    return os.path.join(base_model_dir, phase, "artifacts")
+
+
+def get_manifest_path(model_dir: str) -> str:
+    return os.path.join(model_dir, ARRAYS_DIRNAME, MANIFEST_FILENAME)
+
+
+def _exported_source(model_dir: str, pickle_path: str, has_component) -> str:
+    """
+    Returns the array manifest path when it exports the component, and the pickle path
+    otherwise. A pickle written after the export (e.g. by retraining) wins, so a stale
+    export is never served.
+    """
+    manifest_path = get_manifest_path(model_dir)
+    manifest_signature = _file_signature(manifest_path)
+    if manifest_signature is None:
+        return pickle_path
+    pickle_signature = _file_signature(pickle_path)
+    if pickle_signature is not None and pickle_signature[0] > manifest_signature[0]:
+        return pickle_path
+    manifest = artifact_registry.load(manifest_path, loader=json.load)
+    return manifest_path if has_component(manifest) else pickle_path
+
+
+def get_model_path(phase: str, base_model_dir: str = "models/", family: str = None) -> str:
+    """
+    Path of the artifact backing a phase model (its array manifest when exported, else the
+    pickle), using the configured family unless one is given.
+    """
+    family = family or get_model_family(phase)
+    model_dir = get_artifact_dir(phase, base_model_dir)
+    pickle_path = os.path.join(model_dir, SCORING_FILENAMES[family])
+    return _exported_source(model_dir, pickle_path, lambda m: family in (m.get("models") or {}))
+
+
+def get_encoders_path(model_dir: str) -> str:
+    return _exported_source(model_dir, os.path.join(model_dir, ENCODERS_FILENAME), lambda m: m.get("encoders") is not None)
+
+
+def get_scaler_path(model_dir: str) -> str:
+    return _exported_source(model_dir, os.path.join(model_dir, SCALER_FILENAME), lambda m: m.get("scaler") is not None)
+
+
+def get_feature_names_path(model_dir: str) -> str:
+    return _exported_source(model_dir, os.path.join(model_dir, FEATURE_NAMES_FILENAME), lambda m: m.get("feature_names") is not None)
+
+
+def get_imputer_path(model_dir: str) -> str:
+    return os.path.join(model_dir, MICE_KERNEL_FILENAME)
+
+
+def _imputer_paths(model_dir: str) -> list:
+    # Optional artifact: phases trained without a persisted kernel keep 0-filling gaps
+    path = get_imputer_path(model_dir)
+    return [path] if os.path.isfile(path) else []
+
+
+def _is_manifest(path: str) -> bool:
+    return os.path.basename(path) == MANIFEST_FILENAME
+
+
+def _file_signature(path: str):
+    """
+    Returns (mtime_ns, size) for a file, or None when it cannot be stat'ed.
+    A None signature is never treated as fresh, so such files are always re-read.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class ArtifactRegistry:
+    """
+    Process-wide cache of unpickled model artifacts.
+
+    Each file is unpickled once and served from memory until its mtime or size
+    changes on disk. Artifacts exported to the array format are memory-mapped
+    instead, so every worker on a host shares the same physical pages. Objects derived from artifacts (explainers, compiled plans...)
+    can be cached alongside them and are rebuilt whenever one of their source files changes.
+    Safe to share between the threads of the FastAPI threadpool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = {}   # path -> (signature, value)
+        self._derived = {}   # key -> (signatures, value)
+
+    def _lock_for(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def load(self, path: str, loader=None):
+        """
+        Returns the unpickled content of `path`, reading the file only if it
+        was never loaded or has changed since the last load.
+        """
+        loader = loader or pickle.load
+        signature = _file_signature(path)
+        entry = self._entries.get(path)
+        if entry is not None and signature is not None and entry[0] == signature:
+            return entry[1]
+
+        with self._lock_for(("file", path)):
+            # Another thread may have finished loading while we waited
+            entry = self._entries.get(path)
+            if entry is not None and signature is not None and entry[0] == signature:
+                return entry[1]
+
+            with open(path, "rb") as f:
+                value = loader(f)
+            self._entries[path] = (signature, value)
+            return value
+
+    def derived(self, key, paths, factory):
+        """
+        Returns a cached object built by `factory()` from the artifacts in `paths`.
+        The object is rebuilt whenever any of those files changes on disk.
+        """
+        signatures = tuple(_file_signature(p) for p in paths)
+        fresh = all(s is not None for s in signatures)
+        entry = self._derived.get(key)
+        if entry is not None and fresh and entry[0] == signatures:
+            return entry[1]
+
+        with self._lock_for(("derived", key)):
+            entry = self._derived.get(key)
+            if entry is not None and fresh and entry[0] == signatures:
+                return entry[1]
+
+            value = factory()
+            self._derived[key] = (signatures, value)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._derived.clear()
+
+    # === Phase helpers ===
+    def _load_manifest(self, path: str) -> dict:
+        return self.load(path, loader=json.load)
+
+    def load_model(self, phase: str, base_model_dir: str = "models/", family: str = None):
+        family = family or get_model_family(phase)
+        path = get_model_path(phase, base_model_dir, family)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model not found at {path}")
+        if _is_manifest(path):
+            from models.utils.system.array_artifacts import load_array_model
+            model_dir = get_artifact_dir(phase, base_model_dir)
+            return self.derived(("array_model", path, family), [path],
+                                lambda: load_array_model(model_dir, self._load_manifest(path), family))
+        return self.load(path)
+
+    def load_encoders(self, model_dir: str) -> dict:
+        path = get_encoders_path(model_dir)
+        if _is_manifest(path):
+            from models.utils.system.array_artifacts import load_array_encoders
+            return self.derived(("array_encoders", path), [path], lambda: load_array_encoders(self._load_manifest(path)))
+        return self.load(path)
+
+    def load_scaler(self, model_dir: str):
+        path = get_scaler_path(model_dir)
+        if _is_manifest(path):
+            from models.utils.system.array_artifacts import load_array_scaler
+            return self.derived(("array_scaler", path), [path], lambda: load_array_scaler(model_dir, self._load_manifest(path)))
+        return self.load(path)
+
+    def load_feature_names(self, model_dir: str) -> list:
+        path = get_feature_names_path(model_dir)
+        if _is_manifest(path):
+            return self._load_manifest(path)["feature_names"]
+        return self.load(path)
+
+
+# Shared by prediction, SHAP and model-info code paths
+artifact_registry = ArtifactRegistry()
+
+
+def _hash_files(paths: list) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def get_model_version(phase: str, base_model_dir: str = "models/", family: str = None) -> str:
+    """
+    Content hash of everything that shapes a phase's output (model, scaler, encoders, imputer).
+    Identical artifacts give the same version across processes and deploys.
+    """
+    family = family or get_model_family(phase)
+    model_dir = get_artifact_dir(phase, base_model_dir)
+    paths = list(dict.fromkeys([
+        get_model_path(phase, base_model_dir, family),
+        get_scaler_path(model_dir),
+        get_encoders_path(model_dir),
+    ] + _imputer_paths(model_dir)))
+    return artifact_registry.derived(("model_version", model_dir, family), paths, lambda: _hash_files(paths))
+
+
+def get_preprocessing_version(phase: str, base_model_dir: str = "models/") -> str:
+    """
+    Content hash of what turns a student into a model input: the imputer, the encoders, the
+    scaler and the phase model's feature order. Stored preprocessed vectors are valid for one version.
+    """
+    model_dir = get_artifact_dir(phase, base_model_dir)
+    model_path = get_model_path(phase, base_model_dir)
+    paths = list(dict.fromkeys([get_encoders_path(model_dir), get_scaler_path(model_dir)] + _imputer_paths(model_dir)))
+
+    def compute():
+        features = list(artifact_registry.load_model(phase, base_model_dir).feature_names_in_)
+        digest = hashlib.sha256(_hash_files(paths).encode())
+        digest.update(json.dumps(features).encode())
+        return digest.hexdigest()[:16]
+
+    return artifact_registry.derived(("preprocessing_version", model_dir), paths + [model_path], compute)
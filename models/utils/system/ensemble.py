@@ -0,0 +1,105 @@
+import json
+import pickle
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from models.utils.system.artifact_registry import artifact_registry, get_model_version
+from models.utils.system.model_config import SCORING_FILENAMES, get_model_family, get_ensemble_config
+from models.utils.system.flat_forest import get_scoring_model
+
+# Members release the GIL in their NumPy / native predict code, so threads overlap them
+# without copying the matrix to other processes
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=len(SCORING_FILENAMES), thread_name_prefix="ensemble")
+        return _executor
+
+
+def get_ensemble_weights(ensemble: dict) -> dict:
+    """
+    Returns the configured member families with their weights normalised to sum to 1.
+
+    Raises:
+        ValueError: If a family is unknown or the weights are not positive.
+    """
+    weights = ensemble.get("weights") or {}
+    unknown = [family for family in weights if family not in SCORING_FILENAMES]
+    if unknown:
+        raise ValueError(f"Unsupported ensemble members {unknown}. Use any of: {list(SCORING_FILENAMES)}")
+    if not weights or any(weight < 0 for weight in weights.values()) or sum(weights.values()) <= 0:
+        raise ValueError("Ensemble weights must be non-negative and sum to a positive value.")
+    total = float(sum(weights.values()))
+    return {family: weight / total for family, weight in weights.items()}
+
+
+def get_ensemble_version(phase: str, base_model_dir: str, ensemble: dict) -> str:
+    """An ensemble result depends on every member model and on the weights."""
+    parts = [[family, get_model_version(phase, base_model_dir, family=family), weight]
+             for family, weight in get_ensemble_weights(ensemble).items()]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()[:16]
+
+
+def load_member(family: str, phase: str, base_model_dir: str = "models/"):
+    """
+    Loads one ensemble member's model for a phase.
+
+    Raises:
+        RuntimeError: If the member's artifact is missing or cannot be unpickled, e.g.
+            because its library (xgboost) is not installed.
+    """
+    try:
+        if family == get_model_family(phase):
+            return get_scoring_model(phase, base_model_dir)  # FlatForest for the served forest
+        return artifact_registry.load_model(phase, base_model_dir, family=family)
+    except (OSError, ImportError, pickle.UnpicklingError, AttributeError) as e:
+        raise RuntimeError(
+            f"Ensemble member '{family}' cannot be loaded for phase '{phase}' ({type(e).__name__}: {e}). "
+            f"Install its dependencies or remove it from model.ensemble.weights in config.yaml."
+        ) from e
+
+
+def check_ensemble_members(phase: str, base_model_dir: str = "models/", ensemble: dict = None):
+    """
+    Validates the weights and loads every member of an enabled ensemble, so warm-up fails
+    on a broken member with a clear message instead of the first scoring request.
+    """
+    ensemble = get_ensemble_config() if ensemble is None else ensemble
+    if not ensemble.get("enabled"):
+        return
+    for family in get_ensemble_weights(ensemble):
+        load_member(family, phase, base_model_dir)
+
+
+def _member_scores(family: str, phase: str, base_model_dir: str, preprocessed_df: pd.DataFrame) -> np.ndarray:
+    model = load_member(family, phase, base_model_dir)
+    columns = getattr(model, "feature_names_in_", None)
+    X = preprocessed_df[list(columns)] if columns is not None else preprocessed_df
+    return np.asarray(model.predict_proba(X)[:, 1], dtype=float)  # class 1 = Graduate
+
+
+def score_ensemble(preprocessed_df: pd.DataFrame, phase: str, base_model_dir: str, ensemble: dict):
+    """
+    Scores one preprocessed phase matrix with every ensemble member in parallel.
+
+    Returns:
+        (np.ndarray, dict): Weighted graduation probabilities, and family -> per-model
+            graduation probabilities.
+    """
+    weights = get_ensemble_weights(ensemble)
+    executor = _get_executor()
+    futures = {family: executor.submit(_member_scores, family, phase, base_model_dir, preprocessed_df)
+               for family in weights}
+    scores = {family: future.result() for family, future in futures.items()}
+
+    probabilities = np.zeros(len(preprocessed_df))
+    for family, weight in weights.items():
+        probabilities += weight * scores[family]
+    return probabilities, scores
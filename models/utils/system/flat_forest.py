@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+from models.utils.system.artifact_registry import artifact_registry, get_model_path
+
+class FlatForest:
+    """
+    A trained forest exported into contiguous node arrays for low-latency scoring.
+
+    All trees are laid out back to back (feature, threshold, children, leaf class
+    probabilities) and every row walks every tree at once with vectorized NumPy
+    indexing, one step per tree level. This skips sklearn's input validation and
+    joblib dispatch, which dominate the cost of scoring one or a few students.
+
+    Probabilities are bit-for-bit identical to RandomForestClassifier.predict_proba:
+    inputs are compared as float32 like sklearn, and per-tree probabilities are
+    summed in tree order before averaging.
+    """
+
+    def __init__(self, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError("FlatForest only supports single-output forests.")
+
+        self.classes_ = model.classes_
+        if hasattr(model, "feature_names_in_"):
+            self.feature_names_in_ = model.feature_names_in_
+        self.n_trees = len(trees)
+        self.max_depth = max(tree.max_depth for tree in trees)
+
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+        self.roots = offsets.astype(np.intp)
+
+        # === Node arrays (children re-indexed into the flat layout) ===
+        self.feature = np.concatenate([tree.feature for tree in trees]).astype(np.intp)
+        self.threshold = np.concatenate([tree.threshold for tree in trees])
+        left = np.concatenate([np.where(t.children_left < 0, -1, t.children_left + off) for t, off in zip(trees, offsets)])
+        right = np.concatenate([np.where(t.children_right < 0, -1, t.children_right + off) for t, off in zip(trees, offsets)])
+        missing_left = [getattr(tree, "missing_go_to_left", None) for tree in trees]
+        self.missing_go_to_left = np.concatenate([
+            m.astype(bool) if m is not None else np.zeros(tree.node_count, dtype=bool)
+            for m, tree in zip(missing_left, trees)
+        ])
+
+        # Leaves point back to themselves so extra traversal steps are no-ops
+        node_ids = np.arange(len(left), dtype=np.intp)
+        is_leaf = left < 0
+        self.left = np.where(is_leaf, node_ids, left).astype(np.intp)
+        self.right = np.where(is_leaf, node_ids, right).astype(np.intp)
+        self.feature[is_leaf] = 0
+
+        # === Leaf values, normalised the same way DecisionTreeClassifier.predict_proba does ===
+        values = np.concatenate([tree.value[:, 0, :] for tree in trees]).astype(np.float64)
+        normalizer = values.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        self.leaf_proba = values / normalizer
+        self.node_sample_weight = np.concatenate([tree.weighted_n_node_samples for tree in trees]).astype(np.float64)
+
+    # === Array form (see array_artifacts) ===
+    ARRAY_NAMES = ("roots", "feature", "threshold", "left", "right", "missing_go_to_left", "leaf_proba", "node_sample_weight")
+
+    def to_arrays(self) -> dict:
+        return {name: getattr(self, name) for name in self.ARRAY_NAMES}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, classes, feature_names=None, max_depth: int = None):
+        """
+        Rebuilds a FlatForest from its node arrays without copying them, so
+        memory-mapped arrays stay shared between processes.
+        """
+        forest = cls.__new__(cls)
+        for name in cls.ARRAY_NAMES:
+            setattr(forest, name, arrays[name])
+        forest.classes_ = np.asarray(classes)
+        if feature_names is not None:
+            forest.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        forest.n_trees = len(forest.roots)
+        forest.max_depth = max_depth
+        return forest
+
+    def to_shap_dict(self, trees=None) -> dict:
+        """
+        Returns the forest in the dictionary form accepted by shap.TreeExplainer,
+        matching what shap builds from the original RandomForestClassifier.
+        With `trees` (tree indices), only that subset is exported, averaged over its own size.
+        """
+        ends = list(self.roots[1:]) + [len(self.left)]
+        selected = range(self.n_trees) if trees is None else trees
+        shap_trees = []
+        for t in selected:
+            start, end = self.roots[t], ends[t]
+            local = np.arange(end - start)
+            left = np.asarray(self.left[start:end]) - start
+            right = np.asarray(self.right[start:end]) - start
+            is_leaf = left == local
+            left = np.where(is_leaf, -1, left)
+            right = np.where(is_leaf, -1, right)
+            shap_trees.append({
+                "children_left": left,
+                "children_right": right,
+                "children_default": np.where(np.asarray(self.missing_go_to_left[start:end]), left, right),
+                "features": np.where(is_leaf, -2, self.feature[start:end]),
+                "thresholds": np.where(is_leaf, -2.0, self.threshold[start:end]),
+                "values": np.asarray(self.leaf_proba[start:end]) / len(selected),
+                "node_sample_weight": np.asarray(self.node_sample_weight[start:end]),
+            })
+        return {
+            "trees": shap_trees,
+            "internal_dtype": np.float64,
+            "input_dtype": np.float32,
+            "tree_output": "probability",
+        }
+
+    @staticmethod
+    def _as_matrix(X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            X = X.to_numpy()
+        return np.asarray(X, dtype=np.float32)
+
+    def step(self, X: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        """Moves every (row, tree) cursor in `nodes` one level down; leaves stay put."""
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        values = X[rows, self.feature[nodes]]
+        go_left = values <= self.threshold[nodes]
+        missing = np.isnan(values)
+        if missing.any():
+            go_left = np.where(missing, self.missing_go_to_left[nodes], go_left)
+        return np.where(go_left, self.left[nodes], self.right[nodes])
+
+    def apply(self, X) -> np.ndarray:
+        """Returns the flat leaf index reached by every row in every tree, shape (n_rows, n_trees)."""
+        X = self._as_matrix(X)
+        nodes = np.repeat(self.roots[np.newaxis, :], X.shape[0], axis=0)
+        for _ in range(self.max_depth):
+            nodes = self.step(X, nodes)
+        return nodes
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.leaf_proba.shape[1]))
+        for t in range(self.n_trees):
+            proba += self.leaf_proba[leaves[:, t]]
+        proba /= self.n_trees
+        return proba
+
+def is_flattenable(model) -> bool:
+    estimators = getattr(model, "estimators_", None)
+    return isinstance(estimators, list) and bool(estimators) and all(hasattr(e, "tree_") for e in estimators)
+
+def get_scoring_model(phase: str, base_model_dir: str = "models/", model=None):
+    """
+    Returns the fastest scorer for a phase model: a cached FlatForest for tree
+    forests, or the model itself for anything else. Both expose predict_proba.
+    """
+    if model is None:
+        model = artifact_registry.load_model(phase, base_model_dir)
+    if not is_flattenable(model):
+        return model
+    model_path = get_model_path(phase, base_model_dir)
+    return artifact_registry.derived(("flat_forest", model_path), [model_path], lambda: FlatForest(model))
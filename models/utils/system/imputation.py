@@ -0,0 +1,58 @@
+import os
+import json
+import zlib
+import logging
+import numpy as np
+import pandas as pd
+from models.utils.system.artifact_registry import artifact_registry, get_imputer_path
+
+IMPUTATION_RANDOM_STATE = 42
+
+
+def load_imputer(model_dir: str):
+    """Returns the phase's persisted MICE kernel (unpickled once per file version), or None if there is none."""
+    path = get_imputer_path(model_dir)
+    if not os.path.isfile(path):
+        return None
+    return artifact_registry.load(path)
+
+
+def _record_seeds(values: pd.DataFrame) -> np.ndarray:
+    # Seeded by each record's own observed values: a student is imputed the same way in any batch
+    return np.array([zlib.crc32(json.dumps([None if pd.isna(v) else float(v) for v in row]).encode())
+                     for row in values.itertuples(index=False)], dtype=np.uint32)
+
+
+def impute_students(students: list, model_dir: str, caller: str = "impute_students") -> list:
+    """
+    Fills the gaps of a batch of student records in the columns imputed at training time,
+    with the persisted MICE kernel's models (no refitting). Only students with a gap are
+    run through miceforest, in a single impute_new_data call.
+
+    Returns:
+        list: The student records, copied and filled where needed. Unchanged when the phase
+            has no persisted kernel.
+    """
+    kernel = load_imputer(model_dir)
+    if kernel is None or not students:
+        return students
+
+    columns = list(kernel.column_names)
+    values = pd.DataFrame([{col: student.get(col) for col in columns} for student in students], columns=columns)
+    values = values.apply(pd.to_numeric, errors="coerce").astype(float)
+    gaps = np.flatnonzero(values.isna().any(axis=1).to_numpy())
+    if gaps.size == 0:
+        return students
+
+    missing = values.iloc[gaps].reset_index(drop=True)
+    imputed = kernel.impute_new_data(
+        missing,
+        random_state=IMPUTATION_RANDOM_STATE,
+        random_seed_array=_record_seeds(missing)
+    ).complete_data(0)
+
+    filled = list(students)
+    for position, row in zip(gaps, imputed.to_dict("records")):
+        filled[position] = {**students[position], **row}
+    logging.info(f"[{caller}] Imputed {gaps.size}/{len(students)} students with the MICE kernel")
+    return filled
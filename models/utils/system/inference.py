@@ -0,0 +1,324 @@
+import json
+import hashlib
+import itertools
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from typing import Optional
+from models.utils.system.prediction import group_by_phase, prepare_phase_batch, select_phase, get_phase_features, unique_rows
+from models.utils.system.artifact_registry import artifact_registry, get_model_version
+from models.utils.system.model_config import get_cascade_config, get_ensemble_config
+from models.utils.system.prediction_cache import prediction_cache, hash_input
+from models.utils.system.shap_explainer import (
+    explain_matrix, explanation_error_bound, effective_shap_mode, get_linear_explainer, validate_shap_mode
+)
+from models.utils.system.flat_forest import get_scoring_model
+from models.utils.system.ensemble import get_ensemble_version, score_ensemble
+
+# One scored and explained student, as persisted on RiskPrediction
+# (model_scores: family -> graduation probability of each ensemble member, None without the ensemble)
+Inference = namedtuple("Inference", [
+    "probability", "phase", "shap_values", "input_hash", "model_version", "scoring_tier", "shap_mode", "shap_error_bound",
+    "model_scores"
+])
+
+def to_inference(result) -> Inference:
+    """Builds an Inference from a row of predict_and_explain_students."""
+    return Inference(*(getattr(result, field) for field in Inference._fields))
+
+# === Cascade ===
+SCREEN_FAMILY = "logistic_regression"
+
+def needs_escalation(probabilities: np.ndarray, cascade: dict) -> np.ndarray:
+    """Students whose screened risk score is borderline or alert-worthy."""
+    risk = 1 - probabilities
+    low, high = cascade.get("uncertainty_band", [0.35, 0.65])
+    return ((risk >= low) & (risk <= high)) | (risk > cascade.get("alert_threshold", 0.5))
+
+def get_primary_version(phase: str, base_model_dir: str, ensemble: dict) -> str:
+    """Version of the full (non-screen) scorer: the ensemble when enabled, else the served model."""
+    if ensemble.get("enabled"):
+        return get_ensemble_version(phase, base_model_dir, ensemble)
+    return get_model_version(phase, base_model_dir)
+
+def get_cascade_version(phase: str, base_model_dir: str, cascade: dict, ensemble: Optional[dict] = None) -> str:
+    """A cascade result depends on both models and on the escalation settings."""
+    parts = [
+        get_model_version(phase, base_model_dir, family=SCREEN_FAMILY),
+        get_primary_version(phase, base_model_dir, ensemble or {}),
+        cascade.get("uncertainty_band", [0.35, 0.65]),
+        cascade.get("alert_threshold", 0.5)
+    ]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()[:16]
+
+def get_served_version(phase: str, base_model_dir: str = "models/", cascade: Optional[dict] = None,
+                       ensemble: Optional[dict] = None) -> str:
+    """Version stamped on predictions served for a phase, with or without the cascade and ensemble."""
+    cascade = get_cascade_config() if cascade is None else cascade
+    ensemble = get_ensemble_config() if ensemble is None else ensemble
+    if cascade.get("enabled"):
+        return get_cascade_version(phase, base_model_dir, cascade, ensemble)
+    return get_primary_version(phase, base_model_dir, ensemble)
+
+def _score_full(model, preprocessed_df: pd.DataFrame, phase: str, base_model_dir: str, ensemble: dict):
+    """
+    Scores rows with the served model, or with every ensemble member when enabled.
+
+    Returns:
+        (np.ndarray, list): Graduation probabilities, and per row the members' probabilities (None without ensemble).
+    """
+    if ensemble.get("enabled"):
+        probabilities, scores = score_ensemble(preprocessed_df, phase, base_model_dir, ensemble)
+        model_scores = [{family: float(values[i]) for family, values in scores.items()} for i in range(len(preprocessed_df))]
+        return probabilities, model_scores
+    scorer = get_scoring_model(phase, base_model_dir, model=model)
+    return scorer.predict_proba(preprocessed_df)[:, 1], [None] * len(preprocessed_df)  # class 1 = Graduate
+
+def _score_matrix(model, preprocessed_df: pd.DataFrame, phase: str, base_model_dir: str, cascade: dict,
+                  ensemble: Optional[dict] = None):
+    """
+    Scores a preprocessed phase matrix.
+
+    Returns:
+        (np.ndarray, list, list): Graduation probabilities, scoring tiers ("full" or "ensemble"
+            without cascade, otherwise "screen" or "escalated") and per-member probabilities.
+    """
+    ensemble = ensemble or {}
+    if not cascade.get("enabled"):
+        probabilities, model_scores = _score_full(model, preprocessed_df, phase, base_model_dir, ensemble)
+        tier = "ensemble" if ensemble.get("enabled") else "full"
+        return probabilities, [tier] * len(preprocessed_df), model_scores
+
+    # === Tier 1: linear screen for everyone ===
+    screen = artifact_registry.load_model(phase, base_model_dir, family=SCREEN_FAMILY)
+    probabilities = screen.predict_proba(preprocessed_df[list(screen.feature_names_in_)])[:, 1].astype(float)
+    tiers = ["screen"] * len(preprocessed_df)
+    model_scores = [None] * len(preprocessed_df)
+
+    # === Tier 2: served model (or ensemble) for borderline / alert students only ===
+    escalated = np.flatnonzero(needs_escalation(probabilities, cascade))
+    if escalated.size:
+        full, full_scores = _score_full(model, preprocessed_df.iloc[escalated], phase, base_model_dir, ensemble)
+        probabilities[escalated] = full
+        for i, scores in zip(escalated, full_scores):
+            tiers[i] = "escalated"
+            model_scores[i] = scores
+
+    print(f"[predict_and_explain] Phase: {phase}, Cascade escalated: {escalated.size}/{len(preprocessed_df)}")
+    return probabilities, tiers, model_scores
+
+def _explain_by_tier(model, preprocessed_df: pd.DataFrame, phase: str, base_model_dir: str, tiers: list,
+                     shap_mode: str = "exact"):
+    """
+    Explains each row with the model that scored it: the closed-form linear explainer for
+    screened rows and the served model's explainer (in `shap_mode`) for the others.
+
+    Returns:
+        (list, list, list): SHAP dicts, SHAP modes and error bounds.
+    """
+    explanations, modes, error_bounds = [None] * len(tiers), [None] * len(tiers), [None] * len(tiers)
+
+    screened = [i for i, tier in enumerate(tiers) if tier == "screen"]
+    if screened:
+        screen = artifact_registry.load_model(phase, base_model_dir, family=SCREEN_FAMILY)
+        screen_df = preprocessed_df.iloc[screened][list(screen.feature_names_in_)]
+        linear = get_linear_explainer(phase, base_model_dir, model=screen)
+        for i, shap_dict in zip(screened, explain_matrix(screen_df, phase, base_model_dir, explainer=linear)):
+            explanations[i], modes[i], error_bounds[i] = shap_dict, "exact", 0.0
+
+    served = [i for i, tier in enumerate(tiers) if tier != "screen"]
+    if served:
+        served_df = preprocessed_df.iloc[served]
+        served_mode = effective_shap_mode(model, shap_mode)
+        error_bound = explanation_error_bound(served_df, phase, base_model_dir, model=model, mode=shap_mode)
+        for i, shap_dict in zip(served, explain_matrix(served_df, phase, base_model_dir, model=model, mode=shap_mode)):
+            explanations[i], modes[i], error_bounds[i] = shap_dict, served_mode, error_bound
+
+    return explanations, modes, error_bounds
+
+def explain_scored_students(students: list, phase: str, tiers: list, base_model_dir: str = "models/",
+                            shap_mode: str = "exact", vectors: Optional[list] = None):
+    """
+    Computes the SHAP explanations deferred by predict_and_explain_students(explain=False)
+    for students already scored on `phase` with the given tiers, optionally from their
+    stored preprocessed vectors.
+
+    Returns:
+        (list, list, list): SHAP dicts, SHAP modes and error bounds, one per student.
+    """
+    validate_shap_mode(shap_mode)
+    members = list(enumerate(students))
+    model, preprocessed_df = prepare_phase_batch(members, phase, base_model_dir, caller="explain_scored_students",
+                                                 vectors=dict(enumerate(vectors)) if vectors is not None else None)
+    return _explain_by_tier(model, preprocessed_df, phase, base_model_dir, tiers, shap_mode)
+
+def predict_and_explain_students(students, base_model_dir: str = "models/", forced_phase: Optional[str] = None,
+                                 use_cache: bool = True, cascade: Optional[dict] = None,
+                                 shap_mode: str = "exact", explain: bool = True,
+                                 vectors: Optional[dict] = None, ensemble: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Scores and explains a batch of students from a single preprocessed matrix per phase.
+
+    The phase, aligned input and preprocessing are computed once and shared by
+    predict_proba and the SHAP explainer, so every explanation always belongs to
+    the model and phase that produced the score.
+
+    Args:
+        students (list[dict] or pd.DataFrame): Student records.
+        base_model_dir (str): Base path where model directories reside.
+        forced_phase (str, optional): Score every student with this phase, e.g. when
+            the cohort was already routed to a phase by the database query.
+        use_cache (bool): Reuse results memoized for an unchanged (input, model version) pair.
+        cascade (dict, optional): Cascade settings; defaults to model.cascade in config.yaml.
+        shap_mode (str): "exact", or "saabas" / "sampled" for faster approximate forest SHAP.
+        explain (bool): Compute SHAP values. Without, unexplained rows are left with no
+            "shap_values" and the requested "shap_mode", for explain_scored_students to fill later.
+        vectors (dict, optional): Stored preprocessed rows keyed like the input, used instead
+            of preprocessing when every student of a phase group has one.
+        ensemble (dict, optional): Ensemble settings; defaults to model.ensemble in config.yaml.
+            SHAP values keep explaining the phase's served model.
+
+    Returns:
+        pd.DataFrame: One row per student (same index as the input) with the Inference
+            columns ("probability", "shap_values", "phase", "input_hash", "model_version",
+            "scoring_tier", "shap_mode", "shap_error_bound", "model_scores") and "error". results.attrs
+            holds "scored_inputs" (students not served from cache) and "unique_inputs"
+            (distinct preprocessed rows actually run through the model and explainer).
+    """
+    cascade = get_cascade_config() if cascade is None else cascade
+    ensemble = get_ensemble_config() if ensemble is None else ensemble
+    validate_shap_mode(shap_mode)
+
+    # === Group Students by Phase ===
+    select = (lambda student: forced_phase) if forced_phase else select_phase
+    columns = [field for field in Inference._fields if field != "phase"]
+    results, groups = group_by_phase(students, columns, select=select)
+    results.attrs.update(scored_inputs=0, unique_inputs=0)
+
+    # === Score and Explain Each Phase Group ===
+    for phase, members in groups.items():
+        expected_features = get_phase_features(phase, base_model_dir)
+        model_version = get_served_version(phase, base_model_dir, cascade, ensemble)
+
+        misses = []
+        for idx, student in members:
+            input_hash = hash_input(student, expected_features, phase)
+            results.at[idx, "phase"] = phase
+            results.at[idx, "input_hash"] = input_hash
+            results.at[idx, "model_version"] = model_version
+
+            cached = prediction_cache.get((input_hash, model_version, shap_mode)) if use_cache else None
+            if cached is not None:
+                probability, shap_dict, tier, mode, error_bound, model_scores = cached
+                results.at[idx, "probability"] = probability
+                results.at[idx, "model_scores"] = dict(model_scores) if model_scores is not None else None
+                results.at[idx, "shap_values"] = dict(shap_dict)
+                results.at[idx, "scoring_tier"] = tier
+                results.at[idx, "shap_mode"] = mode
+                results.at[idx, "shap_error_bound"] = error_bound
+            else:
+                misses.append((idx, student))
+
+        if misses:
+            model, preprocessed_df = prepare_phase_batch(misses, phase, base_model_dir, caller="predict_and_explain",
+                                                         vectors=vectors)
+
+            # Identical inputs are scored and explained once, then scattered back to every student
+            first, inverse = unique_rows(preprocessed_df)
+            unique_df = preprocessed_df.iloc[first]
+            results.attrs["scored_inputs"] += len(misses)
+            results.attrs["unique_inputs"] += len(first)
+
+            probabilities, tiers, model_scores = _score_matrix(model, unique_df, phase, base_model_dir, cascade, ensemble)
+            for (idx, _), u in zip(misses, inverse):
+                results.at[idx, "probability"] = float(probabilities[u])
+                results.at[idx, "scoring_tier"] = tiers[u]
+                results.at[idx, "shap_mode"] = shap_mode  # requested mode, until an explanation sets the effective one
+                results.at[idx, "model_scores"] = dict(model_scores[u]) if model_scores[u] is not None else None
+
+            # Only explained results are memoized, so a cache hit always carries SHAP values
+            if explain:
+                explanations, modes, error_bounds = _explain_by_tier(model, unique_df, phase, base_model_dir, tiers, shap_mode)
+                for (idx, _), u in zip(misses, inverse):
+                    shap_dict, mode, error_bound = dict(explanations[u]), modes[u], float(error_bounds[u])
+                    results.at[idx, "shap_values"] = shap_dict
+                    results.at[idx, "shap_mode"] = mode
+                    results.at[idx, "shap_error_bound"] = error_bound
+                    prediction_cache.put((results.at[idx, "input_hash"], model_version, shap_mode),
+                                         (results.at[idx, "probability"], dict(shap_dict), results.at[idx, "scoring_tier"],
+                                          mode, error_bound, model_scores[u]))
+
+            print(f"[predict_and_explain] Phase: {phase}, Unique inputs: {len(first)}/{len(misses)}")
+
+        print(f"[predict_and_explain] Phase: {phase}, Students scored{' and explained' if explain else ''}: {len(misses)}, From cache: {len(members) - len(misses)}")
+
+    return results
+
+def predict_and_explain_student(student: dict, base_model_dir: str = "models/"):
+    """
+    Single-student form of predict_and_explain_students.
+
+    Returns:
+        (float, str, dict): Graduation probability, model phase and SHAP values.
+
+    Raises:
+        ValueError: If the student lacks the data for any phase.
+    """
+    row = predict_and_explain_students([student], base_model_dir).iloc[0]
+    if row["error"]:
+        raise ValueError(row["error"])
+    return row["probability"], row["phase"], row["shap_values"]
+
+# === What-if scoring ===
+MAX_WHAT_IF_POINTS = 1000
+
+def check_what_if_size(sizes: dict, max_points: int = MAX_WHAT_IF_POINTS):
+    """
+    Validates a what-if grid from its axis lengths (feature -> number of values), before
+    any value or combination is built.
+
+    Raises:
+        ValueError: If the grid is empty, or an axis or the grid exceeds max_points.
+    """
+    if not sizes or min(sizes.values()) <= 0:
+        raise ValueError("The what-if grid needs at least one feature with at least one value.")
+    too_long = [feature for feature, size in sizes.items() if size > max_points]
+    if too_long:
+        raise ValueError(f"What-if axes {too_long} have more than {max_points} values.")
+    total = 1
+    for size in sizes.values():
+        total *= size
+        if total > max_points:
+            raise ValueError(f"The what-if grid has more than {max_points} points.")
+
+def score_what_if(student: dict, grid: dict, base_model_dir: str = "models/", max_points: int = MAX_WHAT_IF_POINTS):
+    """
+    Scores a student under every combination of the override values in `grid`
+    (feature -> list of values), in one batched pass through the phase model and
+    without SHAP. Nothing is cached or persisted.
+
+    The phase is routed on the student with the overrides applied, so e.g. a
+    hypothetical 1st semester grade is scored by the mid model.
+
+    Returns:
+        (str, str, pd.DataFrame): Phase, served model version, and one row per grid
+            point with the override columns and "probability".
+
+    Raises:
+        ValueError: If the grid is empty or too large, names a feature the phase model does
+            not use, or the student lacks the data for any phase.
+    """
+    features = list(grid)
+    check_what_if_size({feature: len(grid[feature]) for feature in features}, max_points)
+    points = list(itertools.product(*(grid[feature] for feature in features)))
+
+    variants = [{**student, **dict(zip(features, point))} for point in points]
+    phase = select_phase(variants[0])
+    unknown = [feature for feature in features if feature not in get_phase_features(phase, base_model_dir)]
+    if unknown:
+        raise ValueError(f"Features not used by the {phase} model: {unknown}")
+
+    results = predict_and_explain_students(variants, base_model_dir, forced_phase=phase, use_cache=False, explain=False)
+    curve = pd.DataFrame(points, columns=features)
+    curve["probability"] = results["probability"].astype(float).to_numpy()
+    return phase, results.iloc[0]["model_version"], curve
@@ -0,0 +1,163 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Optional
+from models.utils.system.inference import predict_and_explain_students, to_inference
+from models.utils.system.model_config import get_inference_config
+
+
+# === Worker process side ===
+def _init_worker(base_model_dir: str):
+    # Each worker process loads its own artifacts once, before its first batch
+    from models.utils.system.warmup import warm_up
+    warm_up(base_model_dir)
+
+
+def _run_batch(students: list, base_model_dir: str) -> list:
+    """Scores and explains one coalesced batch. Returns an (inference, error) pair per student."""
+    results = predict_and_explain_students(students, base_model_dir)
+    return [
+        (None, row.error) if row.error
+        else (to_inference(row), None)
+        for row in results.itertuples()
+    ]
+
+
+def _resolve(futures: list, job: Future):
+    error = job.exception()
+    if error is not None:
+        for future in futures:
+            future.set_exception(error)
+        return
+    for future, (inference, message) in zip(futures, job.result()):
+        if message:
+            future.set_exception(ValueError(message))
+        else:
+            future.set_result(inference)
+
+
+class InferenceService:
+    """
+    Micro-batching front end to a pool of inference processes.
+
+    Requests are queued; a dispatcher thread coalesces those arriving within
+    max_wait_ms (up to max_batch_size) into one predict_and_explain_students call,
+    which runs one batched predict/explain pass per phase in a worker process.
+    CPU-bound sklearn and SHAP work therefore leaves the FastAPI threadpool and
+    the GIL, and scales with the number of workers.
+    """
+
+    def __init__(self, base_model_dir: str = "models/", workers: Optional[int] = None,
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.base_model_dir = base_model_dir
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.batches_dispatched = 0
+
+        self._queue = queue.Queue()
+        self._closed = False
+        # spawn, not fork: the API process already runs threads that fork would copy mid-flight
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(base_model_dir,)
+        )
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="inference-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, student: dict) -> Future:
+        """
+        Queues one student. The future resolves to an Inference, or raises ValueError
+        if the student lacks data.
+        """
+        if self._closed:
+            raise RuntimeError("Inference service is shut down.")
+        future = Future()
+        self._queue.put((student, future))
+        return future
+
+    def predict(self, student: dict, timeout: Optional[float] = None):
+        return self.submit(student).result(timeout)
+
+    def _collect_batch(self) -> Optional[list]:
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Dispatch what we have, stop on the next round
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+
+            # Drop requests whose callers already gave up
+            batch = [(student, future) for student, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            futures = [future for _, future in batch]
+            self.batches_dispatched += 1
+            try:
+                job = self._executor.submit(_run_batch, [student for student, _ in batch], self.base_model_dir)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            job.add_done_callback(partial(_resolve, futures))
+
+    def shutdown(self):
+        self._closed = True
+        self._queue.put(None)
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+
+# === Process-wide service (started by the API lifespan when enabled) ===
+_service: Optional[InferenceService] = None
+
+
+def start_inference_service(config: dict = None, base_model_dir: str = "models/") -> Optional[InferenceService]:
+    """Starts the service if inference.process_pool is enabled in config.yaml."""
+    global _service
+    settings = get_inference_config(config)
+    if not settings.get("process_pool", False) or _service is not None:
+        return _service
+    _service = InferenceService(
+        base_model_dir=base_model_dir,
+        workers=settings.get("workers"),
+        max_batch_size=settings.get("max_batch_size", 32),
+        max_wait_ms=settings.get("max_wait_ms", 5.0),
+    )
+    print(f"⚙️ Inference process pool started (max batch: {_service.max_batch_size}, max wait: {_service.max_wait * 1000:.1f}ms)")
+    return _service
+
+
+def get_inference_service() -> Optional[InferenceService]:
+    return _service
+
+
+def stop_inference_service():
+    global _service
+    if _service is not None:
+        _service.shutdown()
+        _service = None
@@ -0,0 +1,77 @@
+import os
+import yaml
+
+# Project root holds config.yaml (three levels above models/utils/system)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+CONFIG_PATH = os.path.join(PROJECT_ROOT, "config.yaml")
+
+# === Servable model families and their artifact files ===
+DEFAULT_MODEL_FAMILY = "random_forest"
+MODEL_FILENAMES = {
+    "random_forest": "random_forest_model.pkl",
+    "random_forest_compressed": "random_forest_model_compressed.pkl",
+    "logistic_regression": "logreg_model.pkl",
+}
+# Families that can also score as ensemble members, but are not served alone (no SHAP explainer, no array export)
+SCORING_FILENAMES = {
+    **MODEL_FILENAMES,
+    "xgboost": "xgboost_model.pkl",
+    "knn": "knn_model.pkl",
+}
+
+
+def load_config(path: str = CONFIG_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return yaml.safe_load(f) or {}
+
+
+CONFIG = load_config()
+
+
+def get_model_config(config: dict = None) -> dict:
+    config = CONFIG if config is None else config
+    return config.get("model") or {}
+
+
+def get_cascade_config(config: dict = None) -> dict:
+    return get_model_config(config).get("cascade") or {}
+
+
+def get_ensemble_config(config: dict = None) -> dict:
+    return get_model_config(config).get("ensemble") or {}
+
+
+def get_inference_config(config: dict = None) -> dict:
+    config = CONFIG if config is None else config
+    return config.get("inference") or {}
+
+
+def get_shap_config(config: dict = None) -> dict:
+    config = CONFIG if config is None else config
+    return config.get("shap") or {}
+
+
+def get_model_family(phase: str, config: dict = None) -> str:
+    """
+    Returns the model family configured for a phase under model.families in config.yaml.
+    """
+    families = get_model_config(config).get("families") or {}
+    family = families.get(phase, DEFAULT_MODEL_FAMILY)
+    if family not in MODEL_FILENAMES:
+        raise ValueError(f"Unsupported model family '{family}' for phase '{phase}'. Use one of: {list(MODEL_FILENAMES)}")
+    return family
+
+
+# Linear SHAP (logistic regression: the cascade screen or a served LR) is in log-odds,
+# TreeSHAP on the forests in probability units
+LINEAR_SHAP_UNITS = "log_odds"
+TREE_SHAP_UNITS = "probability"
+
+
+def get_shap_units(phase: str, scoring_tier: str = None, config: dict = None) -> str:
+    """Units of the SHAP values explaining a prediction scored on `phase` with `scoring_tier`."""
+    if scoring_tier == "screen" or get_model_family(phase, config) == "logistic_regression":
+        return LINEAR_SHAP_UNITS
+    return TREE_SHAP_UNITS
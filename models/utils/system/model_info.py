@@ -1,14 +1,14 @@
 import os
-import pickle
 import joblib
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 
 # These match the fields used in prediction phase selection
 from models.utils.system.prediction import EARLY_FIELDS, MID_FIELDS, FINAL_FIELDS
+from models.utils.system.artifact_registry import artifact_registry, MODEL_FILENAME
 
 # === Constants ===
 PHASES = ["early", "mid", "final"]
-ARTIFACT_NAME = "random_forest_model.pkl"
+ARTIFACT_NAME = MODEL_FILENAME
 TEST_DATA_NAME = "test_data.pkl"
 
 def get_model_path(phase: str, base_model_dir: str = "models/"):
@@ -21,9 +21,7 @@ def load_model(phase: str, base_model_dir: str = "models/"):
     path = get_model_path(phase, base_model_dir)
     if not os.path.exists(path):
         raise FileNotFoundError(f"Model not found at {path}")
-    with open(path, "rb") as f:
-        model = pickle.load(f)
-    return model
+    return artifact_registry.load(path)
 
 def get_feature_importance(model):
     if hasattr(model, "feature_importances_"):
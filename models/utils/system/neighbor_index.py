@@ -0,0 +1,96 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+from models.utils.system.artifact_registry import artifact_registry, get_artifact_dir
+from models.utils.system.prediction import group_by_phase, prepare_phase_batch
+
+NEIGHBOR_INDEX_FILENAME = "neighbor_index.pkl"
+DEFAULT_NEIGHBORS = 5
+OUTCOMES = {1: "graduate", 0: "dropout"}  # training target, class 1 = Graduate
+
+# KNN's Minkowski p -> KD-tree metric
+KNN_METRICS = {1: "manhattan", 2: "euclidean"}
+
+
+def get_neighbor_index_path(phase: str, base_model_dir: str = "models/") -> str:
+    return os.path.join(get_artifact_dir(phase, base_model_dir), NEIGHBOR_INDEX_FILENAME)
+
+
+def build_neighbor_index(model_dir: str, X_train: pd.DataFrame, y_train, knn_model=None, leaf_size: int = 40) -> str:
+    """
+    Builds the KD-tree over a phase's preprocessed training matrix and saves it next to the
+    phase model. With the trained KNN pipeline, neighbors are searched in its own space (its
+    scaling / selection steps, distance metric and number of neighbors).
+
+    A KD-tree query costs O(log n) on these low-dimensional inputs, so lookups stay fast
+    as the training set grows, and a whole batch is answered in one call.
+
+    Returns:
+        str: Path of the saved index.
+    """
+    feature_names = list(X_train.columns)
+    transform, metric, n_neighbors = None, "euclidean", DEFAULT_NEIGHBORS
+    if knn_model is not None:
+        transform = knn_model[:-1]  # every pipeline step but the classifier
+        knn = knn_model[-1]
+        metric = KNN_METRICS.get(getattr(knn, "p", 2), "euclidean")
+        n_neighbors = getattr(knn, "n_neighbors", DEFAULT_NEIGHBORS)
+
+    matrix = transform.transform(X_train) if transform is not None else X_train.to_numpy()
+    index = {
+        "tree": KDTree(np.asarray(matrix, dtype=np.float64), leaf_size=leaf_size, metric=metric),
+        "transform": transform,
+        "feature_names": feature_names,
+        "outcomes": np.asarray(y_train, dtype=np.int8).ravel(),
+        "n_neighbors": n_neighbors,
+    }
+
+    index_path = os.path.join(model_dir, NEIGHBOR_INDEX_FILENAME)
+    with open(index_path, "wb") as f:
+        pickle.dump(index, f)
+    print(f"✅ Neighbor index ({len(feature_names)} features, {len(index['outcomes'])} students) saved at: {index_path}")
+    return index_path
+
+
+def load_neighbor_index(phase: str, base_model_dir: str = "models/") -> dict:
+    path = get_neighbor_index_path(phase, base_model_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Neighbor index not found at {path}")
+    return artifact_registry.load(path)
+
+
+def find_similar_students(students, base_model_dir: str = "models/", k: int = None) -> pd.DataFrame:
+    """
+    Finds the k most similar historical (training) students for a batch of students,
+    each searched in the index of the phase it is scored with.
+
+    Returns:
+        pd.DataFrame: One row per student (same index as the input) with "phase", "error",
+            "neighbors" (list of {"rank", "training_row", "distance", "outcome"}) and
+            "graduation_rate" among those neighbors.
+    """
+    results, groups = group_by_phase(students, ["neighbors", "graduation_rate"])
+
+    for phase, members in groups.items():
+        index = load_neighbor_index(phase, base_model_dir)
+        _, preprocessed_df = prepare_phase_batch(members, phase, base_model_dir, caller="find_similar_students")
+        matrix = preprocessed_df[index["feature_names"]]
+        if index["transform"] is not None:
+            matrix = index["transform"].transform(matrix)
+
+        n_neighbors = min(k or index["n_neighbors"], len(index["outcomes"]))
+        distances, rows = index["tree"].query(np.asarray(matrix, dtype=np.float64), k=n_neighbors)
+        for (idx, _), row_distances, row_ids in zip(members, distances, rows):
+            outcomes = index["outcomes"][row_ids]
+            results.at[idx, "phase"] = phase
+            results.at[idx, "neighbors"] = [
+                {"rank": rank, "training_row": int(row), "distance": float(distance), "outcome": OUTCOMES[int(outcome)]}
+                for rank, (row, distance, outcome) in enumerate(zip(row_ids, row_distances, outcomes), start=1)
+            ]
+            results.at[idx, "graduation_rate"] = float(outcomes.mean())
+
+        print(f"[find_similar_students] Phase: {phase}, Students: {len(members)}, Neighbors: {n_neighbors}")
+
+    return results
@@ -1,9 +1,111 @@
-import os
-import pickle
 import logging
-from models.utils.system.preprocessing import preprocess_row_for_inference
+import numpy as np
+import pandas as pd
+from models.utils.system.artifact_registry import artifact_registry, get_artifact_dir
+from models.utils.system.preprocessing import preprocess_batch_for_inference
+from models.utils.system.imputation import impute_students
+from models.utils.system.flat_forest import get_scoring_model
 from models.feature_sets import FINAL_FIELDS, MID_FIELDS, EARLY_FIELDS
 
+def select_phase(student: dict) -> str:
+    """
+    Returns the most complete model phase the student has data for.
+
+    Raises:
+        ValueError: If not even the early-phase fields are available.
+    """
+    if all(field in student and student[field] is not None for field in FINAL_FIELDS):
+        return "final"
+    elif all(field in student and student[field] is not None for field in MID_FIELDS):
+        return "mid"
+    elif all(field in student and student[field] is not None for field in EARLY_FIELDS):
+        return "early"
+    raise ValueError("Not enough data to make a prediction.")
+
+def align_student_input(student: dict, expected_features: list, phase: str, caller: str = "predict_student") -> dict:
+    """
+    Restricts a student record to the model's features, defaulting absent ones to 0.
+    Gaps the phase's MICE kernel covers should be filled first with impute_students.
+    """
+    raw_input = {k: student.get(k, 0) for k in expected_features}
+    missing = [k for k in expected_features if k not in student or student[k] is None]
+    if missing:
+        logging.warning(f"[{caller}] Missing or null features for {phase} model: {missing}")
+    return raw_input
+
+def to_student_records(students) -> list:
+    """Turns a list of dicts or a DataFrame into (index, dict) pairs, mapping NaN to None."""
+    if isinstance(students, pd.DataFrame):
+        cleaned = students.astype(object).where(students.notna(), None)
+        return list(zip(cleaned.index, cleaned.to_dict("records")))
+    return list(enumerate(students))
+
+def group_by_phase(students, columns: list, select=select_phase):
+    """
+    Splits a batch of students into phase groups.
+
+    Returns:
+        (pd.DataFrame, dict): A results frame indexed like the input with the given columns plus
+            "phase" and "error" (already set for students without enough data), and a mapping
+            of phase -> [(index, student), ...].
+    """
+    records = to_student_records(students)
+    results = pd.DataFrame(
+        {col: None for col in list(columns) + ["phase", "error"]},
+        index=pd.Index([idx for idx, _ in records]),
+        dtype=object
+    )
+
+    groups = {}
+    for idx, student in records:
+        try:
+            groups.setdefault(select(student), []).append((idx, student))
+        except ValueError as e:
+            results.at[idx, "error"] = str(e)
+    return results, groups
+
+def get_phase_features(phase: str, base_model_dir: str = "models/") -> list:
+    """Returns the input columns the phase model was trained on, in training order."""
+    return list(artifact_registry.load_model(phase, base_model_dir).feature_names_in_)
+
+def prepare_phase_batch(members: list, phase: str, base_model_dir: str = "models/", caller: str = "predict_students",
+                        vectors: dict = None):
+    """
+    Loads the phase model and preprocesses a group of (index, student) pairs into one matrix.
+    When `vectors` maps every member's index to its stored preprocessed row, the matrix is
+    assembled from those rows instead.
+
+    Returns:
+        (model, pd.DataFrame): The phase model and the preprocessed input, one row per member.
+    """
+    model_dir = get_artifact_dir(phase, base_model_dir)
+    model = artifact_registry.load_model(phase, base_model_dir)
+    expected_features = list(model.feature_names_in_)
+
+    if vectors is not None and all(idx in vectors for idx, _ in members):
+        matrix = np.array([vectors[idx] for idx, _ in members], dtype=np.float64).reshape(len(members), len(expected_features))
+        return model, pd.DataFrame(matrix, columns=expected_features)
+
+    students = impute_students([student for _, student in members], model_dir, caller=caller)
+    rows = [align_student_input(student, expected_features, phase, caller=caller) for student in students]
+    return model, preprocess_batch_for_inference(rows, model_dir, model=model)
+
+def unique_rows(df: pd.DataFrame):
+    """
+    Finds the distinct rows of a preprocessed matrix, so repeated inputs are scored
+    and explained once.
+
+    Returns:
+        (np.ndarray, np.ndarray): Position of the first occurrence of each distinct row, and
+            for every row the index of its distinct row in that array.
+    """
+    if df.empty:
+        return np.arange(0), np.arange(0)
+    # sort=False numbers groups in order of first appearance
+    inverse = df.groupby(list(df.columns), sort=False, dropna=False).ngroup().to_numpy()
+    _, first = np.unique(inverse, return_index=True)
+    return first, inverse
+
 def predict_student(student: dict, base_model_dir: str = "models/", return_phase: bool = False):
     """
     Predicts graduation probability using the most complete available model phase.
@@ -17,42 +119,61 @@ def predict_student(student: dict, base_model_dir: str = "models/", return_phase
         float or (float, str): Probability of graduation, optionally with the model phase.
     """
     # === Determine Phase ===
-    if all(field in student and student[field] is not None for field in FINAL_FIELDS):
-        phase = "final"
-    elif all(field in student and student[field] is not None for field in MID_FIELDS):
-        phase = "mid"
-    elif all(field in student and student[field] is not None for field in EARLY_FIELDS):
-        phase = "early"
-    else:
-        raise ValueError("Not enough data to make a prediction.")
-
-    model_dir = os.path.join(base_model_dir, phase, "artifacts")
+    phase = select_phase(student)
 
-    # === Load Model ===
-    model_path = os.path.join(model_dir, "random_forest_model.pkl")
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model not found at {model_path}")
+    model_dir = get_artifact_dir(phase, base_model_dir)
 
-    with open(model_path, "rb") as f:
-        model = pickle.load(f)
+    # === Load Model (cached across requests) ===
+    model = artifact_registry.load_model(phase, base_model_dir)
 
     expected_features = list(model.feature_names_in_)
 
-    # === Align Inputs ===
-    raw_input = {k: student.get(k, 0) for k in expected_features}
-    missing = [k for k in expected_features if k not in student or student[k] is None]
-    if missing:
-        logging.warning(f"[predict_student] Missing or null features for {phase} model: {missing}")
+    # === Impute and Align Inputs ===
+    student = impute_students([student], model_dir, caller="predict_student")[0]
+    raw_input = align_student_input(student, expected_features, phase, caller="predict_student")
 
     # === Preprocess ===
-    preprocessed_df = preprocess_row_for_inference(raw_input, model_dir, model=model)
+    preprocessed_df = preprocess_batch_for_inference([raw_input], model_dir, model=model)
 
     # === Predict Graduation Probability ===
-    prediction = float(model.predict_proba(preprocessed_df)[0][1])  # class 1 = Graduate
+    scorer = get_scoring_model(phase, base_model_dir, model=model)
+    prediction = float(scorer.predict_proba(preprocessed_df)[0][1])  # class 1 = Graduate
     print(f"[predict_student] Phase: {phase}, Graduation Probability: {prediction}")
 
     return (prediction, phase) if return_phase else prediction
 
+def predict_students(students, base_model_dir: str = "models/") -> pd.DataFrame:
+    """
+    Predicts graduation probabilities for a whole cohort, calling predict_proba once per phase.
+
+    Phase selection, input alignment and preprocessing are shared with predict_student,
+    so every score and phase matches the single-row function.
+
+    Args:
+        students (list[dict] or pd.DataFrame): Student records.
+        base_model_dir (str): Base path where model directories reside.
+
+    Returns:
+        pd.DataFrame: One row per student (same index as the input) with columns
+            "probability", "phase" and "error" (set when the student could not be scored).
+    """
+    # === Group Students by Phase ===
+    results, groups = group_by_phase(students, ["probability"])
+
+    # === Predict Each Phase Group in One Call ===
+    for phase, members in groups.items():
+        model, batch = prepare_phase_batch(members, phase, base_model_dir, caller="predict_students")
+        scorer = get_scoring_model(phase, base_model_dir, model=model)
+        probabilities = scorer.predict_proba(batch)[:, 1]  # class 1 = Graduate
+
+        for (idx, _), probability in zip(members, probabilities):
+            results.at[idx, "probability"] = float(probability)
+            results.at[idx, "phase"] = phase
+
+        print(f"[predict_students] Phase: {phase}, Students scored: {len(members)}")
+
+    return results
+
 def get_risk_level(score: float) -> str:
     if score <= 0.4:
         return "low"
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from numbers import Number
+from models.utils.system.model_config import get_model_config
+
+DEFAULT_CACHE_SIZE = 4096
+
+
+def _normalize(value):
+    # 6, 6.0 and np.int64(6) must hash the same; NaN is treated as missing
+    if isinstance(value, Number) and not isinstance(value, complex):
+        value = float(value)
+        return None if math.isnan(value) else value
+    return value if value is None else str(value)
+
+
+def hash_input(student: dict, expected_features: list, phase: str) -> str:
+    """
+    Returns a stable hash of the model input vector: the student's values for the
+    phase model's features, in training order.
+    """
+    vector = [phase] + [_normalize(student.get(feature)) for feature in expected_features]
+    return hashlib.sha256(json.dumps(vector, separators=(",", ":")).encode()).hexdigest()
+
+
+class PredictionCache:
+    """
+    Bounded in-process LRU of (input hash, model version) -> (probability, shap_values).
+
+    Lets repeated scoring of an unchanged input against an unchanged model skip both
+    predict_proba and SHAP. Safe to share between the threads of the FastAPI threadpool.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Size set by model.prediction_cache_size in config.yaml
+prediction_cache = PredictionCache(get_model_config().get("prediction_cache_size", DEFAULT_CACHE_SIZE))
@@ -1,7 +1,6 @@
-import os
-import pickle
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder, StandardScaler
+from models.utils.system.artifact_registry import artifact_registry, get_encoders_path, get_scaler_path
 
 def preprocess_row_for_inference(data: dict, model_dir: str, model) -> pd.DataFrame:
     df = pd.DataFrame([data])
@@ -25,8 +24,7 @@ def preprocess_row_for_inference(data: dict, model_dir: str, model) -> pd.DataFr
     num_cols = df.select_dtypes(include=["int64", "float64", "int32", "float32"]).columns.tolist()
 
     # Load label encoders
-    with open(os.path.join(model_dir, "label_encoders.pkl"), "rb") as f:
-        encoders = pickle.load(f)
+    encoders = artifact_registry.load_encoders(model_dir)
 
     for col in cat_cols:
         if col in encoders:
@@ -36,10 +34,122 @@ def preprocess_row_for_inference(data: dict, model_dir: str, model) -> pd.DataFr
             df[col] = pd.to_numeric(df[col], errors="coerce").fillna(-1).astype(int)
 
     # Load and apply scaler
-    with open(os.path.join(model_dir, "scaler.pkl"), "rb") as f:
-        scaler = pickle.load(f)
+    scaler = artifact_registry.load_scaler(model_dir)
 
     if num_cols:
         df[num_cols] = scaler.transform(df[num_cols])
 
     return df
+
+
+# === Compiled preprocessing ===
+DROPPED_COLUMNS = ("target", "original_index")
+_NUMERIC_TYPES = (int, float, np.integer, np.floating)
+
+
+def _is_numeric_value(value) -> bool:
+    return isinstance(value, _NUMERIC_TYPES) and not isinstance(value, (bool, np.bool_))
+
+
+class PreprocessingPlan:
+    """
+    Precompiled version of preprocess_row_for_inference for one model.
+
+    Column order, encoder lookup tables and scaler statistics are resolved once,
+    so an N-row batch is transformed with a handful of NumPy operations.
+    Output values match preprocess_row_for_inference row by row:
+      - numeric values are standardised with the scaler's mean and scale
+      - values of encoded columns are mapped to their class index, unknown ones to -1
+      - other non-numeric values are coerced to int, unparseable ones to -1
+    """
+
+    def __init__(self, columns, encoders: dict, scaler):
+        self.columns = list(columns)
+        self.kinds = ["categorical" if col in encoders else "numeric" for col in self.columns]
+        self.lookups = {
+            col: {cls: code for code, cls in enumerate(encoders[col].classes_)}
+            for col in self.columns if col in encoders
+        }
+
+        # Scaler statistics aligned to self.columns (identity for unscaled columns)
+        self.mean = np.zeros(len(self.columns))
+        self.scale = np.ones(len(self.columns))
+        self.scaled = np.zeros(len(self.columns), dtype=bool)
+        if scaler is not None:
+            scaler_cols = getattr(scaler, "feature_names_in_", None)
+            if scaler_cols is None:
+                scaler_cols = [col for col in self.columns if col not in encoders]
+            mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(len(scaler_cols))
+            scale = scaler.scale_ if scaler.scale_ is not None else np.ones(len(scaler_cols))
+            positions = {col: i for i, col in enumerate(self.columns)}
+            for i, col in enumerate(scaler_cols):
+                if col in positions:
+                    j = positions[col]
+                    self.mean[j], self.scale[j], self.scaled[j] = mean[i], scale[i], True
+
+    def _column_values(self, rows, col: str, n_rows: int) -> np.ndarray:
+        if col in DROPPED_COLUMNS:
+            return np.zeros(n_rows)
+        if isinstance(rows, pd.DataFrame):
+            return rows[col].to_numpy() if col in rows.columns else np.zeros(n_rows)
+        values = np.empty(n_rows, dtype=object)
+        values[:] = [row.get(col, 0) for row in rows]
+        return values
+
+    def transform_array(self, rows) -> np.ndarray:
+        """
+        Transforms a list of dicts or a DataFrame into an (N, n_features) float matrix.
+        """
+        n_rows = len(rows)
+        X = np.empty((n_rows, len(self.columns)))
+        numeric = np.ones((n_rows, len(self.columns)), dtype=bool)
+
+        for j, col in enumerate(self.columns):
+            values = self._column_values(rows, col, n_rows)
+            if values.dtype.kind in "iuf":
+                X[:, j] = values
+                continue
+
+            # Mixed/object column: numeric cells stay numeric, the rest are encoded
+            mask = np.fromiter((_is_numeric_value(v) for v in values), dtype=bool, count=n_rows)
+            numeric[:, j] = mask
+            X[mask, j] = values[mask].astype(float)
+            if mask.all():
+                continue
+
+            others = pd.Series(values[~mask], dtype=object)
+            if col in self.lookups:
+                encoded = others.astype(str).map(self.lookups[col]).fillna(-1)
+            else:
+                encoded = pd.to_numeric(others, errors="coerce").fillna(-1).astype(int)
+            X[~mask, j] = encoded.to_numpy(dtype=float)
+
+        scale_mask = numeric & self.scaled
+        return np.where(scale_mask, (X - self.mean) / self.scale, X)
+
+    def transform(self, rows) -> pd.DataFrame:
+        return pd.DataFrame(self.transform_array(rows), columns=self.columns)
+
+
+def compile_preprocessing_plan(model_dir: str, model) -> PreprocessingPlan:
+    """
+    Returns the cached PreprocessingPlan for a model, rebuilt when its encoders or scaler change.
+    """
+    columns = tuple(model.feature_names_in_)
+    paths = [get_encoders_path(model_dir), get_scaler_path(model_dir)]
+    return artifact_registry.derived(
+        ("preprocessing_plan", model_dir, columns),
+        paths,
+        lambda: PreprocessingPlan(
+            columns,
+            artifact_registry.load_encoders(model_dir),
+            artifact_registry.load_scaler(model_dir)
+        )
+    )
+
+
+def preprocess_batch_for_inference(rows, model_dir: str, model) -> pd.DataFrame:
+    """
+    Batch counterpart of preprocess_row_for_inference for a list of dicts or a DataFrame.
+    """
+    return compile_preprocessing_plan(model_dir, model).transform(rows)
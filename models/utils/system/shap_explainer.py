@@ -1,15 +1,269 @@
 import os
-import pickle
 import shap
 import numpy as np
-import logging
+import pandas as pd
 from typing import Optional
-from models.utils.system.preprocessing import preprocess_row_for_inference
-from models.feature_sets import FINAL_FIELDS, MID_FIELDS, EARLY_FIELDS
+from models.utils.system.artifact_registry import artifact_registry, get_artifact_dir, get_model_path
+from models.utils.system.model_config import get_model_family, get_shap_config
+from models.utils.system.flat_forest import FlatForest, is_flattenable, get_scoring_model
+from models.utils.system.preprocessing import preprocess_batch_for_inference
+from models.utils.system.imputation import impute_students
+from models.utils.system.prediction import align_student_input, group_by_phase, prepare_phase_batch, select_phase, unique_rows
 
-_model_cache = {}
+def get_tree_explainer(phase: str, base_model_dir: str = "models/", model=None):
+    """
+    Returns the cached TreeExplainer for a phase, rebuilt only when the model file changes.
+    """
+    if model is None:
+        model = artifact_registry.load_model(phase, base_model_dir)
+    model_path = get_model_path(phase, base_model_dir)
+    return artifact_registry.derived(
+        ("tree_explainer", model_path),
+        [model_path],
+        # Array-format forests are handed to shap in its dictionary tree format. shap copies
+        # every tree into its own padded arrays, so this explainer holds private memory (about
+        # twice the mapped arrays) instead of the shared pages; scoring and Saabas stay on the
+        # mapping, and with the sidecar API workers only build one when a read finds a pending row.
+        lambda: shap.TreeExplainer(model.to_shap_dict() if isinstance(model, FlatForest) else model)
+    )
+
+class LinearShapExplainer:
+    """
+    Exact SHAP values for a logistic regression, computed in closed form.
+
+    With independent features, the SHAP value of feature i is
+    coef_i * (x_i - background_mean_i) in log-odds units, so no sampling or
+    generic explainer is needed: one subtraction and one multiply per matrix.
+    """
+
+    def __init__(self, model, background_mean: np.ndarray):
+        self.coef = np.asarray(model.coef_, dtype=np.float64)[0]  # class 1 = Graduate
+        self.background_mean = np.asarray(background_mean, dtype=np.float64)
+        self.expected_value = float(np.asarray(model.intercept_)[0] + self.coef @ self.background_mean)
+
+    def shap_values(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            X = X.to_numpy()
+        return (np.asarray(X, dtype=np.float64) - self.background_mean) * self.coef
+
+def get_background_path(phase: str, base_model_dir: str = "models/") -> str:
+    return os.path.join(base_model_dir, phase, "data", "ready", "X_train.csv")
+
+def get_background_mean(phase: str, columns: list, base_model_dir: str = "models/") -> np.ndarray:
+    """
+    Mean of the preprocessed training matrix for a phase, in `columns` order.
+    Falls back to zeros (the mean of standardised features) when X_train.csv is not shipped.
+    """
+    path = get_background_path(phase, base_model_dir)
+    if not os.path.exists(path):
+        return np.zeros(len(columns))
+    return pd.read_csv(path).reindex(columns=columns).mean().fillna(0.0).to_numpy()
+
+def get_linear_explainer(phase: str, base_model_dir: str = "models/", model=None):
+    """
+    Returns the cached closed-form explainer for the phase's logistic regression.
+    """
+    if model is None:
+        model = artifact_registry.load_model(phase, base_model_dir, family="logistic_regression")
+    model_path = get_model_path(phase, base_model_dir, family="logistic_regression")
+    background_path = get_background_path(phase, base_model_dir)
+    columns = list(model.feature_names_in_)
+    return artifact_registry.derived(
+        ("linear_explainer", model_path),
+        [model_path, background_path],
+        lambda: LinearShapExplainer(model, get_background_mean(phase, columns, base_model_dir))
+    )
+
+def get_explainer(phase: str, base_model_dir: str = "models/", model=None):
+    """
+    Returns the SHAP explainer matching the model family configured for a phase.
+    """
+    if get_model_family(phase) == "logistic_regression":
+        return get_linear_explainer(phase, base_model_dir, model=model)
+    return get_tree_explainer(phase, base_model_dir, model=model)
+
+def _class1_contributions(shap_values) -> np.ndarray:
+    """
+    Normalises explainer output to an (n_rows, n_features) array of class 1 (graduate) contributions.
+    """
+    # === Handle multi-output (binary classification): one array per class
+    if isinstance(shap_values, list):
+        shap_values = shap_values[1] if len(shap_values) > 1 else shap_values[0]
+    shap_values = np.asarray(shap_values)
+
+    if shap_values.ndim == 3:
+        if shap_values.shape[2] == 2:
+            return shap_values[:, :, 1]  # 🧠 pick Class 1 contribution ONLY
+        if shap_values.shape[2] == 1:
+            return shap_values[:, :, 0]
+        raise ValueError(f"Unexpected multi-value SHAP output with shape {shap_values.shape}")
+    return shap_values
+
+# === Approximate Modes ===
+SHAP_MODES = ("exact", "saabas", "sampled")
+
+def validate_shap_mode(mode: str) -> str:
+    if mode not in SHAP_MODES:
+        raise ValueError(f"Unsupported SHAP mode '{mode}'. Use one of: {list(SHAP_MODES)}")
+    return mode
+
+class SaabasExplainer:
+    """
+    Saabas path attributions for a FlatForest.
+
+    Each split on a row's path credits its feature with the change in class 1
+    probability between the node and the child taken, averaged over trees. The
+    attributions sum to the prediction minus the mean root value like SHAP, but
+    cost one traversal of the forest instead of TreeSHAP's per-path bookkeeping.
+    """
+
+    def __init__(self, forest: FlatForest):
+        self.forest = forest
+        self.expected_value = float(forest.leaf_proba[forest.roots, 1].mean())
+
+    def shap_values(self, X) -> np.ndarray:
+        forest = self.forest
+        X = forest._as_matrix(X)
+        contributions = np.zeros(X.shape, dtype=np.float64)
+        rows = np.broadcast_to(np.arange(X.shape[0])[:, np.newaxis], (X.shape[0], forest.n_trees))
+        nodes = np.repeat(forest.roots[np.newaxis, :], X.shape[0], axis=0)
+        for _ in range(forest.max_depth):
+            children = forest.step(X, nodes)
+            # Zero once a tree has reached its leaf, since leaves point back to themselves
+            delta = forest.leaf_proba[children, 1] - forest.leaf_proba[nodes, 1]
+            np.add.at(contributions, (rows, forest.feature[nodes]), delta)
+            nodes = children
+        return contributions / forest.n_trees
+
+def _sampled_trees(n_trees: int, fraction: float) -> np.ndarray:
+    n_sampled = max(1, min(n_trees, int(round(n_trees * fraction))))
+    return np.sort(np.random.default_rng(0).choice(n_trees, n_sampled, replace=False))
+
+def supports_approximation(model) -> bool:
+    return isinstance(model, FlatForest) or is_flattenable(model)
+
+def get_approximate_explainer(phase: str, base_model_dir: str = "models/", model=None, mode: str = "saabas"):
+    """
+    Returns the cached approximate explainer for a phase forest: SaabasExplainer, or a
+    TreeExplainer over a fixed random subset of sample_fraction of the trees.
+    """
+    if model is None:
+        model = artifact_registry.load_model(phase, base_model_dir)
+    forest = get_scoring_model(phase, base_model_dir, model=model)
+    model_path = get_model_path(phase, base_model_dir)
+    if mode == "saabas":
+        return artifact_registry.derived(("saabas_explainer", model_path), [model_path], lambda: SaabasExplainer(forest))
+    fraction = float(get_shap_config().get("sample_fraction", 0.2))
+    return artifact_registry.derived(
+        ("sampled_explainer", model_path, fraction),
+        [model_path],
+        # Private copy of the sampled trees only, like the exact TreeExplainer
+        lambda: shap.TreeExplainer(forest.to_shap_dict(_sampled_trees(forest.n_trees, fraction)))
+    )
 
-def explain_student(student: dict, forced_phase: Optional[str] = None, base_model_dir: str = "models/"):
+def get_mode_explainer(phase: str, base_model_dir: str = "models/", model=None, mode: str = "exact"):
+    """
+    Returns the explainer for a SHAP mode. Models other than tree forests are always
+    explained exactly, whatever the requested mode.
+    """
+    validate_shap_mode(mode)
+    if model is None:
+        model = artifact_registry.load_model(phase, base_model_dir)
+    if mode == "exact" or not supports_approximation(model):
+        return get_explainer(phase, base_model_dir, model=model)
+    return get_approximate_explainer(phase, base_model_dir, model=model, mode=mode)
+
+def effective_shap_mode(model, mode: str) -> str:
+    return mode if supports_approximation(model) else "exact"
+
+def get_calibration_sample(phase: str, columns: list, base_model_dir: str = "models/", size: int = 200) -> Optional[pd.DataFrame]:
+    """Up to `size` rows of the preprocessed training matrix, or None when X_train.csv is not shipped."""
+    path = get_background_path(phase, base_model_dir)
+    if not os.path.exists(path):
+        return None
+    sample = pd.read_csv(path).reindex(columns=columns).fillna(0.0)
+    return sample.sample(n=size, random_state=0) if len(sample) > size else sample
+
+def get_error_bound(phase: str, base_model_dir: str = "models/", model=None, mode: str = "saabas",
+                    fallback_df: Optional[pd.DataFrame] = None) -> dict:
+    """
+    Measures an approximate mode against exact TreeSHAP on a calibration sample of the
+    training matrix (or of `fallback_df` when X_train.csv is not shipped). Cached until
+    the model or the training matrix changes.
+
+    Returns:
+        dict: "mode", "max_abs_error" and "p95_abs_error" (probability units, per feature
+            value) and "calibration_rows".
+    """
+    if model is None:
+        model = artifact_registry.load_model(phase, base_model_dir)
+    shap_config = get_shap_config()
+    size = int(shap_config.get("calibration_size", 200))
+    fraction = float(shap_config.get("sample_fraction", 0.2))
+    columns = list(model.feature_names_in_)
+    model_path = get_model_path(phase, base_model_dir)
+    background_path = get_background_path(phase, base_model_dir)
+    has_background = os.path.exists(background_path)
+
+    def measure():
+        sample = get_calibration_sample(phase, columns, base_model_dir, size) if has_background else fallback_df.iloc[:size]
+        exact = _class1_contributions(get_tree_explainer(phase, base_model_dir, model=model).shap_values(sample))
+        approximate = _class1_contributions(get_approximate_explainer(phase, base_model_dir, model, mode).shap_values(sample))
+        errors = np.abs(approximate - exact)
+        bound = {
+            "mode": mode,
+            "max_abs_error": float(errors.max()) if errors.size else 0.0,
+            "p95_abs_error": float(np.percentile(errors, 95)) if errors.size else 0.0,
+            "calibration_rows": len(sample)
+        }
+        print(f"[get_error_bound] ✅ Phase: {phase}, Mode: {mode}, Max abs error: {bound['max_abs_error']:.6f} over {len(sample)} rows")
+        return bound
+
+    return artifact_registry.derived(
+        ("shap_error_bound", model_path, mode, fraction, size),
+        [model_path, background_path] if has_background else [model_path],
+        measure
+    )
+
+def explanation_error_bound(preprocessed_df: pd.DataFrame, phase: str, base_model_dir: str = "models/",
+                            model=None, mode: str = "exact") -> float:
+    """Max abs SHAP error of `mode` for a phase model; 0.0 for exact explanations."""
+    if model is None:
+        model = artifact_registry.load_model(phase, base_model_dir)
+    if effective_shap_mode(model, validate_shap_mode(mode)) == "exact":
+        return 0.0
+    return get_error_bound(phase, base_model_dir, model, mode, fallback_df=preprocessed_df)["max_abs_error"]
+
+def explain_matrix(preprocessed_df: pd.DataFrame, phase: str, base_model_dir: str = "models/", model=None,
+                   explainer=None, mode: str = "exact") -> list:
+    """
+    Computes SHAP values for an already preprocessed matrix in a single explainer call.
+    Repeated rows are explained once and their values copied to every occurrence.
+
+    Returns:
+        list[dict]: One mapping of feature names to SHAP values (float) per row.
+    """
+    explainer = explainer or get_mode_explainer(phase, base_model_dir, model=model, mode=mode)
+    first, inverse = unique_rows(preprocessed_df)
+    contributions = _class1_contributions(explainer.shap_values(preprocessed_df.iloc[first]))[inverse]
+    feature_names = preprocessed_df.columns.tolist()
+    return [dict(zip(feature_names, map(float, row))) for row in contributions]
+
+DEFAULT_TOP_DRIVERS = 5
+
+def top_drivers(shap_values: Optional[dict], k: Optional[int] = None) -> Optional[list]:
+    """
+    Compact summary of an explanation: its k largest contributions by magnitude, signed,
+    as [{"feature", "value"}, ...] (k defaults to shap.top_drivers in config.yaml).
+    """
+    if shap_values is None:
+        return None
+    k = get_shap_config().get("top_drivers", DEFAULT_TOP_DRIVERS) if k is None else k
+    ranked = sorted(shap_values.items(), key=lambda item: abs(item[1]), reverse=True)[:k]
+    return [{"feature": feature, "value": float(value)} for feature, value in ranked]
+
+def explain_student(student: dict, forced_phase: Optional[str] = None, base_model_dir: str = "models/",
+                    mode: str = "exact", return_error_bound: bool = False):
     """
     Generates SHAP feature attributions for a student's prediction.
 
@@ -17,71 +271,68 @@ def explain_student(student: dict, forced_phase: Optional[str] = None, base_mode
         student (dict): A dictionary of student features.
         forced_phase (str, optional): Force to use a specific phase ("early", "mid", "final").
         base_model_dir (str): Base path where model directories reside.
+        mode (str): "exact", or the approximate "saabas" / "sampled" modes.
+        return_error_bound (bool): Also return the mode's max abs error vs exact SHAP.
 
     Returns:
-        dict: Mapping of feature names to SHAP values (float).
+        dict: Mapping of feature names to SHAP values (float),
+            or (dict, float) if return_error_bound is True.
     """
     # === Determine Phase ===
-    if forced_phase:
-        phase = forced_phase
-    else:
-        if all(field in student and student[field] is not None for field in FINAL_FIELDS):
-            phase = "final"
-        elif all(field in student and student[field] is not None for field in MID_FIELDS):
-            phase = "mid"
-        elif all(field in student and student[field] is not None for field in EARLY_FIELDS):
-            phase = "early"
-        else:
-            raise ValueError("Not enough data to generate SHAP explanation.")
-
-    model_dir = os.path.join(base_model_dir, phase, "artifacts")
-    model_path = os.path.join(model_dir, "random_forest_model.pkl")
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model not found at {model_path}")
-
-    # === Load and cache Model ===
-    if phase in _model_cache:
-        model = _model_cache[phase]
-    else:
-        with open(model_path, "rb") as f:
-            model = pickle.load(f)
-        _model_cache[phase] = model
+    phase = forced_phase or select_phase(student)
+    model_dir = get_artifact_dir(phase, base_model_dir)
 
+    # === Load Model (cached across requests) ===
+    model = artifact_registry.load_model(phase, base_model_dir)
     expected_features = list(model.feature_names_in_)
 
-    # === Align Inputs ===
-    raw_input = {k: student.get(k, 0) for k in expected_features}
-    missing = [k for k in expected_features if k not in student or student[k] is None]
-    if missing:
-        logging.warning(f"[explain_student] Missing or null features for {phase} model: {missing}")
+    # === Impute and Align Inputs ===
+    student = impute_students([student], model_dir, caller="explain_student")[0]
+    raw_input = align_student_input(student, expected_features, phase, caller="explain_student")
 
     # === Preprocess ===
-    preprocessed_df = preprocess_row_for_inference(raw_input, model_dir, model=model)
+    preprocessed_df = preprocess_batch_for_inference([raw_input], model_dir, model=model)
 
-    # === SHAP Calculation ===
-    explainer = shap.TreeExplainer(model)
-    shap_values = explainer.shap_values(preprocessed_df)
+    # === SHAP Calculation (cached explainer) ===
+    shap_dict = explain_matrix(preprocessed_df, phase, base_model_dir, model=model, mode=mode)[0]
 
-    # === Handle multi-output (binary classification)
-    if isinstance(shap_values, list):
-        shap_values = shap_values[0]  # Pick class 1 explanations (graduate)
+    print(f"[explain_student] ✅ Phase: {phase}, SHAP values generated ({effective_shap_mode(model, mode)}).")
 
-    shap_array = shap_values[0]  # First row (student)
+    if return_error_bound:
+        return shap_dict, explanation_error_bound(preprocessed_df, phase, base_model_dir, model=model, mode=mode)
+    return shap_dict
 
-    feature_names = preprocessed_df.columns.tolist()
+def explain_students(students, forced_phase: Optional[str] = None, base_model_dir: str = "models/",
+                     mode: str = "exact") -> pd.DataFrame:
+    """
+    Generates SHAP attributions for a batch of students with one explainer call per phase.
 
-    shap_dict = {}
-    for feature, value in zip(feature_names, shap_array):
-        if isinstance(value, np.ndarray):
-            if value.size == 2:
-                # 🧠 pick Class 1 contribution ONLY
-                value = value[1]
-            elif value.size == 1:
-                value = value.item()
-            else:
-                raise ValueError(f"Unexpected multi-value SHAP output for feature {feature}: {value}")
-        shap_dict[feature] = float(value)
+    Args:
+        students (list[dict] or pd.DataFrame): Student records.
+        forced_phase (str, optional): Force every student onto a specific phase.
+        base_model_dir (str): Base path where model directories reside.
+        mode (str): "exact", or the approximate "saabas" / "sampled" modes.
 
-    print(f"[explain_student] ✅ Phase: {phase}, SHAP values generated.")
+    Returns:
+        pd.DataFrame: One row per student (same index as the input) with columns
+            "shap_values" (same dicts as explain_student), "shap_error_bound", "phase" and "error".
+    """
+    validate_shap_mode(mode)
 
-    return shap_dict
+    # === Group Students by Phase ===
+    select = (lambda student: forced_phase) if forced_phase else select_phase
+    results, groups = group_by_phase(students, ["shap_values", "shap_error_bound"], select=select)
+
+    # === Explain Each Phase Group in One Call ===
+    for phase, members in groups.items():
+        model, preprocessed_df = prepare_phase_batch(members, phase, base_model_dir, caller="explain_students")
+        error_bound = explanation_error_bound(preprocessed_df, phase, base_model_dir, model=model, mode=mode)
+
+        for (idx, _), shap_dict in zip(members, explain_matrix(preprocessed_df, phase, base_model_dir, model=model, mode=mode)):
+            results.at[idx, "shap_values"] = shap_dict
+            results.at[idx, "shap_error_bound"] = error_bound
+            results.at[idx, "phase"] = phase
+
+        print(f"[explain_students] ✅ Phase: {phase}, SHAP values generated for {len(members)} students.")
+
+    return results
@@ -0,0 +1,329 @@
+import json
+import math
+import os
+import socket
+import socketserver
+import struct
+import threading
+from typing import Optional
+from models.utils.system.inference import Inference
+from models.utils.system.model_config import get_inference_config
+
+# === Wire protocol ===
+# Every message is a frame: header (magic, version, opcode, payload length) + payload.
+#
+# Request payload:  flags u8 (bit 0: explain) | shap mode u8 | phase u8 (255 = route per student)
+#                   | u32 n_students | per student: u16 n_fields, per field: u8 key length, key,
+#                   u8 type tag, value (f64 for numbers, u16 length + UTF-8 for strings, nothing for None)
+# Response payload: u32 scored_inputs | u32 unique_inputs | string table (u32 count, u16 length + UTF-8 each)
+#                   | u32 n_students | per student: u8 status, then either u32 error string id, or
+#                   f64 probability, u32 ids of phase / input_hash / model_version / scoring_tier /
+#                   shap_mode, f64 error bound (NaN = none), u16 n_shap (0xFFFF = not explained)
+#                   + (u32 feature id, f64 value) pairs, u8 n_model_scores (0xFF = no ensemble)
+#                   + (u32 family id, f64 probability) pairs
+# Repeated strings (feature names, versions...) travel once per response through the string table.
+# Status requests have an empty payload and are answered with the sidecar's warm-up state as JSON.
+MAGIC = b"EDPS"
+PROTOCOL_VERSION = 2
+HEADER = struct.Struct("!4sBBI")
+
+OP_SCORE, OP_EXPLAIN, OP_BATCH, OP_STATUS, OP_ERROR = 1, 2, 3, 4, 255
+SHAP_MODE_CODES = {"exact": 0, "saabas": 1, "sampled": 2}
+PHASE_CODES = {"early": 0, "mid": 1, "final": 2}
+AUTO_PHASE = 255
+NULL_ID = 0xFFFFFFFF
+NOT_EXPLAINED = 0xFFFF
+NO_ENSEMBLE = 0xFF
+
+TAG_NONE, TAG_FLOAT, TAG_STR = 0, 1, 2
+
+
+class SidecarError(RuntimeError):
+    """The sidecar answered with an error instead of results."""
+
+
+# --- Framing ---
+def _recv_exact(sock, n: int) -> bytes:
+    chunks = bytearray()
+    while len(chunks) < n:
+        chunk = sock.recv(n - len(chunks))
+        if not chunk:
+            raise ConnectionError("Inference sidecar closed the connection.")
+        chunks.extend(chunk)
+    return bytes(chunks)
+
+
+def send_frame(sock, op: int, payload: bytes):
+    sock.sendall(HEADER.pack(MAGIC, PROTOCOL_VERSION, op, len(payload)) + payload)
+
+
+def recv_frame(sock):
+    magic, version, op, length = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if magic != MAGIC or version != PROTOCOL_VERSION:
+        raise ConnectionError(f"Unsupported sidecar protocol (magic {magic!r}, version {version}).")
+    return op, _recv_exact(sock, length)
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def read(self, fmt: str):
+        values = struct.unpack_from(fmt, self.data, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values if len(values) > 1 else values[0]
+
+    def read_bytes(self, n: int) -> bytes:
+        value = self.data[self.offset:self.offset + n]
+        self.offset += n
+        return value
+
+
+# --- Requests ---
+def encode_request(students: list, explain: bool = True, shap_mode: str = "exact", forced_phase: Optional[str] = None) -> bytes:
+    parts = [struct.pack("!BBBI", int(explain), SHAP_MODE_CODES[shap_mode],
+                         PHASE_CODES[forced_phase] if forced_phase else AUTO_PHASE, len(students))]
+    for student in students:
+        fields = []
+        for key, value in student.items():
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                encoded = struct.pack("!B", TAG_NONE)
+            elif isinstance(value, (bool, int, float)):
+                encoded = struct.pack("!Bd", TAG_FLOAT, float(value))
+            elif isinstance(value, str):
+                raw = value.encode()
+                encoded = struct.pack("!BH", TAG_STR, len(raw)) + raw
+            else:
+                continue  # dates and other non-model columns stay on the API side
+            key_raw = key.encode()
+            fields.append(struct.pack("!B", len(key_raw)) + key_raw + encoded)
+        parts.append(struct.pack("!H", len(fields)))
+        parts.extend(fields)
+    return b"".join(parts)
+
+
+def decode_request(payload: bytes):
+    reader = _Reader(payload)
+    explain, mode_code, phase_code, n_students = reader.read("!BBBI")
+    shap_mode = {code: mode for mode, code in SHAP_MODE_CODES.items()}[mode_code]
+    forced_phase = None if phase_code == AUTO_PHASE else {code: p for p, code in PHASE_CODES.items()}[phase_code]
+
+    students = []
+    for _ in range(n_students):
+        student = {}
+        for _ in range(reader.read("!H")):
+            key = reader.read_bytes(reader.read("!B")).decode()
+            tag = reader.read("!B")
+            if tag == TAG_FLOAT:
+                student[key] = reader.read("!d")
+            elif tag == TAG_STR:
+                student[key] = reader.read_bytes(reader.read("!H")).decode()
+            else:
+                student[key] = None
+        students.append(student)
+    return students, bool(explain), shap_mode, forced_phase
+
+
+# --- Responses ---
+def encode_response(results) -> bytes:
+    """Encodes a predict_and_explain_students frame."""
+    strings = {}
+
+    def string_id(value) -> int:
+        if value is None:
+            return NULL_ID
+        return strings.setdefault(value, len(strings))
+
+    rows = []
+    for row in results.itertuples():
+        if row.error:
+            rows.append(struct.pack("!BI", 1, string_id(row.error)))
+            continue
+        shap_values = row.shap_values or {}
+        error_bound = row.shap_error_bound if row.shap_error_bound is not None else math.nan
+        rows.append(struct.pack("!BdIIIIIdH", 0, row.probability, string_id(row.phase), string_id(row.input_hash),
+                                string_id(row.model_version), string_id(row.scoring_tier), string_id(row.shap_mode),
+                                error_bound, NOT_EXPLAINED if row.shap_values is None else len(shap_values)))
+        rows.extend(struct.pack("!Id", string_id(feature), value) for feature, value in shap_values.items())
+        model_scores = row.model_scores or {}
+        rows.append(struct.pack("!B", NO_ENSEMBLE if row.model_scores is None else len(model_scores)))
+        rows.extend(struct.pack("!Id", string_id(family), value) for family, value in model_scores.items())
+
+    table = [struct.pack("!I", len(strings))]
+    for value in strings:
+        raw = value.encode()
+        table.append(struct.pack("!H", len(raw)) + raw)
+
+    header = struct.pack("!II", results.attrs.get("scored_inputs", 0), results.attrs.get("unique_inputs", 0))
+    return header + b"".join(table) + struct.pack("!I", len(results)) + b"".join(rows)
+
+
+def decode_response(payload: bytes):
+    """
+    Returns:
+        (list, dict): An (Inference, error) pair per student, and the dedup stats.
+    """
+    reader = _Reader(payload)
+    scored, unique = reader.read("!II")
+    strings = [reader.read_bytes(reader.read("!H")).decode() for _ in range(reader.read("!I"))]
+    lookup = lambda i: None if i == NULL_ID else strings[i]
+
+    results = []
+    for _ in range(reader.read("!I")):
+        if reader.read("!B"):
+            results.append((None, lookup(reader.read("!I"))))
+            continue
+        probability, phase, input_hash, model_version, tier, mode, error_bound, n_shap = reader.read("!dIIIIIdH")
+        shap_values = None
+        if n_shap != NOT_EXPLAINED:
+            shap_values = {strings[feature]: value for feature, value in (reader.read("!Id") for _ in range(n_shap))}
+        n_scores = reader.read("!B")
+        model_scores = None
+        if n_scores != NO_ENSEMBLE:
+            model_scores = {strings[family]: value for family, value in (reader.read("!Id") for _ in range(n_scores))}
+        inference = Inference(probability, lookup(phase), shap_values, lookup(input_hash), lookup(model_version),
+                              lookup(tier), lookup(mode), None if math.isnan(error_bound) else error_bound, model_scores)
+        results.append((inference, None))
+    return results, {"scored_inputs": scored, "unique_inputs": unique}
+
+
+# === Server (owns every model artifact) ===
+class _SidecarHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # One connection may carry any number of request frames
+        while True:
+            try:
+                op, payload = recv_frame(self.request)
+            except (ConnectionError, struct.error):
+                return
+            try:
+                send_frame(self.request, op, self.server.process(op, payload))
+            except Exception as e:
+                send_frame(self.request, OP_ERROR, f"{type(e).__name__}: {e}".encode())
+
+
+class InferenceSidecar(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Inference server process reachable over a Unix domain socket.
+
+    It loads and warms every phase's artifacts once, and answers score, explain and
+    batch frames with predict_and_explain_students, so API workers neither import
+    the models nor block their request threads on SHAP. Status frames report its
+    warm-up state, which the API's /ready endpoint forwards.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, base_model_dir: str = "models/", warm: bool = True):
+        from models.utils.system.warmup import WarmupState, warm_up
+        self.socket_path = socket_path
+        self.base_model_dir = base_model_dir
+        self.warmup_state = WarmupState()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # stale socket from a previous run
+        super().__init__(socket_path, _SidecarHandler)
+        if warm:
+            warm_up(base_model_dir, state=self.warmup_state)
+
+    def process(self, op: int, payload: bytes) -> bytes:
+        from models.utils.system.inference import predict_and_explain_students
+        if op == OP_STATUS:
+            return json.dumps({"ready": self.warmup_state.ready, **self.warmup_state.snapshot()}).encode()
+        students, explain, shap_mode, forced_phase = decode_request(payload)
+        if op in (OP_SCORE, OP_EXPLAIN):
+            if len(students) != 1:
+                raise ValueError("Score and explain requests carry exactly one student.")
+            explain = op == OP_EXPLAIN
+        elif op != OP_BATCH:
+            raise ValueError(f"Unknown sidecar operation {op}.")
+        results = predict_and_explain_students(students, self.base_model_dir, forced_phase=forced_phase,
+                                               shap_mode=shap_mode, explain=explain)
+        return encode_response(results)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+# === Client (used by the API) ===
+class SidecarClient:
+    """
+    Blocking client for InferenceSidecar. Keeps one connection per calling thread.
+    Raises OSError when the sidecar cannot be reached, so callers can fall back to
+    in-process inference.
+    """
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _call(self, op: int, payload: bytes) -> bytes:
+        try:
+            sock = self._connection()
+            send_frame(sock, op, payload)
+            reply_op, reply = recv_frame(sock)
+        except OSError:
+            self.close()
+            raise
+        if reply_op == OP_ERROR:
+            raise SidecarError(reply.decode())
+        return reply
+
+    def batch(self, students: list, explain: bool = True, shap_mode: str = "exact", forced_phase: Optional[str] = None):
+        """
+        Returns:
+            (list, dict): An (Inference, error) pair per student, and the dedup stats.
+        """
+        return decode_response(self._call(OP_BATCH, encode_request(students, explain, shap_mode, forced_phase)))
+
+    def status(self) -> dict:
+        """The sidecar's warm-up state: {"ready", "started", "finished", "phases"}."""
+        return json.loads(self._call(OP_STATUS, b""))
+
+    def _single(self, op: int, student: dict) -> Inference:
+        results, _ = decode_response(self._call(op, encode_request([student])))
+        inference, error = results[0]
+        if error:
+            raise ValueError(error)
+        return inference
+
+    def score(self, student: dict) -> Inference:
+        return self._single(OP_SCORE, student)
+
+    def explain(self, student: dict) -> Inference:
+        return self._single(OP_EXPLAIN, student)
+
+
+_client: Optional[SidecarClient] = None
+
+
+def get_sidecar_client(config: dict = None) -> Optional[SidecarClient]:
+    """
+    Returns a client for the sidecar configured under inference.sidecar_socket, or None
+    when none is configured or its socket does not exist.
+    """
+    settings = get_inference_config(config)
+    socket_path = settings.get("sidecar_socket")
+    if not socket_path or not os.path.exists(socket_path):
+        return None
+    global _client
+    if _client is None or _client.socket_path != socket_path:
+        _client = SidecarClient(socket_path, timeout=settings.get("sidecar_timeout_s", 30.0))
+    return _client
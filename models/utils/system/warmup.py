@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+import numpy as np
+import pandas as pd
+from models.utils.system.artifact_registry import artifact_registry, get_artifact_dir
+from models.utils.system.model_config import get_cascade_config, get_shap_config
+from models.utils.system.preprocessing import compile_preprocessing_plan
+from models.utils.system.imputation import load_imputer
+from models.utils.system.flat_forest import get_scoring_model
+from models.utils.system.shap_explainer import (
+    get_explainer, get_linear_explainer, get_mode_explainer, get_error_bound, get_background_path,
+    supports_approximation, explain_matrix
+)
+from models.utils.system.inference import SCREEN_FAMILY, get_served_version
+from models.utils.system.ensemble import check_ensemble_members
+from models.feature_sets import PHASE_FIELDS
+
+
+class WarmupState:
+    """
+    Tracks whether the inference path of this process is warm.
+    Read by the readiness endpoint while warm-up runs in the background.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = False
+        self.finished = False
+        self.phases = {}  # phase -> "ready" or error message
+
+    def set_phase(self, phase: str, status: str):
+        with self._lock:
+            self.phases[phase] = status
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return self.finished and bool(self.phases) and all(s == "ready" for s in self.phases.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"started": self.started, "finished": self.finished, "phases": dict(self.phases)}
+
+
+warmup_state = WarmupState()
+
+
+def warm_up_phase(phase: str, base_model_dir: str = "models/"):
+    """
+    Loads every artifact of a phase that the current config uses into the registry, builds
+    its scorer, preprocessing plan, imputer and explainers, and runs one dummy row through
+    scoring and SHAP so the first real request pays none of these costs. That covers the
+    cascade screen and its linear explainer when the cascade is on, and the bulk approximate
+    explainer and its error bound when shap.bulk_mode is not exact.
+    """
+    model = artifact_registry.load_model(phase, base_model_dir)
+    model_dir = get_artifact_dir(phase, base_model_dir)
+    artifact_registry.load_feature_names(model_dir)
+    compile_preprocessing_plan(model_dir, model)
+    load_imputer(model_dir)  # unpickling the MICE kernel also imports miceforest
+    get_served_version(phase, base_model_dir)
+
+    dummy = pd.DataFrame(np.zeros((1, len(model.feature_names_in_))), columns=list(model.feature_names_in_))
+    get_scoring_model(phase, base_model_dir, model=model).predict_proba(dummy)
+    get_explainer(phase, base_model_dir, model=model)
+    explain_matrix(dummy, phase, base_model_dir, model=model)
+    check_ensemble_members(phase, base_model_dir)
+
+    if get_cascade_config().get("enabled"):
+        screen = artifact_registry.load_model(phase, base_model_dir, family=SCREEN_FAMILY)
+        screen_dummy = dummy.reindex(columns=list(screen.feature_names_in_), fill_value=0.0)
+        screen.predict_proba(screen_dummy)
+        explain_matrix(screen_dummy, phase, base_model_dir,
+                       explainer=get_linear_explainer(phase, base_model_dir, model=screen))
+
+    bulk_mode = get_shap_config().get("bulk_mode", "exact")
+    if bulk_mode != "exact" and supports_approximation(model):
+        explain_matrix(dummy, phase, base_model_dir, explainer=get_mode_explainer(phase, base_model_dir, model, bulk_mode))
+        # Without X_train.csv the bound is calibrated on the first real batch, never on the dummy row
+        if os.path.exists(get_background_path(phase, base_model_dir)):
+            get_error_bound(phase, base_model_dir, model, bulk_mode)
+
+
+def warm_up(base_model_dir: str = "models/", state: WarmupState = warmup_state) -> dict:
+    """
+    Warms every phase, recording per-phase status instead of failing on missing artifacts.
+
+    Returns:
+        dict: The warm-up state snapshot.
+    """
+    state.started = True
+    for phase in PHASE_FIELDS:
+        start = time.time()
+        try:
+            warm_up_phase(phase, base_model_dir)
+            state.set_phase(phase, "ready")
+            print(f"🔥 [warm_up] Phase {phase} ready in {time.time() - start:.2f}s")
+        except Exception as e:
+            state.set_phase(phase, f"{type(e).__name__}: {e}")
+            print(f"❌ [warm_up] Phase {phase} failed: {e}")
+    state.finished = True
+    return state.snapshot()
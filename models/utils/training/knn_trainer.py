@@ -1,4 +1,5 @@
 import os
+import sys
 import pandas as pd
 import pickle
 from sklearn.neighbors import KNeighborsClassifier
@@ -8,6 +9,10 @@ from sklearn.pipeline import Pipeline
 from sklearn.feature_selection import SelectKBest, f_classif
 from sklearn.compose import ColumnTransformer
 
+# Allow access to the models package even when run directly
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from models.utils.system.neighbor_index import build_neighbor_index
+
 
 def train_optimized_knn(model_path, X_path, y_path):
     """
@@ -59,4 +64,7 @@ def train_optimized_knn(model_path, X_path, y_path):
         pickle.dump(best_model, f)
 
     print(f"✅ KNN model saved at: {model_path}")
-    return {"best_params": best_params}
\ No newline at end of file
+
+    # ✅ Precompute the neighbor index served by the "similar students" endpoint
+    index_path = build_neighbor_index(model_dir, X_train, y_train, knn_model=best_model)
+    return {"best_params": best_params, "neighbor_index_path": index_path}
\ No newline at end of file
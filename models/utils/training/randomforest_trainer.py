@@ -2,10 +2,14 @@ import pandas as pd
 import pickle
 import os
 import sys
+import copy
+import json
+import time
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import RandomizedSearchCV, GridSearchCV, StratifiedKFold
 from sklearn.metrics import precision_recall_curve
+from sklearn.tree._tree import Tree
 
 
 # Allow access to utils even when run directly
@@ -20,7 +24,13 @@ def train_random_forest(
     cv=5,
     n_iter=20,
     early_stop_cv_score_threshold=None,
-    param_grid_override=None
+    param_grid_override=None,
+    X_val_path=None,
+    y_val_path=None,
+    compress=False,
+    compression_metric="f1",
+    compression_tolerance=0.01,
+    compressed_model_path=None
 ):
     """
     Trains a Random Forest model with default parameters or optimizes hyperparameters using RandomizedSearchCV/GridSearchCV.
@@ -36,9 +46,16 @@ def train_random_forest(
         n_iter (int): Iterations for RandomizedSearchCV (ignored for GridSearchCV).
         early_stop_cv_score_threshold (float): Optional early stopping if mean CV score < threshold.
         param_grid_override (dict): Optional custom hyperparameter grid to override the default.
+        X_val_path (str): Path to validation features CSV (required when compress=True).
+        y_val_path (str): Path to validation labels CSV (required when compress=True).
+        compress (bool): If True, also saves a pruned forest (fewer trees, shallower) as a separate artifact.
+        compression_metric (str): "f1" or "accuracy", measured on the validation split.
+        compression_tolerance (float): Maximum allowed drop of the metric versus the full forest.
+        compressed_model_path (str): Where to save the pruned forest. Defaults to
+            random_forest_model_compressed.pkl next to model_path.
 
     Returns:
-        dict: Best parameters and feature importance DataFrame.
+        dict: Best parameters and feature importance DataFrame (plus the compression report when compress=True).
     """
 
     # ✅ Load training data
@@ -144,8 +161,179 @@ def train_random_forest(
     print(f"✅ Model saved at: {model_path}")
     print(f"📊 Feature importance saved at: {feature_path}")
 
-    return {
+    result = {
         "best_params": best_params,
         "feature_importance": feature_importance,
         "threshold": best_threshold
-    }
\ No newline at end of file
+    }
+
+    # ✅ Optional compression stage
+    if compress:
+        if X_val_path is None or y_val_path is None:
+            raise ValueError("compress=True requires X_val_path and y_val_path.")
+        X_val = pd.read_csv(X_val_path)
+        y_val = pd.read_csv(y_val_path).values.ravel()
+        compressed_model_path = compressed_model_path or os.path.join(model_dir, "random_forest_model_compressed.pkl")
+        result["compression"] = save_compressed_forest(
+            best_model, X_val, y_val, model_path, compressed_model_path,
+            metric=compression_metric, tolerance=compression_tolerance
+        )
+
+    return result
+
+
+# === Forest compression ===
+def _truncate_tree(estimator, max_depth):
+    """
+    Returns a copy of a fitted decision tree cut at max_depth: nodes at that depth become
+    leaves predicting their own class distribution, and unreachable nodes are dropped.
+    """
+    tree = estimator.tree_
+    state = tree.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+
+    order, new_index, is_leaf = [], {}, []
+    stack = [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        new_index[node] = len(order)
+        order.append(node)
+        leaf = nodes["left_child"][node] == -1 or depth >= max_depth
+        is_leaf.append(leaf)
+        if not leaf:
+            stack.append((nodes["right_child"][node], depth + 1))
+            stack.append((nodes["left_child"][node], depth + 1))
+
+    new_nodes = nodes[order].copy()
+    is_leaf = np.array(is_leaf)
+    new_nodes["left_child"] = [-1 if leaf else new_index[nodes["left_child"][n]] for n, leaf in zip(order, is_leaf)]
+    new_nodes["right_child"] = [-1 if leaf else new_index[nodes["right_child"][n]] for n, leaf in zip(order, is_leaf)]
+    new_nodes["feature"][is_leaf] = -2
+    new_nodes["threshold"][is_leaf] = -2.0
+    new_nodes["missing_go_to_left"][is_leaf] = 0
+
+    new_tree = Tree(tree.n_features, tree.n_classes, tree.n_outputs)
+    new_tree.__setstate__({
+        "max_depth": min(max_depth, state["max_depth"]),
+        "node_count": len(order),
+        "nodes": new_nodes,
+        "values": np.ascontiguousarray(values[order])
+    })
+    pruned = copy.copy(estimator)
+    pruned.tree_ = new_tree
+    return pruned
+
+
+def _prefix_scores(tree_probs, y_true, positive, metric, threshold=0.5):
+    """Metric of the forest made of the first k trees, for every k (vectorized over k)."""
+    n_trees = tree_probs.shape[0]
+    forest_probs = np.cumsum(tree_probs, axis=0) / np.arange(1, n_trees + 1)[:, np.newaxis]
+    predicted = forest_probs > threshold  # ties go to class 0, like predict()
+    actual = (y_true == positive)[np.newaxis, :]
+    if metric == "accuracy":
+        return (predicted == actual).mean(axis=1)
+    if metric == "f1":
+        tp = (predicted & actual).sum(axis=1)
+        fp = (predicted & ~actual).sum(axis=1)
+        fn = (~predicted & actual).sum(axis=1)
+        return 2 * tp / np.maximum(2 * tp + fp + fn, 1)
+    raise ValueError("Invalid compression metric. Use 'f1' or 'accuracy'.")
+
+
+def compress_random_forest(model, X_val, y_val, metric="f1", tolerance=0.01):
+    """
+    Prunes a fitted forest to the fewest total nodes whose validation metric stays within
+    `tolerance` of the full forest, searching every (number of leading trees, max depth) pair.
+
+    Returns:
+        (RandomForestClassifier, dict): The pruned forest and a summary of the search.
+    """
+    X_val = X_val[model.feature_names_in_] if hasattr(model, "feature_names_in_") else X_val
+    X_val_array = np.ascontiguousarray(X_val, dtype=np.float32)
+    y_val = np.asarray(y_val)
+    positive = model.classes_[1]
+    full_depth = max(e.tree_.max_depth for e in model.estimators_)
+
+    best = None
+    baseline = None
+    for depth in range(full_depth, 0, -1):
+        trees = [_truncate_tree(e, depth) for e in model.estimators_]
+        tree_probs = np.stack([t.predict_proba(X_val_array)[:, 1] for t in trees])
+        scores = _prefix_scores(tree_probs, y_val, positive, metric)
+        node_counts = np.cumsum([t.tree_.node_count for t in trees])
+
+        if baseline is None:
+            baseline = float(scores[-1])
+        feasible = np.flatnonzero(scores >= baseline - tolerance)
+        if feasible.size == 0:
+            continue
+        k = feasible[np.argmin(node_counts[feasible])]
+        candidate = (int(node_counts[k]), int(k) + 1, depth, float(scores[k]), trees[:k + 1])
+        if best is None or candidate[:3] < best[:3]:
+            best = candidate
+
+    node_count, n_trees, depth, score, trees = best
+    compressed = copy.copy(model)
+    compressed.estimators_ = trees
+    compressed.n_estimators = n_trees
+    compressed.max_depth = depth
+
+    summary = {
+        "metric": metric,
+        "tolerance": tolerance,
+        "baseline_score": baseline,
+        "compressed_score": score,
+        "original_trees": len(model.estimators_),
+        "original_max_depth": int(full_depth),
+        "original_nodes": int(sum(e.tree_.node_count for e in model.estimators_)),
+        "compressed_trees": n_trees,
+        "compressed_max_depth": depth,
+        "compressed_nodes": node_count
+    }
+    return compressed, summary
+
+
+def _measure_latency(model, X, repeats=50):
+    """Median predict_proba latency in milliseconds for one row and for the whole frame."""
+    def median_ms(frame):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model.predict_proba(frame)
+            timings.append((time.perf_counter() - start) * 1000)
+        return float(np.median(timings))
+    return {"single_row_ms": median_ms(X.iloc[:1]), "batch_ms": median_ms(X), "batch_rows": len(X)}
+
+
+def save_compressed_forest(model, X_val, y_val, model_path, compressed_model_path, metric="f1", tolerance=0.01):
+    """
+    Compresses a forest, saves it as a separate artifact and records its size and latency
+    next to it (random_forest_compression.json).
+
+    Returns:
+        dict: The compression report.
+    """
+    print(f"\n🗜️ Compressing Random Forest (metric: {metric}, tolerance: {tolerance})...")
+    compressed, report = compress_random_forest(model, X_val, y_val, metric=metric, tolerance=tolerance)
+
+    with open(compressed_model_path, "wb") as f:
+        pickle.dump(compressed, f)
+
+    report["original_size_bytes"] = os.path.getsize(model_path)
+    report["compressed_size_bytes"] = os.path.getsize(compressed_model_path)
+    report["original_latency"] = _measure_latency(model, X_val)
+    report["compressed_latency"] = _measure_latency(compressed, X_val)
+    report["compressed_model_path"] = compressed_model_path
+
+    report_path = os.path.join(os.path.dirname(compressed_model_path), "random_forest_compression.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"✅ Compressed forest: {report['compressed_trees']}/{report['original_trees']} trees, "
+          f"max depth {report['compressed_max_depth']}/{report['original_max_depth']}, "
+          f"{metric} {report['compressed_score']:.4f} (full: {report['baseline_score']:.4f})")
+    print(f"📦 Size: {report['original_size_bytes']} → {report['compressed_size_bytes']} bytes")
+    print(f"⏱️ Single-row latency: {report['original_latency']['single_row_ms']:.2f}ms → "
+          f"{report['compressed_latency']['single_row_ms']:.2f}ms")
+    print(f"✅ Compressed model saved at: {compressed_model_path}")
+    return report
\ No newline at end of file
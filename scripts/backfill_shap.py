@@ -1,40 +1,30 @@
 # scripts/backfill_shap_values.py
 
-import os
 from sqlalchemy.orm import Session
 from db.database import SessionLocal
-from db.models import RiskPrediction, Student
-from models.utils.system.shap_explainer import explain_student
+from db.models import RiskPrediction
+from models.utils.system.model_config import get_shap_config
+from api.explanations import materialize_explanations, backfill_explanations
 
-def backfill_missing_shap_values():
+def backfill_missing_shap_values(base_model_dir: str = "models/"):
     db: Session = SessionLocal()
 
     try:
         predictions = db.query(RiskPrediction).filter(RiskPrediction.shap_values.is_(None)).all()
-        print(f"🧠 Found {len(predictions)} predictions missing SHAP values.")
+        pending = [p for p in predictions if p.shap_pending]
+        legacy = [p for p in predictions if not p.shap_pending]
+        print(f"🧠 Found {len(predictions)} predictions missing SHAP values "
+              f"({len(pending)} pending, {len(legacy)} legacy).")
 
-        updated = 0
-
-        for pred in predictions:
-            student = db.query(Student).filter(Student.student_number == pred.student_number).first()
-            if not student:
-                print(f"⚠️ Skipping missing student {pred.student_number}")
-                continue
-
-            student_dict = student.__dict__.copy()
-            student_dict.pop("_sa_instance_state", None)
-
-            try:
-                shap_values = explain_student(student_dict)
-                pred.shap_values = shap_values
-                updated += 1
-                print(f"✅ Backfilled SHAP for {pred.student_number} / phase {pred.model_phase}")
-            except Exception as e:
-                print(f"❌ Failed to generate SHAP for {pred.student_number}: {e}")
+        # Pending rows go through the lazy path, with its input and model version checks
+        updated = materialize_explanations(db, pending, base_model_dir)
+        updated += backfill_explanations(db, legacy, get_shap_config().get("bulk_mode", "exact"), base_model_dir)
 
         db.commit()
         print(f"✅ Done. {updated} predictions updated with SHAP values.")
-
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
 
@@ -0,0 +1,33 @@
+# scripts/build_neighbor_index.py
+
+import os
+import pickle
+import argparse
+import pandas as pd
+from models.feature_sets import PHASE_FIELDS
+from models.utils.system.artifact_registry import get_artifact_dir
+from models.utils.system.neighbor_index import build_neighbor_index
+
+def build_all_phases(base_model_dir: str = "models/"):
+    """(Re)builds every phase's neighbor index from its ready training split, without retraining KNN."""
+    for phase in PHASE_FIELDS:
+        try:
+            ready_dir = os.path.join(base_model_dir, phase, "data", "ready")
+            X_train = pd.read_csv(os.path.join(ready_dir, "X_train.csv"))
+            y_train = pd.read_csv(os.path.join(ready_dir, "y_train.csv")).iloc[:, 0]
+
+            model_dir = get_artifact_dir(phase, base_model_dir)
+            knn_path = os.path.join(model_dir, "knn_model.pkl")
+            knn_model = None
+            if os.path.exists(knn_path):
+                with open(knn_path, "rb") as f:
+                    knn_model = pickle.load(f)
+            build_neighbor_index(model_dir, X_train, y_train, knn_model=knn_model)
+        except Exception as e:
+            print(f"❌ Failed to build {phase} neighbor index: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the KD-tree neighbor indexes behind the similar students endpoint.")
+    parser.add_argument("--base-model-dir", default="models/")
+    args = parser.parse_args()
+    build_all_phases(args.base_model_dir)
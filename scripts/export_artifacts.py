@@ -0,0 +1,19 @@
+# scripts/export_artifacts.py
+
+import argparse
+from models.feature_sets import PHASE_FIELDS
+from models.utils.system.array_artifacts import export_phase_artifacts
+
+def export_all_phases(base_model_dir: str = "models/"):
+    for phase in PHASE_FIELDS:
+        try:
+            manifest_path = export_phase_artifacts(phase, base_model_dir)
+            print(f"✅ Exported {phase} artifacts to {manifest_path}")
+        except Exception as e:
+            print(f"❌ Failed to export {phase} artifacts: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert pickled model artifacts to the memory-mapped array format.")
+    parser.add_argument("--base-model-dir", default="models/")
+    args = parser.parse_args()
+    export_all_phases(args.base_model_dir)
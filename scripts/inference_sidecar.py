@@ -0,0 +1,24 @@
+# scripts/inference_sidecar.py
+
+import argparse
+from models.utils.system.model_config import get_inference_config
+from models.utils.system.sidecar import InferenceSidecar
+from api.explanations import start_explanation_worker, stop_explanation_worker
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve model scoring and SHAP explanations over a local Unix socket.")
+    parser.add_argument("--socket", default=get_inference_config().get("sidecar_socket") or "/tmp/edps-inference.sock")
+    parser.add_argument("--base-model-dir", default="models/")
+    args = parser.parse_args()
+
+    server = InferenceSidecar(args.socket, args.base_model_dir)
+    print(f"✅ Inference sidecar listening on {args.socket}")
+    # Pending explanations are filled here, next to the models, instead of in every API worker
+    start_explanation_worker(base_model_dir=args.base_model_dir)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_explanation_worker()
+        server.server_close()
@@ -0,0 +1,21 @@
+# scripts/rebuild_shap_importance.py
+
+from sqlalchemy.orm import Session
+from db.database import SessionLocal
+from api.shap_importance import rebuild_shap_importance
+
+def main():
+    db: Session = SessionLocal()
+
+    try:
+        aggregated = rebuild_shap_importance(db)
+        db.commit()
+        print(f"✅ Done. SHAP importance rebuilt from {aggregated} explained predictions.")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
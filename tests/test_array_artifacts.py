@@ -0,0 +1,122 @@
+import unittest
+import os
+import pickle
+import tempfile
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from models.utils.system.array_artifacts import export_phase_artifacts, export_artifacts, ArrayStandardScaler, _verify_array
+from models.utils.system.artifact_registry import artifact_registry, get_model_path, get_artifact_dir
+from models.utils.system.flat_forest import FlatForest
+from models.utils.system.inference import predict_and_explain_students
+from models.utils.system.prediction_cache import prediction_cache
+from tests.utils import build_phase_artifacts, make_student
+
+class TestArrayArtifacts(unittest.TestCase):
+    """Tests for the pickle-free, memory-mapped artifact format"""
+
+    def setUp(self):
+        artifact_registry.clear()
+        prediction_cache.clear()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.base_dir = self.tmp_dir.name
+        build_phase_artifacts(self.base_dir)
+        phases = ["early", "mid", "final"]
+        self.cohort = [make_student(seed, phases[seed % 3]) for seed in range(12)]
+
+    def tearDown(self):
+        artifact_registry.clear()
+        prediction_cache.clear()
+        self.tmp_dir.cleanup()
+
+    def _score(self):
+        artifact_registry.clear()
+        prediction_cache.clear()
+        return predict_and_explain_students(self.cohort, base_model_dir=self.base_dir)
+
+    def test_export_matches_pickles(self):
+        """Test that scores and SHAP values from the array format match the pickled artifacts"""
+        expected = self._score()
+        for phase in ["early", "mid", "final"]:
+            export_phase_artifacts(phase, self.base_dir)
+
+        with patch('pickle.load') as mock_load:
+            actual = self._score()
+        mock_load.assert_not_called()
+
+        for e, a in zip(expected.itertuples(), actual.itertuples()):
+            self.assertEqual(e.probability, a.probability)
+            self.assertEqual(e.phase, a.phase)
+            for feature, value in e.shap_values.items():
+                self.assertAlmostEqual(a.shap_values[feature], value, places=12)
+
+    def test_model_arrays_are_memory_mapped(self):
+        """Test that forest arrays are served from memory maps"""
+        export_phase_artifacts("mid", self.base_dir)
+        model = artifact_registry.load_model("mid", self.base_dir)
+
+        self.assertIsInstance(model, FlatForest)
+        self.assertIsInstance(model.threshold, np.memmap)
+        self.assertTrue(get_model_path("mid", self.base_dir).endswith("manifest.json"))
+
+    def test_corrupted_array_is_rejected(self):
+        """Test that an array file not matching its manifest checksum fails to load, and is checked once per version"""
+        manifest_path = export_phase_artifacts("mid", self.base_dir)
+        with patch("models.utils.system.array_artifacts._verify_array", wraps=_verify_array) as mock_verify:
+            artifact_registry.load_model("mid", self.base_dir)
+            verified = mock_verify.call_count
+            artifact_registry.load_model("mid", self.base_dir)
+        self.assertGreater(verified, 0)
+        self.assertEqual(mock_verify.call_count, verified)  # cached load: not re-hashed
+
+        artifact_registry.clear()
+        arrays_dir = os.path.dirname(manifest_path)
+        path = os.path.join(arrays_dir, next(f for f in sorted(os.listdir(arrays_dir)) if f.endswith("threshold.npy")))
+        with open(path, "r+b") as f:
+            f.seek(-8, os.SEEK_END)
+            f.write(b"\xff" * 8)
+        with self.assertRaisesRegex(ValueError, "manifest checksum"):
+            artifact_registry.load_model("mid", self.base_dir)
+
+    def test_logistic_regression_export(self):
+        """Test that an exported logistic regression scores like the original"""
+        model_dir = get_artifact_dir("mid", self.base_dir)
+        with open(os.path.join(model_dir, "logreg_model.pkl"), "rb") as f:
+            logreg = pickle.load(f)
+        export_phase_artifacts("mid", self.base_dir)
+
+        exported = artifact_registry.load_model("mid", self.base_dir, family="logistic_regression")
+        X = pd.DataFrame(np.random.RandomState(0).normal(size=(20, len(logreg.feature_names_in_))),
+                         columns=logreg.feature_names_in_)
+        np.testing.assert_allclose(exported.predict_proba(X), logreg.predict_proba(X), rtol=1e-12)
+
+    def test_encoders_and_scaler_round_trip(self):
+        """Test that exported encoders and scaler transform like the sklearn objects"""
+        encoder = LabelEncoder().fit(["F", "M", "X"])
+        frame = pd.DataFrame({"a": [1.0, 2.0, 4.0], "b": [10.0, 0.0, 5.0]})
+        scaler = StandardScaler().fit(frame)
+        model_dir = get_artifact_dir("mid", self.base_dir)
+        export_artifacts(model_dir, {}, encoders={"gender": encoder}, scaler=scaler, feature_names=["a", "b"])
+
+        encoders = artifact_registry.load_encoders(model_dir)
+        exported_scaler = artifact_registry.load_scaler(model_dir)
+
+        self.assertEqual(list(encoders["gender"].classes_), ["F", "M", "X"])
+        self.assertEqual(encoders["gender"].transform(["X", "F"]).tolist(), [2, 0])
+        self.assertIsInstance(exported_scaler, ArrayStandardScaler)
+        np.testing.assert_allclose(exported_scaler.transform(frame), scaler.transform(frame))
+        self.assertEqual(artifact_registry.load_feature_names(model_dir), ["a", "b"])
+
+    def test_newer_pickle_wins_over_stale_export(self):
+        """Test that a pickle rewritten after the export is served instead of the export"""
+        export_phase_artifacts("early", self.base_dir)
+        pickle_path = os.path.join(get_artifact_dir("early", self.base_dir), "random_forest_model.pkl")
+        manifest_mtime = os.stat(get_model_path("early", self.base_dir)).st_mtime_ns
+        os.utime(pickle_path, ns=(manifest_mtime + 1_000_000, manifest_mtime + 1_000_000))
+
+        self.assertEqual(get_model_path("early", self.base_dir), pickle_path)
+
+if __name__ == '__main__':
+    unittest.main()
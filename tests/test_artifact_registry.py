@@ -0,0 +1,96 @@
+import unittest
+import os
+import pickle
+import tempfile
+import threading
+from unittest.mock import patch
+
+from models.utils.system.artifact_registry import ArtifactRegistry, get_artifact_dir
+
+class TestArtifactRegistry(unittest.TestCase):
+    """Tests for the process-wide artifact registry"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.registry = ArtifactRegistry()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, obj):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "wb") as f:
+            pickle.dump(obj, f)
+        return path
+
+    def test_get_artifact_dir(self):
+        """Test the per-phase artifact directory layout"""
+        self.assertEqual(get_artifact_dir("early"), "models/early/artifacts")
+        self.assertEqual(get_artifact_dir("mid", "/custom"), "/custom/mid/artifacts")
+
+    def test_load_is_cached(self):
+        """Test that an unchanged file is unpickled only once"""
+        path = self._write("scaler.pkl", {"mean": [1.0]})
+
+        with patch("pickle.load", wraps=pickle.load) as mock_load:
+            first = self.registry.load(path)
+            second = self.registry.load(path)
+
+        self.assertIs(first, second)
+        self.assertEqual(mock_load.call_count, 1)
+
+    def test_load_reloads_changed_file(self):
+        """Test that a file is reloaded when it changes on disk"""
+        path = self._write("scaler.pkl", {"version": 1})
+        self.assertEqual(self.registry.load(path), {"version": 1})
+
+        self._write("scaler.pkl", {"version": 2, "extra": True})
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        self.assertEqual(self.registry.load(path), {"version": 2, "extra": True})
+
+    def test_derived_rebuilt_with_source(self):
+        """Test that derived objects follow their source artifacts"""
+        path = self._write("model.pkl", [1, 2, 3])
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return sum(self.registry.load(path))
+
+        self.assertEqual(self.registry.derived("total", [path], factory), 6)
+        self.assertEqual(self.registry.derived("total", [path], factory), 6)
+        self.assertEqual(len(calls), 1)
+
+        self._write("model.pkl", [10, 20, 30, 40])
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        self.assertEqual(self.registry.derived("total", [path], factory), 100)
+        self.assertEqual(len(calls), 2)
+
+    def test_load_model_missing(self):
+        """Test that a missing phase model raises FileNotFoundError"""
+        with self.assertRaises(FileNotFoundError) as context:
+            self.registry.load_model("early", self.tmp_dir.name)
+        self.assertIn("Model not found", str(context.exception))
+
+    def test_concurrent_loads_unpickle_once(self):
+        """Test that concurrent first loads share a single unpickle"""
+        path = self._write("label_encoders.pkl", {"gender": ["F", "M"]})
+        results = []
+
+        with patch("pickle.load", wraps=pickle.load) as mock_load:
+            threads = [threading.Thread(target=lambda: results.append(self.registry.load(path))) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(mock_load.call_count, 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(r is results[0] for r in results))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import pickle
+import unittest
+import tempfile
+from unittest.mock import patch
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.neighbors import KNeighborsClassifier
+
+from models.utils.system.artifact_registry import artifact_registry, get_artifact_dir, get_model_version, get_model_path
+from models.utils.system.prediction_cache import prediction_cache
+from models.utils.system.prediction import prepare_phase_batch
+from models.utils.system.inference import predict_and_explain_students, get_served_version, to_inference
+from models.utils.system.ensemble import get_ensemble_weights, check_ensemble_members
+from models.utils.system.model_config import get_ensemble_config
+from models.utils.system.warmup import WarmupState, warm_up
+from models.utils.system.sidecar import encode_response, decode_response
+from tests.utils import build_phase_artifacts, make_student, PHASE_FEATURES
+
+WEIGHTS = {"random_forest": 2, "logistic_regression": 1, "knn": 1}
+
+class TestEnsemble(unittest.TestCase):
+    """Tests for multi-model ensemble scoring"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+
+        # A KNN pipeline like train_optimized_knn saves, fitted on the preprocessed training inputs
+        for phase in PHASE_FEATURES:
+            history = [make_student(seed, phase) for seed in range(200)]
+            _, X = prepare_phase_batch(list(enumerate(history)), phase, cls.base_dir)
+            y = (X["admission_grade"] > 0).astype(int)
+            knn = Pipeline([("scaler", StandardScaler()), ("knn", KNeighborsClassifier(n_neighbors=5))]).fit(X, y)
+            with open(os.path.join(get_artifact_dir(phase, cls.base_dir), "knn_model.pkl"), "wb") as f:
+                pickle.dump(knn, f)
+
+        cls.ensemble = {"enabled": True, "weights": WEIGHTS}
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        prediction_cache.clear()
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        prediction_cache.clear()
+
+    def _member_probability(self, family, student, phase):
+        _, X = prepare_phase_batch([(0, student)], phase, self.base_dir)
+        model = artifact_registry.load_model(phase, self.base_dir, family=family)
+        return model.predict_proba(X[list(model.feature_names_in_)])[0, 1]
+
+    def test_weighted_mean_of_members(self):
+        """Test that the ensemble score is the normalised weighted mean of the member scores, from one preprocessing pass"""
+        phases = ["early", "mid", "final"]
+        cohort = [make_student(seed, phases[seed % 3]) for seed in range(6)]
+        with patch("models.utils.system.inference.prepare_phase_batch", wraps=prepare_phase_batch) as mock_prepare:
+            results = predict_and_explain_students(cohort, base_model_dir=self.base_dir, ensemble=self.ensemble)
+        self.assertEqual(mock_prepare.call_count, 3)  # once per phase, shared by every member
+
+        for student, row in zip(cohort, results.itertuples()):
+            self.assertEqual(row.scoring_tier, "ensemble")
+            self.assertEqual(set(row.model_scores), set(WEIGHTS))
+            for family, probability in row.model_scores.items():
+                self.assertAlmostEqual(probability, self._member_probability(family, student, row.phase), places=12)
+            expected = (2 * row.model_scores["random_forest"] + row.model_scores["logistic_regression"]
+                        + row.model_scores["knn"]) / 4
+            self.assertAlmostEqual(row.probability, expected, places=12)
+            self.assertTrue(row.shap_values)  # still explained by the served forest
+
+    def test_version_tracks_members_and_weights(self):
+        """Test that the ensemble has its own model version, which changes with the weights"""
+        version = get_served_version("mid", self.base_dir, cascade={}, ensemble=self.ensemble)
+        reweighted = get_served_version("mid", self.base_dir, cascade={},
+                                        ensemble={"enabled": True, "weights": {**WEIGHTS, "knn": 3}})
+        self.assertNotEqual(version, get_model_version("mid", self.base_dir))
+        self.assertNotEqual(version, reweighted)
+        self.assertEqual(get_served_version("mid", self.base_dir, cascade={}, ensemble={"enabled": False}),
+                         get_model_version("mid", self.base_dir))
+
+    def test_cascade_escalates_to_ensemble(self):
+        """Test that with the cascade only escalated students get member scores"""
+        cohort = [make_student(seed, "final") for seed in range(20)]
+        cascade = {"enabled": True, "uncertainty_band": [0.4, 0.6], "alert_threshold": 0.9}
+        results = predict_and_explain_students(cohort, base_model_dir=self.base_dir, cascade=cascade, ensemble=self.ensemble)
+        self.assertEqual(set(results["scoring_tier"]), {"screen", "escalated"})
+        for row in results.itertuples():
+            if row.scoring_tier == "screen":
+                self.assertIsNone(row.model_scores)
+            else:
+                self.assertEqual(set(row.model_scores), set(WEIGHTS))
+
+    def test_invalid_weights_raise(self):
+        """Test that unknown members and non-positive weights are rejected"""
+        self.assertEqual(get_ensemble_weights({"weights": {"knn": 1, "xgboost": 3}}), {"knn": 0.25, "xgboost": 0.75})
+        for weights in [{}, {"svm": 1}, {"knn": -1, "random_forest": 2}, {"knn": 0}]:
+            with self.assertRaises(ValueError):
+                get_ensemble_weights({"weights": weights})
+
+    def test_unloadable_member_fails_warm_up(self):
+        """Test that a member that cannot load fails warm-up with a message naming it"""
+        broken = {"enabled": True, "weights": {**WEIGHTS, "xgboost": 1}}
+        with self.assertRaisesRegex(RuntimeError, "Ensemble member 'xgboost' cannot be loaded for phase 'mid'"):
+            check_ensemble_members("mid", self.base_dir, broken)
+        check_ensemble_members("mid", self.base_dir, self.ensemble)
+        check_ensemble_members("mid", self.base_dir, {"enabled": False, "weights": {"xgboost": 1}})
+
+        state = WarmupState()
+        with patch("models.utils.system.ensemble.get_ensemble_config", return_value=broken):
+            snapshot = warm_up(self.base_dir, state=state)
+        self.assertFalse(state.ready)
+        self.assertTrue(all("xgboost" in status for status in snapshot["phases"].values()))
+
+    def test_shipped_weights_use_committed_members(self):
+        """Test that the default ensemble only names members whose artifacts ship for every phase"""
+        for family in get_ensemble_weights(get_ensemble_config()):
+            for phase in PHASE_FEATURES:
+                self.assertTrue(os.path.isfile(get_model_path(phase, "models/", family=family)), (phase, family))
+
+    def test_member_scores_survive_sidecar_protocol(self):
+        """Test that member scores travel through the sidecar wire format"""
+        results = predict_and_explain_students([make_student(1, "mid")], base_model_dir=self.base_dir, ensemble=self.ensemble)
+        (inference, error), = decode_response(encode_response(results))[0]
+        self.assertIsNone(error)
+        self.assertEqual(inference, to_inference(results.iloc[0]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from db.database import Base
+from db.models import Student, StudentFeatureVector
+from api.feature_vectors import load_phase_vectors, refresh_feature_vectors
+from api.routes.prediction import score_all_students
+from models.utils.system.artifact_registry import artifact_registry, get_preprocessing_version
+from models.utils.system.inference import predict_and_explain_students
+from models.utils.system.prediction import prepare_phase_batch
+from models.utils.system.prediction_cache import prediction_cache
+from tests.utils import make_student, build_phase_artifacts
+
+class TestFeatureVectorStore(unittest.TestCase):
+    """Tests for the persisted preprocessed vector per (student, phase, preprocessing version)"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        prediction_cache.clear()
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        prediction_cache.clear()
+        engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        self.db = self.session_factory()
+        self.students = [make_student(seed, "mid") for seed in range(5)]
+        for student in self.students:
+            self.db.add(Student(**student))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_vectors_match_preprocessing(self):
+        """Test that stored vectors are the float32 preprocessed rows"""
+        vectors = load_phase_vectors(self.db, self.students, "mid", self.base_dir)
+        self.db.commit()
+
+        _, expected = prepare_phase_batch(list(enumerate(self.students)), "mid", self.base_dir)
+        np.testing.assert_array_equal(np.array(vectors), expected.to_numpy().astype(np.float32))
+        self.assertEqual(self.db.query(StudentFeatureVector).count(), len(self.students))
+
+    def test_unchanged_students_are_not_preprocessed(self):
+        """Test that a second read serves every vector from the store"""
+        load_phase_vectors(self.db, self.students, "mid", self.base_dir)
+        self.db.commit()
+
+        with patch('api.feature_vectors.prepare_phase_batch') as mock_prepare:
+            load_phase_vectors(self.db, self.students, "mid", self.base_dir)
+        mock_prepare.assert_not_called()
+
+    def test_changed_student_is_refreshed(self):
+        """Test that editing a student's features rebuilds only that student's vector"""
+        refresh_feature_vectors(self.db, self.db.query(Student).all(), self.base_dir)
+        self.db.commit()
+        before = {v.student_number: v.vector for v in self.db.query(StudentFeatureVector)}
+
+        changed = self.db.query(Student).filter(Student.student_number == "S00002").one()
+        changed.admission_grade += 5
+        refresh_feature_vectors(self.db, [changed], self.base_dir)
+        self.db.commit()
+
+        after = {v.student_number: v.vector for v in self.db.query(StudentFeatureVector)}
+        self.assertNotEqual(after.pop("S00002"), before.pop("S00002"))
+        self.assertEqual(after, before)
+
+    def test_phase_change_drops_other_phase_vectors(self):
+        """Test that a student moved to a later phase keeps only the vector of its current phase"""
+        refresh_feature_vectors(self.db, self.db.query(Student).all(), self.base_dir)
+        self.db.commit()
+
+        moved = self.db.query(Student).filter(Student.student_number == "S00002").one()
+        moved.curricular_units_2nd_sem_grade = 12.5
+        refresh_feature_vectors(self.db, [moved], self.base_dir)
+        self.db.commit()
+
+        phases = {(v.student_number, v.phase) for v in self.db.query(StudentFeatureVector)}
+        self.assertIn(("S00002", "final"), phases)
+        self.assertNotIn(("S00002", "mid"), phases)
+        self.assertEqual(len(phases), len(self.students))
+
+    def test_read_only_load_leaves_store_untouched(self):
+        """Test that persist=False computes the same vectors without writing them"""
+        vectors = load_phase_vectors(self.db, self.students, "mid", self.base_dir, persist=False)
+        self.assertEqual(self.db.query(StudentFeatureVector).count(), 0)
+        self.assertFalse(self.db.new or self.db.dirty)
+
+        stored = load_phase_vectors(self.db, self.students, "mid", self.base_dir)
+        np.testing.assert_array_equal(np.array(vectors), np.array(stored))
+
+    def test_new_preprocessing_version_gets_new_vectors(self):
+        """Test that vectors are keyed by the preprocessing version"""
+        load_phase_vectors(self.db, self.students, "mid", self.base_dir)
+        self.db.commit()
+        version = get_preprocessing_version("mid", self.base_dir)
+
+        scaler_path = os.path.join(self.base_dir, "mid", "artifacts", "scaler.pkl")
+        with open(scaler_path, "rb") as f:
+            original = f.read()
+        try:
+            with open(scaler_path, "ab") as f:
+                f.write(b"\0")
+            self.assertNotEqual(get_preprocessing_version("mid", self.base_dir), version)
+            load_phase_vectors(self.db, self.students, "mid", self.base_dir)
+            self.db.commit()
+        finally:
+            with open(scaler_path, "wb") as f:
+                f.write(original)
+
+        # The new version's vectors replace the old ones
+        versions = {v.preprocessing_version for v in self.db.query(StudentFeatureVector)}
+        self.assertEqual(self.db.query(StudentFeatureVector).count(), len(self.students))
+        self.assertNotIn(version, versions)
+
+    def test_concurrent_refresh_upserts(self):
+        """Test that a vector written by another session after the lookup is overwritten, not duplicated"""
+        version = get_preprocessing_version("mid", self.base_dir)
+
+        def concurrent_writer(*args, **kwargs):
+            # Another writer stores the same key between this call's lookup and its write
+            other = self.session_factory()
+            other.add(StudentFeatureVector(student_number="S00001", phase="mid", preprocessing_version=version,
+                                           input_hash="other", vector=b"\0" * 4))
+            other.commit()
+            other.close()
+            return prepare_phase_batch(*args, **kwargs)
+
+        with patch("api.feature_vectors.prepare_phase_batch", side_effect=concurrent_writer):
+            vectors = load_phase_vectors(self.db, self.students, "mid", self.base_dir)
+        self.db.commit()
+
+        self.assertEqual(self.db.query(StudentFeatureVector).count(), len(self.students))
+        stored = self.db.query(StudentFeatureVector).filter(StudentFeatureVector.student_number == "S00001").one()
+        self.assertNotEqual(stored.input_hash, "other")
+        np.testing.assert_array_equal(np.frombuffer(stored.vector, dtype="<f4"), vectors[1])
+
+    def test_bulk_scoring_reads_the_store(self):
+        """Test that bulk scoring from stored vectors gives the same scores without preprocessing"""
+        list(score_all_students(self.db, self.base_dir))
+        self.db.commit()
+        prediction_cache.clear()
+
+        with patch('models.utils.system.prediction.preprocess_batch_for_inference') as mock_preprocess:
+            scored = list(score_all_students(self.db, self.base_dir))
+        mock_preprocess.assert_not_called()
+
+        results = predict_and_explain_students(self.students, self.base_dir, use_cache=False)
+        expected = {s["student_number"]: p for s, p in zip(self.students, results["probability"])}
+        self.assertEqual(len(scored), len(self.students))
+        for row, inference, _ in scored:
+            self.assertAlmostEqual(inference.probability, expected[row.student_number], places=12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from models.utils.system.flat_forest import FlatForest, is_flattenable
+
+class TestFlatForest(unittest.TestCase):
+    """Tests for the flat-array forest evaluator"""
+
+    def setUp(self):
+        self.X, self.y = make_classification(n_samples=300, n_features=8, random_state=0)
+
+    def test_matches_sklearn_probabilities(self):
+        """Test that probabilities are identical to sklearn for batches and single rows"""
+        for params in [dict(n_estimators=25, max_depth=None), dict(n_estimators=10, max_depth=3, class_weight="balanced")]:
+            model = RandomForestClassifier(random_state=1, **params).fit(self.X, self.y)
+            flat = FlatForest(model)
+
+            np.testing.assert_array_equal(flat.predict_proba(self.X), model.predict_proba(self.X))
+            np.testing.assert_array_equal(flat.predict_proba(self.X[:1]), model.predict_proba(self.X[:1]))
+
+    def test_matches_sklearn_leaves(self):
+        """Test that every row reaches the same leaf as sklearn in every tree"""
+        model = RandomForestClassifier(n_estimators=5, random_state=1).fit(self.X, self.y)
+        flat = FlatForest(model)
+
+        leaves = flat.apply(self.X) - flat.roots
+        np.testing.assert_array_equal(leaves, model.apply(self.X))
+
+    def test_missing_values(self):
+        """Test NaN routing on forests trained with missing values"""
+        X = self.X.copy()
+        X[::7, 2] = np.nan
+        model = RandomForestClassifier(n_estimators=10, random_state=1).fit(X, self.y)
+
+        np.testing.assert_array_equal(FlatForest(model).predict_proba(X), model.predict_proba(X))
+
+    def test_is_flattenable(self):
+        """Test that only tree forests are exported"""
+        forest = RandomForestClassifier(n_estimators=2).fit(self.X, self.y)
+        self.assertTrue(is_flattenable(forest))
+        self.assertFalse(is_flattenable(LogisticRegression().fit(self.X, self.y)))
+
+if __name__ == '__main__':
+    unittest.main()
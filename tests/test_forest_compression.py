@@ -0,0 +1,84 @@
+import unittest
+import os
+import json
+import pickle
+import tempfile
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score
+
+from models.utils.training.randomforest_trainer import train_random_forest, compress_random_forest, _truncate_tree
+
+def make_dataset(n_samples, seed):
+    rng = np.random.RandomState(seed)
+    X = pd.DataFrame(rng.normal(size=(n_samples, 6)), columns=[f"f{i}" for i in range(6)])
+    y = (X["f0"] + 0.5 * X["f1"] + rng.normal(0, 0.5, n_samples) > 0).astype(int)
+    return X, y
+
+class TestForestCompression(unittest.TestCase):
+    """Tests for pruning trained random forests within a validation tolerance"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.X_train, cls.y_train = make_dataset(400, 0)
+        cls.X_val, cls.y_val = make_dataset(200, 1)
+        cls.model = RandomForestClassifier(n_estimators=60, random_state=42).fit(cls.X_train, cls.y_train)
+
+    def test_truncation_at_full_depth_is_identity(self):
+        """Test that cutting a tree at or below its own depth changes nothing"""
+        tree = self.model.estimators_[0]
+        truncated = _truncate_tree(tree, tree.tree_.max_depth)
+        np.testing.assert_array_equal(truncated.predict_proba(self.X_val.to_numpy()), tree.predict_proba(self.X_val.to_numpy()))
+        self.assertEqual(truncated.tree_.node_count, tree.tree_.node_count)
+
+    def test_truncation_drops_deep_nodes(self):
+        """Test that a truncated tree respects the depth limit and shrinks"""
+        tree = self.model.estimators_[0]
+        truncated = _truncate_tree(tree, 2)
+        self.assertEqual(truncated.tree_.max_depth, 2)
+        self.assertLessEqual(truncated.tree_.node_count, 7)
+
+    def test_compressed_forest_within_tolerance(self):
+        """Test that the compressed forest is smaller and its F1 stays within tolerance"""
+        compressed, report = compress_random_forest(self.model, self.X_val, self.y_val, metric="f1", tolerance=0.02)
+
+        full_f1 = f1_score(self.y_val, self.model.predict(self.X_val))
+        compressed_f1 = f1_score(self.y_val, compressed.predict(self.X_val))
+        self.assertAlmostEqual(report["baseline_score"], full_f1)
+        self.assertAlmostEqual(report["compressed_score"], compressed_f1)
+        self.assertGreaterEqual(compressed_f1, full_f1 - 0.02)
+        self.assertLess(report["compressed_nodes"], report["original_nodes"])
+        self.assertEqual(len(compressed.estimators_), report["compressed_trees"])
+        self.assertEqual(len(self.model.estimators_), 60)
+
+    def test_train_saves_separate_artifact_and_report(self):
+        """Test that train_random_forest(compress=True) writes the pruned model and its size/latency report"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = {}
+            for name, frame in [("X_train", self.X_train), ("y_train", self.y_train.to_frame()),
+                                ("X_val", self.X_val), ("y_val", self.y_val.to_frame())]:
+                paths[name] = os.path.join(tmp_dir, f"{name}.csv")
+                frame.to_csv(paths[name], index=False)
+            model_path = os.path.join(tmp_dir, "artifacts", "random_forest_model.pkl")
+
+            result = train_random_forest(paths["X_train"], paths["y_train"], model_path,
+                                         X_val_path=paths["X_val"], y_val_path=paths["y_val"],
+                                         compress=True, compression_metric="accuracy", compression_tolerance=0.01)
+
+            compressed_path = os.path.join(tmp_dir, "artifacts", "random_forest_model_compressed.pkl")
+            with open(compressed_path, "rb") as f:
+                compressed = pickle.load(f)
+            with open(os.path.join(tmp_dir, "artifacts", "random_forest_compression.json")) as f:
+                report = json.load(f)
+
+        self.assertEqual(result["compression"], report)
+        self.assertEqual(len(compressed.estimators_), report["compressed_trees"])
+        for key in ["original_size_bytes", "compressed_size_bytes"]:
+            self.assertGreater(report[key], 0)
+        for key in ["original_latency", "compressed_latency"]:
+            self.assertIn("single_row_ms", report[key])
+            self.assertIn("batch_ms", report[key])
+
+if __name__ == '__main__':
+    unittest.main()
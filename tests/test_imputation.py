@@ -0,0 +1,114 @@
+import os
+import pickle
+import unittest
+import tempfile
+import importlib.util
+import numpy as np
+import pandas as pd
+
+from models.utils.system.artifact_registry import artifact_registry, get_artifact_dir, get_imputer_path, get_model_version, get_preprocessing_version
+from models.utils.system.imputation import impute_students
+from models.utils.system.inference import predict_and_explain_students
+from models.utils.system.prediction import predict_student
+from models.utils.system.prediction_cache import prediction_cache
+from tests.utils import build_phase_artifacts, make_student
+
+IMPUTE_COLUMNS = ["admission_grade", "previous_qualification_grade"]
+
+class _Imputed:
+    def __init__(self, data):
+        self.data = data
+
+    def complete_data(self, dataset=0):
+        return self.data
+
+class MeanKernel:
+    """Stand-in for a fitted miceforest kernel: fills gaps with the training means."""
+    calls = []
+
+    def __init__(self, means: dict):
+        self.column_names = pd.Index(list(means))
+        self.means = means
+
+    def impute_new_data(self, new_data, random_state=None, random_seed_array=None):
+        MeanKernel.calls.append((len(new_data), random_seed_array))
+        return _Imputed(new_data.fillna(self.means))
+
+class TestImputation(unittest.TestCase):
+    """Tests for inference-time imputation with the persisted MICE kernel"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.base_dir = self.tmp_dir.name
+        build_phase_artifacts(self.base_dir)
+        self.model_dir = get_artifact_dir("mid", self.base_dir)
+        prediction_cache.clear()
+        MeanKernel.calls = []
+
+    def tearDown(self):
+        artifact_registry.clear()
+        prediction_cache.clear()
+        self.tmp_dir.cleanup()
+
+    def _save_kernel(self, kernel):
+        with open(get_imputer_path(self.model_dir), "wb") as f:
+            pickle.dump(kernel, f)
+
+    def test_without_kernel_records_are_unchanged(self):
+        """Test that phases trained without a persisted kernel keep their inputs as they are"""
+        students = [{**make_student(1, "mid"), "admission_grade": None}]
+        self.assertIs(impute_students(students, self.model_dir), students)
+
+    def test_gaps_filled_in_one_batch_call(self):
+        """Test that only students with gaps go through the kernel, all in a single call"""
+        self._save_kernel(MeanKernel({"admission_grade": 150.0, "previous_qualification_grade": 130.0}))
+        cohort = [make_student(seed, "mid") for seed in range(6)]
+        cohort[1]["admission_grade"] = None
+        cohort[4]["previous_qualification_grade"] = None
+
+        filled = impute_students(cohort, self.model_dir)
+        self.assertEqual(len(MeanKernel.calls), 1)
+        self.assertEqual(MeanKernel.calls[0][0], 2)
+        self.assertEqual(len(MeanKernel.calls[0][1]), 2)  # one record-level seed per imputed student
+        self.assertEqual(filled[1]["admission_grade"], 150.0)
+        self.assertEqual(filled[4]["previous_qualification_grade"], 130.0)
+        self.assertIsNone(cohort[1]["admission_grade"])  # inputs are not modified
+        for seed in (0, 2, 3, 5):
+            self.assertIs(filled[seed], cohort[seed])
+
+    def test_batch_scores_use_imputed_values(self):
+        """Test that batched and single-student scoring both score the imputed record, not a 0-filled one"""
+        self._save_kernel(MeanKernel({"admission_grade": 150.0, "previous_qualification_grade": 130.0}))
+        student = {**make_student(2, "mid"), "admission_grade": None}
+        expected = predict_student({**student, "admission_grade": 150.0}, base_model_dir=self.base_dir)
+
+        row = predict_and_explain_students([student], base_model_dir=self.base_dir).iloc[0]
+        self.assertAlmostEqual(row["probability"], expected, places=12)
+        self.assertAlmostEqual(predict_student(student, base_model_dir=self.base_dir), expected, places=12)
+
+    def test_kernel_is_part_of_versions(self):
+        """Test that adding the kernel changes the model and preprocessing versions"""
+        versions = (get_model_version("mid", self.base_dir), get_preprocessing_version("mid", self.base_dir))
+        self._save_kernel(MeanKernel({"admission_grade": 150.0, "previous_qualification_grade": 130.0}))
+        self.assertNotEqual(get_model_version("mid", self.base_dir), versions[0])
+        self.assertNotEqual(get_preprocessing_version("mid", self.base_dir), versions[1])
+
+    @unittest.skipUnless(importlib.util.find_spec("miceforest"), "miceforest is not installed")
+    def test_persisted_miceforest_kernel(self):
+        """Test that the kernel saved at training time imputes a student the same way in any batch"""
+        from models.utils.data.data_imputer import apply_mice_imputation
+        rng = np.random.RandomState(0)
+        training = pd.DataFrame({"admission_grade": rng.uniform(100, 180, 300)})
+        training["previous_qualification_grade"] = training["admission_grade"] * 0.8 + rng.normal(0, 5, 300)
+        training.loc[::10, "admission_grade"] = np.nan
+        apply_mice_imputation(training, IMPUTE_COLUMNS, kernel_path=get_imputer_path(self.model_dir))
+
+        student = {**make_student(3, "mid"), "admission_grade": None}
+        alone = impute_students([student], self.model_dir)[0]
+        in_batch = impute_students([make_student(4, "mid"), {**make_student(5, "mid"), "previous_qualification_grade": None},
+                                    student], self.model_dir)[2]
+        self.assertIsNotNone(alone["admission_grade"])
+        self.assertEqual(alone["admission_grade"], in_batch["admission_grade"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,247 @@
+import unittest
+import tempfile
+from unittest.mock import patch
+
+import os
+import numpy as np
+import pandas as pd
+from models.utils.system.artifact_registry import artifact_registry, get_model_version
+from models.utils.system.prediction_cache import prediction_cache
+from models.utils.system.inference import predict_and_explain_student, predict_and_explain_students, needs_escalation, score_what_if, check_what_if_size
+from api.schemas import WhatIfRange
+from models.utils.system.prediction import predict_student, unique_rows, prepare_phase_batch
+from models.utils.system.preprocessing import preprocess_batch_for_inference
+from models.utils.system.shap_explainer import explain_student
+from tests.utils import build_phase_artifacts, make_student
+
+class TestPredictAndExplain(unittest.TestCase):
+    """Tests for the fused predict-and-explain pass"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        prediction_cache.clear()
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        prediction_cache.clear()
+
+    def test_matches_separate_calls(self):
+        """Test that the fused pass matches predict_student and explain_student"""
+        phases = ["early", "mid", "final"]
+        cohort = [make_student(seed, phases[seed % 3]) for seed in range(9)]
+        results = predict_and_explain_students(cohort, base_model_dir=self.base_dir)
+
+        for student, row in zip(cohort, results.itertuples()):
+            score, phase = predict_student(student, base_model_dir=self.base_dir, return_phase=True)
+            shap_values = explain_student(student, base_model_dir=self.base_dir)
+            self.assertEqual(row.probability, score)
+            self.assertEqual(row.phase, phase)
+            for feature, value in shap_values.items():
+                self.assertAlmostEqual(row.shap_values[feature], value, places=10)
+
+    def test_preprocesses_once_per_phase(self):
+        """Test that each phase group is preprocessed a single time"""
+        cohort = [make_student(seed, "mid") for seed in range(5)]
+        with patch('models.utils.system.prediction.preprocess_batch_for_inference',
+                   wraps=preprocess_batch_for_inference) as mock_preprocess:
+            predict_and_explain_students(cohort, base_model_dir=self.base_dir)
+        self.assertEqual(mock_preprocess.call_count, 1)
+
+    def test_unchanged_inputs_served_from_cache(self):
+        """Test that an unchanged (input, model version) pair is neither re-scored nor re-explained"""
+        cohort = [make_student(seed, "mid") for seed in range(4)]
+        first = predict_and_explain_students(cohort, base_model_dir=self.base_dir)
+
+        cohort[0]["admission_grade"] += 1
+        with patch('models.utils.system.prediction.preprocess_batch_for_inference',
+                   wraps=preprocess_batch_for_inference) as mock_preprocess:
+            second = predict_and_explain_students(cohort, base_model_dir=self.base_dir)
+
+        self.assertEqual(len(mock_preprocess.call_args.args[0]), 1)
+        self.assertNotEqual(first.iloc[0]["input_hash"], second.iloc[0]["input_hash"])
+        for i in range(1, 4):
+            self.assertEqual(first.iloc[i]["probability"], second.iloc[i]["probability"])
+            self.assertEqual(first.iloc[i]["shap_values"], second.iloc[i]["shap_values"])
+            self.assertEqual(first.iloc[i]["input_hash"], second.iloc[i]["input_hash"])
+
+    def test_model_version_follows_artifacts(self):
+        """Test that the model version changes when a phase artifact changes"""
+        version = get_model_version("early", self.base_dir)
+        self.assertEqual(version, get_model_version("early", self.base_dir))
+        self.assertNotEqual(version, get_model_version("mid", self.base_dir))
+
+        scaler_path = os.path.join(self.base_dir, "early", "artifacts", "scaler.pkl")
+        with open(scaler_path, "rb") as f:
+            original = f.read()
+        try:
+            with open(scaler_path, "ab") as f:
+                f.write(b"\0")
+            self.assertNotEqual(version, get_model_version("early", self.base_dir))
+        finally:
+            with open(scaler_path, "wb") as f:
+                f.write(original)
+
+    def test_shap_mode_is_part_of_cache_key(self):
+        """Test that an approximate request is not served an exact cached result, and records its bound"""
+        cohort = [make_student(seed, "mid") for seed in range(4)]
+        exact = predict_and_explain_students(cohort, base_model_dir=self.base_dir)
+        approximate = predict_and_explain_students(cohort, base_model_dir=self.base_dir, shap_mode="saabas")
+
+        self.assertEqual(set(exact["shap_mode"]), {"exact"})
+        self.assertEqual(set(exact["shap_error_bound"]), {0.0})
+        self.assertEqual(set(approximate["shap_mode"]), {"saabas"})
+        self.assertGreater(approximate.iloc[0]["shap_error_bound"], 0.0)
+        self.assertEqual(list(exact["probability"]), list(approximate["probability"]))
+
+    def test_duplicate_inputs_scored_once(self):
+        """Test that repeated model inputs are scored and explained once and scattered back"""
+        distinct = [make_student(seed, "early") for seed in range(3)]
+        cohort = [dict(distinct[i % 3], student_number=f"D{i:05d}") for i in range(12)]
+        results = predict_and_explain_students(cohort, base_model_dir=self.base_dir)
+
+        self.assertEqual(results.attrs["scored_inputs"], 12)
+        self.assertEqual(results.attrs["unique_inputs"], 3)
+        for i, row in enumerate(results.itertuples()):
+            reference = results.iloc[i % 3]
+            self.assertEqual(row.probability, reference["probability"])
+            self.assertEqual(row.shap_values, reference["shap_values"])
+        self.assertIsNot(results.iloc[0]["shap_values"], results.iloc[3]["shap_values"])
+
+    def test_unique_rows(self):
+        """Test that unique_rows maps every row to its first identical row, NaNs included"""
+        df = pd.DataFrame({"a": [1.0, 2.0, 1.0, np.nan, np.nan], "b": [0.0, 0.0, 0.0, 1.0, 1.0]})
+        first, inverse = unique_rows(df)
+        self.assertEqual(first.tolist(), [0, 1, 3])
+        self.assertEqual(inverse.tolist(), [0, 1, 0, 2, 2])
+
+    def test_single_student(self):
+        """Test the single-student form and its error for incomplete data"""
+        probability, phase, shap_values = predict_and_explain_student(make_student(4, "final"), base_model_dir=self.base_dir)
+        self.assertEqual(phase, "final")
+        self.assertTrue(0.0 <= probability <= 1.0)
+        self.assertIn("curricular_units_2nd_sem_grade", shap_values)
+
+        with self.assertRaises(ValueError) as context:
+            predict_and_explain_student({"gender": 1}, base_model_dir=self.base_dir)
+        self.assertIn("Not enough data", str(context.exception))
+
+class TestCascade(unittest.TestCase):
+    """Tests for the logistic regression screen in front of the forest"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+        cls.cohort = [make_student(seed, "mid") for seed in range(12)]
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        prediction_cache.clear()
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        prediction_cache.clear()
+
+    def test_disabled_scores_everyone_with_forest(self):
+        """Test that without the cascade every student is scored in full"""
+        results = predict_and_explain_students(self.cohort, base_model_dir=self.base_dir, cascade={})
+        self.assertEqual(set(results["scoring_tier"]), {"full"})
+
+    def test_confident_students_skip_forest(self):
+        """Test that students outside the band and below the alert threshold never reach the forest"""
+        cascade = {"enabled": True, "uncertainty_band": [2.0, 2.0], "alert_threshold": 1.0}
+        with patch('models.utils.system.inference.get_scoring_model') as mock_scorer:
+            results = predict_and_explain_students(self.cohort, base_model_dir=self.base_dir, cascade=cascade)
+
+        mock_scorer.assert_not_called()
+        self.assertEqual(set(results["scoring_tier"]), {"screen"})
+        self.assertTrue(all(row.shap_values for row in results.itertuples()))
+
+    def test_escalated_students_match_full_scoring(self):
+        """Test that escalated students get the same score and SHAP values as the full path"""
+        full = predict_and_explain_students(self.cohort, base_model_dir=self.base_dir, cascade={})
+        cascade = {"enabled": True, "uncertainty_band": [0.0, 1.0], "alert_threshold": 1.0}
+        results = predict_and_explain_students(self.cohort, base_model_dir=self.base_dir, cascade=cascade)
+
+        self.assertEqual(set(results["scoring_tier"]), {"escalated"})
+        self.assertNotEqual(results.iloc[0]["model_version"], full.iloc[0]["model_version"])
+        for expected, row in zip(full.itertuples(), results.itertuples()):
+            self.assertAlmostEqual(row.probability, expected.probability, places=12)
+            self.assertEqual(row.shap_values.keys(), expected.shap_values.keys())
+
+    def test_needs_escalation(self):
+        """Test that the band and the alert threshold are applied to risk (1 - graduation probability)"""
+        cascade = {"uncertainty_band": [0.3, 0.5], "alert_threshold": 0.7}
+        escalate = needs_escalation(np.array([0.9, 0.6, 0.45, 0.2]), cascade)
+        self.assertEqual(escalate.tolist(), [False, True, False, True])
+
+class TestWhatIf(unittest.TestCase):
+    """Tests for batched what-if scoring"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        prediction_cache.clear()
+        cls.tmp_dir.cleanup()
+
+    def test_grid_matches_individual_scoring(self):
+        """Test that every grid point scores like the edited student would, from one model call"""
+        student = make_student(7, "mid")
+        grid = {"curricular_units_1st_sem_grade": [8.0, 12.0, 18.0], "curricular_units_1st_sem_approved": [0, 4]}
+        with patch("models.utils.system.inference.prepare_phase_batch", wraps=prepare_phase_batch) as mock_prepare, \
+                patch("models.utils.system.inference.explain_matrix") as mock_explain:
+            phase, model_version, curve = score_what_if(student, grid, base_model_dir=self.base_dir)
+        mock_prepare.assert_called_once()
+        mock_explain.assert_not_called()
+
+        self.assertEqual(phase, "mid")
+        self.assertEqual(model_version, get_model_version("mid", self.base_dir))
+        self.assertEqual(len(curve), 6)
+        for point in curve.to_dict("records"):
+            edited = {**student, **{k: v for k, v in point.items() if k != "probability"}}
+            expected = predict_student(edited, base_model_dir=self.base_dir)
+            self.assertAlmostEqual(point["probability"], expected, places=12)
+
+    def test_override_routes_phase(self):
+        """Test that supplying a later phase's field scores the grid with that phase model"""
+        phase, _, curve = score_what_if(make_student(8, "mid"), {"curricular_units_2nd_sem_grade": [10.0, 15.0]},
+                                        base_model_dir=self.base_dir)
+        self.assertEqual(phase, "final")
+        self.assertEqual(len(curve), 2)
+
+    def test_invalid_grids_raise(self):
+        """Test that empty, oversized and unknown-feature grids are rejected"""
+        student = make_student(9, "early")
+        for grid, kwargs in [({}, {}), ({"admission_grade": []}, {}),
+                             ({"admission_grade": list(range(20))}, {"max_points": 10}),
+                             ({"notes": [1.0]}, {})]:
+            with self.assertRaises(ValueError):
+                score_what_if(student, grid, base_model_dir=self.base_dir, **kwargs)
+
+    def test_oversized_range_rejected_before_expansion(self):
+        """Test that a huge range is rejected from its length alone, without building its values"""
+        huge = WhatIfRange(start=0, stop=1e8, step=1)
+        self.assertEqual(huge.size(), 100_000_001)
+        with self.assertRaises(ValueError):
+            check_what_if_size({"admission_grade": huge.size()})
+        with self.assertRaises(ValueError):
+            check_what_if_size({"admission_grade": 40, "previous_qualification_grade": 40})
+        self.assertEqual(WhatIfRange(start=10, stop=12, step=0.5).values(), [10.0, 10.5, 11.0, 11.5, 12.0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import tempfile
+from concurrent.futures import wait
+
+from models.utils.system.inference import predict_and_explain_students
+from models.utils.system.inference_service import InferenceService, start_inference_service, get_inference_service, stop_inference_service
+from models.utils.system.artifact_registry import artifact_registry
+from tests.utils import build_phase_artifacts, make_student
+
+class TestInferenceService(unittest.TestCase):
+    """Tests for the micro-batching process pool"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        cls.tmp_dir.cleanup()
+
+    def test_coalesces_concurrent_requests(self):
+        """Test that requests arriving within the wait window share one batch and match in-process results"""
+        phases = ["early", "mid", "final"]
+        cohort = [make_student(seed, phases[seed % 3]) for seed in range(6)]
+        service = InferenceService(self.base_dir, workers=1, max_batch_size=32, max_wait_ms=500)
+        try:
+            futures = [service.submit(student) for student in cohort]
+            wait(futures, timeout=60)
+        finally:
+            service.shutdown()
+
+        self.assertEqual(service.batches_dispatched, 1)
+        expected = predict_and_explain_students(cohort, base_model_dir=self.base_dir)
+        for future, row in zip(futures, expected.itertuples()):
+            inference = future.result()
+            self.assertEqual(inference.probability, row.probability)
+            self.assertEqual(inference.phase, row.phase)
+            self.assertEqual(inference.input_hash, row.input_hash)
+
+    def test_max_batch_size_splits_batches(self):
+        """Test that a full batch is dispatched without waiting for more requests"""
+        cohort = [make_student(seed, "mid") for seed in range(5)]
+        service = InferenceService(self.base_dir, workers=1, max_batch_size=2, max_wait_ms=500)
+        try:
+            futures = [service.submit(student) for student in cohort]
+            wait(futures, timeout=60)
+        finally:
+            service.shutdown()
+
+        self.assertEqual(service.batches_dispatched, 3)
+        self.assertTrue(all(f.exception() is None for f in futures))
+
+    def test_missing_data_raises_per_request(self):
+        """Test that a student without enough data fails only its own request"""
+        service = InferenceService(self.base_dir, workers=1, max_wait_ms=200)
+        try:
+            bad = service.submit({"gender": 1})
+            good = service.submit(make_student(1, "early"))
+            with self.assertRaises(ValueError) as context:
+                bad.result(timeout=60)
+            self.assertEqual(good.result(timeout=60)[1], "early")
+        finally:
+            service.shutdown()
+        self.assertIn("Not enough data", str(context.exception))
+
+    def test_disabled_by_default(self):
+        """Test that the process pool only starts when enabled in config"""
+        self.assertIsNone(start_inference_service({"inference": {"process_pool": False}}))
+        self.assertIsNone(get_inference_service())
+
+        service = start_inference_service({"inference": {"process_pool": True, "workers": 1}}, base_model_dir=self.base_dir)
+        try:
+            self.assertIs(get_inference_service(), service)
+        finally:
+            stop_inference_service()
+        self.assertIsNone(get_inference_service())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import unittest
+import tempfile
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from db.database import Base
+from db.models import Student, RiskPrediction
+from api.routes.prediction import score_all_students, predict_and_save
+from api.shap_importance import get_shap_importance
+from api.explanations import materialize_explanations, backfill_explanations, ExplanationWorker
+from api.schemas import RiskPredictionSchema, RiskPredictionSummarySchema
+from models.utils.system.shap_explainer import top_drivers
+from models.utils.system.inference import predict_and_explain_students
+from models.utils.system.artifact_registry import artifact_registry
+from models.utils.system.prediction_cache import prediction_cache
+from tests.utils import make_student, build_phase_artifacts
+
+class TestLazyShap(unittest.TestCase):
+    """Tests for bulk scoring without SHAP and deferred explanation"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        prediction_cache.clear()
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        prediction_cache.clear()
+        engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        self.db = self.session_factory()
+
+        phases = ["early", "mid", "final"]
+        self.students = [make_student(seed, phases[seed % 3]) for seed in range(6)]
+        for student in self.students:
+            self.db.add(Student(**student))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def _score_lazily(self):
+        with patch('models.utils.system.inference.explain_matrix') as mock_explain:
+            for student, inference, error in score_all_students(self.db, self.base_dir, explain=False):
+                predict_and_save(student, self.db, notify=False, inference=inference)
+        self.db.commit()
+        mock_explain.assert_not_called()
+
+    def test_lazy_bulk_writes_pending_rows(self):
+        """Test that lazy scoring never runs the explainer and flags every row as pending"""
+        self._score_lazily()
+
+        predictions = self.db.query(RiskPrediction).all()
+        self.assertEqual(len(predictions), len(self.students))
+        self.assertTrue(all(p.shap_pending and p.shap_values is None for p in predictions))
+
+    def test_first_read_matches_eager_explanations(self):
+        """Test that materialized explanations equal those an eager run would have stored"""
+        self._score_lazily()
+        predictions = self.db.query(RiskPrediction).order_by(RiskPrediction.student_number).all()
+
+        self.assertEqual(materialize_explanations(self.db, predictions, self.base_dir), len(predictions))
+        self.assertEqual(materialize_explanations(self.db, predictions, self.base_dir), 0)
+
+        eager = predict_and_explain_students(self.students, self.base_dir, use_cache=False)
+        expected = {s["student_number"]: row.shap_values for s, row in zip(self.students, eager.itertuples())}
+        for prediction in predictions:
+            self.assertFalse(prediction.shap_pending)
+            self.assertEqual(prediction.shap_mode, "exact")
+            self.assertEqual(prediction.top_drivers, top_drivers(prediction.shap_values))
+            for feature, value in expected[prediction.student_number].items():
+                self.assertAlmostEqual(prediction.shap_values[feature], value, places=10)
+
+    def test_eager_write_stores_top_drivers(self):
+        """Test that explained predictions store their top drivers, the only SHAP data list views serialize"""
+        for student, inference, error in score_all_students(self.db, self.base_dir):
+            predict_and_save(student, self.db, notify=False, inference=inference)
+        self.db.commit()
+
+        for prediction in self.db.query(RiskPrediction).all():
+            self.assertEqual(len(prediction.top_drivers), min(5, len(prediction.shap_values)))
+            self.assertEqual(prediction.top_drivers, top_drivers(prediction.shap_values))
+            summary = RiskPredictionSummarySchema.model_validate(prediction).model_dump()
+            self.assertNotIn("shap_values", summary)
+            self.assertEqual(summary["top_drivers"], prediction.top_drivers)
+            self.assertEqual(RiskPredictionSchema.model_validate(prediction).shap_values, prediction.shap_values)
+
+    def test_pending_rows_keep_requested_mode(self):
+        """Test that a lazy approximate run is later explained in the mode it requested"""
+        with patch('models.utils.system.inference.explain_matrix') as mock_explain:
+            for student, inference, error in score_all_students(self.db, self.base_dir, shap_mode="saabas", explain=False):
+                predict_and_save(student, self.db, notify=False, inference=inference)
+        self.db.commit()
+        mock_explain.assert_not_called()
+
+        predictions = self.db.query(RiskPrediction).all()
+        self.assertTrue(all(p.shap_pending and p.shap_mode == "saabas" for p in predictions))
+        materialize_explanations(self.db, predictions, self.base_dir)
+        self.assertTrue(all(p.shap_mode == "saabas" and not p.shap_pending for p in predictions))
+
+    def test_changed_student_stays_pending(self):
+        """Test that a student edited after scoring is not explained with the new features"""
+        self._score_lazily()
+        changed = self.db.query(Student).filter(Student.student_number == "S00001").one()
+        changed.admission_grade += 5
+        self.db.commit()
+
+        predictions = self.db.query(RiskPrediction).all()
+        self.assertEqual(materialize_explanations(self.db, predictions, self.base_dir), len(predictions) - 1)
+        stale = next(p for p in predictions if p.student_number == "S00001")
+        self.assertTrue(stale.shap_pending)
+
+    def test_rows_scored_by_another_model_stay_pending(self):
+        """Test that pending scores are not explained by a model swapped in after scoring"""
+        self._score_lazily()
+        predictions = self.db.query(RiskPrediction).all()
+
+        with patch('api.explanations.get_served_version', return_value="retrained") as mock_version:
+            self.assertEqual(materialize_explanations(self.db, predictions, self.base_dir), 0)
+        self.assertTrue(all(p.shap_pending for p in predictions))
+        self.assertEqual({call.args[0] for call in mock_version.call_args_list}, {"early", "mid", "final"})
+        self.assertEqual(mock_version.call_count, 3)  # once per phase
+
+        self.assertEqual(materialize_explanations(self.db, predictions, self.base_dir), len(predictions))
+
+    def test_concurrent_materialization_counts_rows_once(self):
+        """Test that a row already claimed by another session is not explained or aggregated twice"""
+        self._score_lazily()
+        stale_view = self.db.query(RiskPrediction).all()  # loaded while every row is pending
+
+        other = self.session_factory()
+        try:
+            self.assertEqual(materialize_explanations(other, other.query(RiskPrediction).all(), self.base_dir),
+                             len(self.students))
+            other.commit()
+            expected = get_shap_importance(other)
+        finally:
+            other.close()
+
+        self.assertTrue(all(p.shap_pending for p in stale_view))
+        self.assertEqual(materialize_explanations(self.db, stale_view, self.base_dir), 0)
+        self.db.commit()
+        self.assertTrue(all(not p.shap_pending and p.shap_values is not None for p in stale_view))
+        self.assertEqual(get_shap_importance(self.db), expected)
+
+    def test_backfill_leaves_pending_rows_to_lazy_path(self):
+        """Test that the legacy backfill explains unflagged rows on their own phase and skips pending ones"""
+        self._score_lazily()
+        predictions = self.db.query(RiskPrediction).order_by(RiskPrediction.student_number).all()
+        legacy, pending = predictions[:3], predictions[3:]
+        for prediction in legacy:
+            prediction.shap_pending = False
+            prediction.shap_mode = None
+
+        self.assertEqual(backfill_explanations(self.db, predictions, "saabas", self.base_dir), len(legacy))
+        for prediction in legacy:
+            self.assertFalse(prediction.shap_pending)
+            self.assertEqual(prediction.shap_mode, "saabas")
+            self.assertIsNotNone(prediction.shap_error_bound)
+            self.assertEqual(prediction.top_drivers, top_drivers(prediction.shap_values))
+        self.assertTrue(all(p.shap_pending and p.shap_values is None for p in pending))
+
+    def test_background_worker_fills_pending_rows(self):
+        """Test that the worker explains pending rows in batches and commits them"""
+        self._score_lazily()
+        worker = ExplanationWorker(self.base_dir, batch_size=4, session_factory=self.session_factory)
+
+        self.assertEqual(worker.run_once(), 4)
+        self.assertEqual(worker.run_once(), 2)
+        self.assertEqual(worker.run_once(), 0)
+
+        self.db.expire_all()
+        self.assertEqual(self.db.query(RiskPrediction).filter(RiskPrediction.shap_pending == True).count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
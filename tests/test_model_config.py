@@ -0,0 +1,38 @@
+import unittest
+import os
+import tempfile
+
+from models.utils.system.model_config import load_config, get_model_family, DEFAULT_MODEL_FAMILY
+from models.utils.system.artifact_registry import get_model_path
+
+class TestModelConfig(unittest.TestCase):
+    """Tests for the per-phase model family configuration"""
+
+    def test_load_config_missing_file(self):
+        """Test that a missing config file yields an empty config"""
+        self.assertEqual(load_config("/nonexistent/config.yaml"), {})
+
+    def test_load_config_reads_families(self):
+        """Test that model families are read from YAML"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "config.yaml")
+            with open(path, "w") as f:
+                f.write("model:\n  threshold: 0.6\n  families:\n    early: logistic_regression\n")
+            config = load_config(path)
+
+        self.assertEqual(get_model_family("early", config), "logistic_regression")
+        self.assertEqual(get_model_family("final", config), DEFAULT_MODEL_FAMILY)
+
+    def test_unsupported_family(self):
+        """Test that an unknown family is rejected"""
+        with self.assertRaises(ValueError) as context:
+            get_model_family("mid", {"model": {"families": {"mid": "svm"}}})
+        self.assertIn("Unsupported model family", str(context.exception))
+
+    def test_model_path_per_family(self):
+        """Test that each family resolves to its own artifact file"""
+        self.assertEqual(get_model_path("mid", "models/", "logistic_regression"), "models/mid/artifacts/logreg_model.pkl")
+        self.assertEqual(get_model_path("mid", "models/", "random_forest"), "models/mid/artifacts/random_forest_model.pkl")
+
+if __name__ == '__main__':
+    unittest.main()
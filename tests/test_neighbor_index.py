@@ -0,0 +1,83 @@
+import os
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.neighbors import KNeighborsClassifier
+
+from models.utils.system.neighbor_index import build_neighbor_index, find_similar_students
+from models.utils.system.artifact_registry import artifact_registry, get_artifact_dir
+from models.utils.system.prediction import prepare_phase_batch
+from tests.utils import build_phase_artifacts, make_student, PHASE_FEATURES
+
+class TestNeighborIndex(unittest.TestCase):
+    """Tests for the precomputed similar students index"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+
+        # Historical students, preprocessed exactly like the inference inputs
+        rng = np.random.RandomState(0)
+        cls.training = {}
+        for phase in PHASE_FEATURES:
+            history = [make_student(seed, phase) for seed in range(1000, 1300)]
+            _, X_train = prepare_phase_batch(list(enumerate(history)), phase, cls.base_dir)
+            y_train = pd.Series(rng.randint(0, 2, len(history)))
+            knn = Pipeline([("scaler", StandardScaler()), ("knn", KNeighborsClassifier(n_neighbors=7, p=1))]).fit(X_train, y_train)
+            build_neighbor_index(get_artifact_dir(phase, cls.base_dir), X_train, y_train, knn_model=knn)
+            cls.training[phase] = (knn[:-1].transform(X_train), y_train.to_numpy())
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        cls.tmp_dir.cleanup()
+
+    def test_batch_matches_brute_force(self):
+        """Test that a mixed-phase batch returns the same neighbors as a brute-force scan in the KNN space"""
+        phases = ["early", "mid", "final"]
+        cohort = [make_student(seed, phases[seed % 3]) for seed in range(6)]
+        results = find_similar_students(cohort, base_model_dir=self.base_dir)
+
+        for student, row in zip(cohort, results.itertuples()):
+            matrix, outcomes = self.training[row.phase]
+            knn_space = self._knn_space(student, row.phase)
+            expected = np.argsort(np.abs(matrix - knn_space).sum(axis=1), kind="stable")[:7]
+
+            self.assertEqual(len(row.neighbors), 7)  # the trained KNN's n_neighbors
+            self.assertEqual([n["training_row"] for n in row.neighbors], list(expected))
+            self.assertAlmostEqual(row.graduation_rate, outcomes[expected].mean())
+
+    def _knn_space(self, student, phase):
+        _, preprocessed = prepare_phase_batch([(0, student)], phase, self.base_dir)
+        index = artifact_registry.load(os.path.join(get_artifact_dir(phase, self.base_dir), "neighbor_index.pkl"))
+        return index["transform"].transform(preprocessed[index["feature_names"]])[0]
+
+    def test_k_override_and_outcomes(self):
+        """Test that k limits the neighbors, ranked by increasing distance, with readable outcomes"""
+        row = find_similar_students([make_student(3, "mid")], base_model_dir=self.base_dir, k=3).iloc[0]
+        distances = [n["distance"] for n in row["neighbors"]]
+        self.assertEqual([n["rank"] for n in row["neighbors"]], [1, 2, 3])
+        self.assertEqual(distances, sorted(distances))
+        self.assertTrue({n["outcome"] for n in row["neighbors"]} <= {"graduate", "dropout"})
+
+    def test_incomplete_student_gets_error(self):
+        """Test that a student without enough data gets an error instead of neighbors"""
+        results = find_similar_students([{"gender": 1}, make_student(4, "final")], base_model_dir=self.base_dir)
+        self.assertEqual(results.iloc[0]["error"], "Not enough data to make a prediction.")
+        self.assertIsNone(results.iloc[0]["neighbors"])
+        self.assertEqual(results.iloc[1]["phase"], "final")
+
+    def test_missing_index_raises(self):
+        """Test that a phase without a built index raises FileNotFoundError"""
+        with tempfile.TemporaryDirectory() as other:
+            build_phase_artifacts(other, n_samples=50)
+            with self.assertRaises(FileNotFoundError):
+                find_similar_students([make_student(5, "early")], base_model_dir=other)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import os
+import tempfile
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from db.database import Base
+from db.models import Student, RiskPrediction
+from api.routes.prediction import phase_filter, fetch_phase_cohort, score_all_students
+from models.utils.system.prediction import select_phase, get_phase_features
+from models.feature_sets import PHASE_FIELDS
+from models.utils.system.artifact_registry import artifact_registry
+from models.utils.system.prediction_cache import prediction_cache
+from tests.utils import make_student, build_phase_artifacts
+
+class TestPhaseRouting(unittest.TestCase):
+    """Tests for routing students to model phases inside the database query"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+
+        phases = ["early", "mid", "final"]
+        self.students = [make_student(seed, phases[seed % 3]) for seed in range(9)]
+        # 1st semester grade without approvals is not enough for the mid phase
+        self.students[0]["curricular_units_1st_sem_grade"] = 12.0
+        # 2nd semester grade alone is not enough for the final phase
+        self.students[3]["curricular_units_1st_sem_approved"] = None
+        self.students[3]["curricular_units_2nd_sem_grade"] = 11.0
+        for student in self.students:
+            self.db.add(Student(**student))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_sql_routing_matches_python(self):
+        """Test that each phase query returns exactly the students select_phase assigns to it"""
+        for phase in PHASE_FIELDS:
+            routed = {row.student_number for row in self.db.query(Student.student_number).filter(phase_filter(phase))}
+            expected = {s["student_number"] for s in self.students if select_phase(s) == phase}
+            self.assertEqual(routed, expected, phase)
+
+    def test_cohort_selects_phase_features_only(self):
+        """Test that a cohort query only hydrates student_number and the phase model's features"""
+        rows = fetch_phase_cohort(self.db, "early", self.base_dir)
+
+        self.assertTrue(rows)
+        self.assertEqual(list(rows[0]._fields), ["student_number"] + get_phase_features("early", self.base_dir))
+        self.assertNotIn("first_name", rows[0]._fields)
+
+    def test_score_all_students(self):
+        """Test that every student is scored once with the phase chosen by the query"""
+        scored = list(score_all_students(self.db, self.base_dir))
+
+        self.assertEqual(len(scored), len(self.students))
+        for row, inference, error in scored:
+            student = next(s for s in self.students if s["student_number"] == row.student_number)
+            self.assertIsNone(error)
+            self.assertEqual(inference.phase, select_phase(student))
+            self.assertTrue(0.0 <= inference.probability <= 1.0)
+            self.assertIsInstance(inference.shap_values, dict)
+
+    def test_recalculation_skips_unchanged(self):
+        """Test that students whose features and model version match their stored prediction are not re-scored"""
+        for row, inference, _ in score_all_students(self.db, self.base_dir):
+            self.db.add(RiskPrediction(student_number=row.student_number, risk_score=1 - inference.probability, risk_level="low",
+                                       model_phase=inference.phase, shap_values=inference.shap_values,
+                                       input_hash=inference.input_hash, model_version=inference.model_version))
+        changed = self.db.query(Student).filter(Student.student_number == "S00001").one()
+        changed.admission_grade += 5
+        self.db.commit()
+        prediction_cache.clear()
+
+        scored = list(score_all_students(self.db, self.base_dir, skip_unchanged=True))
+
+        rescored = [row.student_number for row, inference, _ in scored if inference is not None]
+        self.assertEqual(rescored, ["S00001"])
+        self.assertEqual(len(scored), len(self.students))
+
+    def test_empty_phases_skip_artifacts(self):
+        """Test that phases without students never load their model"""
+        for student in self.db.query(Student).filter(phase_filter("mid")):
+            self.db.delete(student)
+        self.db.commit()
+
+        with tempfile.TemporaryDirectory() as empty_dir:
+            # Only the mid model is missing; the other phases still need theirs
+            build_phase_artifacts(empty_dir)
+            os.remove(os.path.join(empty_dir, "mid", "artifacts", "random_forest_model.pkl"))
+            phases = {inference[1] for _, inference, _ in score_all_students(self.db, empty_dir)}
+
+        self.assertEqual(phases, {"early", "final"})
+
+if __name__ == '__main__':
+    unittest.main()
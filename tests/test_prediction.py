@@ -0,0 +1,66 @@
+import unittest
+import tempfile
+import pandas as pd
+
+from models.utils.system.artifact_registry import artifact_registry
+from models.utils.system.prediction import predict_student, predict_students, select_phase
+from tests.utils import build_phase_artifacts, make_student
+
+class TestBatchPrediction(unittest.TestCase):
+    """Tests for predict_students against the single-row predict_student"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        cls.tmp_dir.cleanup()
+
+    def _cohort(self):
+        phases = ["early", "mid", "final"]
+        return [make_student(seed, phases[seed % 3]) for seed in range(30)]
+
+    def test_select_phase(self):
+        """Test phase selection from available fields"""
+        self.assertEqual(select_phase(make_student(1, "final")), "final")
+        self.assertEqual(select_phase(make_student(1, "mid")), "mid")
+        self.assertEqual(select_phase(make_student(1, "early")), "early")
+        with self.assertRaises(ValueError):
+            select_phase({"gender": 1})
+
+    def test_batch_matches_single_row(self):
+        """Test that batch scores and phases match predict_student exactly"""
+        cohort = self._cohort()
+        results = predict_students(cohort, base_model_dir=self.base_dir)
+
+        self.assertEqual(len(results), len(cohort))
+        for student, row in zip(cohort, results.itertuples()):
+            score, phase = predict_student(student, base_model_dir=self.base_dir, return_phase=True)
+            self.assertEqual(row.phase, phase)
+            self.assertEqual(row.probability, score)
+            self.assertIsNone(row.error)
+
+    def test_batch_accepts_dataframe(self):
+        """Test DataFrame input, with NaN treated as missing"""
+        cohort = self._cohort()
+        df = pd.DataFrame(cohort, index=[f"row{i}" for i in range(len(cohort))])
+        results = predict_students(df, base_model_dir=self.base_dir)
+
+        self.assertEqual(list(results.index), list(df.index))
+        self.assertEqual(list(results["phase"]), [select_phase(s) for s in cohort])
+
+    def test_batch_reports_unscorable_students(self):
+        """Test that students without enough data get an error instead of failing the batch"""
+        cohort = [make_student(1, "early"), {"gender": 1}]
+        results = predict_students(cohort, base_model_dir=self.base_dir)
+
+        self.assertEqual(results.iloc[0]["phase"], "early")
+        self.assertIsNone(results.iloc[1]["phase"])
+        self.assertIn("Not enough data", results.iloc[1]["error"])
+
+if __name__ == '__main__':
+    unittest.main()
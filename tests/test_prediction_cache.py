@@ -0,0 +1,44 @@
+import unittest
+import numpy as np
+
+from models.utils.system.prediction_cache import PredictionCache, hash_input
+
+class TestPredictionCache(unittest.TestCase):
+    """Tests for prediction memoization by input hash"""
+
+    def test_hash_ignores_numeric_types_and_extra_fields(self):
+        """Test that only the model features and their numeric values shape the hash"""
+        features = ["admission_grade", "gender"]
+        a = {"admission_grade": 140, "gender": 1, "first_name": "A"}
+        b = {"admission_grade": np.float64(140.0), "gender": np.int64(1), "first_name": "B"}
+        self.assertEqual(hash_input(a, features, "early"), hash_input(b, features, "early"))
+
+    def test_hash_changes_with_inputs_and_phase(self):
+        """Test that a changed value, feature order or phase gives a new hash"""
+        student = {"admission_grade": 140, "gender": 1}
+        base = hash_input(student, ["admission_grade", "gender"], "early")
+        self.assertNotEqual(base, hash_input({**student, "gender": 0}, ["admission_grade", "gender"], "early"))
+        self.assertNotEqual(base, hash_input(student, ["gender", "admission_grade"], "early"))
+        self.assertNotEqual(base, hash_input(student, ["admission_grade", "gender"], "mid"))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = PredictionCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_zero_size_disables_cache(self):
+        """Test that a cache of size 0 stores nothing"""
+        cache = PredictionCache(maxsize=0)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,10 +5,19 @@ import pandas as pd
 import os
 import pickle
 
-from models.utils.system.preprocessing import preprocess_row_for_inference
+import tempfile
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from models.utils.system.preprocessing import (
+    preprocess_row_for_inference, preprocess_batch_for_inference, compile_preprocessing_plan
+)
+from models.utils.system.artifact_registry import artifact_registry
 
 class TestPreprocessing(unittest.TestCase):
     """Tests for the preprocessing.py module"""
+
+    def setUp(self):
+        artifact_registry.clear()
     
     @patch('pickle.load')
     @patch('builtins.open', new_callable=mock_open)
@@ -254,5 +263,65 @@ class TestPreprocessing(unittest.TestCase):
         self.assertNotIn('target', result.columns)
         self.assertNotIn('original_index', result.columns)
 
+class TestPreprocessingPlan(unittest.TestCase):
+    """Tests for the compiled, vectorized preprocessing plan"""
+
+    def setUp(self):
+        artifact_registry.clear()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model_dir = self.tmp_dir.name
+
+        train = pd.DataFrame({
+            'age': [18, 22, 30, 41],
+            'gender': ['F', 'M', 'F', 'M'],
+            'course_grade': [12.5, 14.0, 9.5, 16.0],
+        })
+        encoder = LabelEncoder().fit(train['gender'].astype(str))
+        scaler = StandardScaler().fit(train[['age', 'course_grade']])
+        with open(os.path.join(self.model_dir, 'label_encoders.pkl'), 'wb') as f:
+            pickle.dump({'gender': encoder}, f)
+        with open(os.path.join(self.model_dir, 'scaler.pkl'), 'wb') as f:
+            pickle.dump(scaler, f)
+
+        self.model = MagicMock()
+        self.model.feature_names_in_ = np.array(['age', 'gender', 'course_grade'])
+
+    def tearDown(self):
+        artifact_registry.clear()
+        self.tmp_dir.cleanup()
+
+    def test_batch_matches_row_function(self):
+        """Test that the batch transform reproduces preprocess_row_for_inference row by row"""
+        rows = [
+            {'age': 20, 'gender': 'F', 'course_grade': 11.0},
+            {'age': 35, 'gender': 'M', 'course_grade': 15.5, 'extra_field': 'x'},
+            {'age': 19, 'gender': 'Unknown', 'course_grade': 8.0, 'target': 1},
+        ]
+        batch = preprocess_batch_for_inference(rows, self.model_dir, self.model)
+
+        self.assertEqual(list(batch.columns), ['age', 'gender', 'course_grade'])
+        for i, row in enumerate(rows):
+            expected = preprocess_row_for_inference(row, self.model_dir, self.model)
+            np.testing.assert_array_equal(batch.iloc[[i]].to_numpy(), expected.to_numpy(dtype=float))
+
+        # Unknown categories fall back to -1
+        self.assertEqual(batch['gender'].iloc[2], -1)
+
+    def test_batch_accepts_dataframe(self):
+        """Test that DataFrame input gives the same result as a list of dicts"""
+        rows = [{'age': 20 + i, 'gender': 'FM'[i % 2], 'course_grade': 10.0 + i} for i in range(10)]
+        from_dicts = preprocess_batch_for_inference(rows, self.model_dir, self.model)
+        from_frame = preprocess_batch_for_inference(pd.DataFrame(rows), self.model_dir, self.model)
+        pd.testing.assert_frame_equal(from_dicts, from_frame)
+
+    def test_plan_is_compiled_once(self):
+        """Test that encoders are compiled into lookup tables once, not per value"""
+        plan = compile_preprocessing_plan(self.model_dir, self.model)
+
+        self.assertIs(plan, compile_preprocessing_plan(self.model_dir, self.model))
+        self.assertEqual(plan.kinds, ['numeric', 'categorical', 'numeric'])
+        self.assertEqual(plan.lookups['gender'], {'F': 0, 'M': 1})
+        self.assertTrue(plan.scaled[0] and plan.scaled[2] and not plan.scaled[1])
+
 if __name__ == '__main__':
-    unittest.main() 
\ No newline at end of file
+    unittest.main()
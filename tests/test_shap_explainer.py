@@ -6,20 +6,31 @@ import shap
 import os
 import pytest
 
-from models.utils.system.shap_explainer import explain_student
+import tempfile
+
+from models.utils.system.shap_explainer import explain_student, explain_students, get_tree_explainer, get_explainer, LinearShapExplainer
+from models.utils.system.shap_explainer import get_background_mean, get_error_bound, explain_matrix, top_drivers
+from models.utils.system.artifact_registry import artifact_registry
+from models.utils.system.prediction import align_student_input
+from models.utils.system.preprocessing import preprocess_row_for_inference
+from tests.utils import build_phase_artifacts, make_student
 
 class TestShapExplainer(unittest.TestCase):
     """Tests for the SHAP explainer module"""
+
+    def setUp(self):
+        # Models loaded through mocks must not leak between tests
+        artifact_registry.clear()
     
     @pytest.mark.skip(reason="Replaced by test_explain_student_final_phase_impl")
     @patch('os.path.exists')
     @patch('pickle.load')
     @patch('builtins.open', new_callable=mock_open)
-    @patch('models.utils.system.shap_explainer.preprocess_row_for_inference')
+    @patch('models.utils.system.shap_explainer.preprocess_batch_for_inference')
     @patch('shap.TreeExplainer')
-    @patch('models.utils.system.shap_explainer.FINAL_FIELDS', ['student_number', 'first_name', 'last_name', 'marital_status', 'previous_qualification_grade', 'admission_grade', 'displaced', 'debtor', 'tuition_fees_up_to_date', 'gender', 'scholarship_holder', 'age_at_enrollment', 'curricular_units_1st_sem_enrolled', 'curricular_units_1st_sem_approved', 'curricular_units_1st_sem_grade', 'curricular_units_2nd_sem_grade'])
-    @patch('models.utils.system.shap_explainer.MID_FIELDS', ['student_number', 'curricular_units_1st_sem_approved', 'curricular_units_1st_sem_grade'])
-    @patch('models.utils.system.shap_explainer.EARLY_FIELDS', ['student_number', 'first_name', 'last_name', 'marital_status', 'previous_qualification_grade', 'admission_grade', 'displaced', 'debtor', 'tuition_fees_up_to_date', 'gender', 'scholarship_holder', 'age_at_enrollment', 'curricular_units_1st_sem_enrolled'])
+    @patch('models.utils.system.prediction.FINAL_FIELDS', ['student_number', 'first_name', 'last_name', 'marital_status', 'previous_qualification_grade', 'admission_grade', 'displaced', 'debtor', 'tuition_fees_up_to_date', 'gender', 'scholarship_holder', 'age_at_enrollment', 'curricular_units_1st_sem_enrolled', 'curricular_units_1st_sem_approved', 'curricular_units_1st_sem_grade', 'curricular_units_2nd_sem_grade'])
+    @patch('models.utils.system.prediction.MID_FIELDS', ['student_number', 'curricular_units_1st_sem_approved', 'curricular_units_1st_sem_grade'])
+    @patch('models.utils.system.prediction.EARLY_FIELDS', ['student_number', 'first_name', 'last_name', 'marital_status', 'previous_qualification_grade', 'admission_grade', 'displaced', 'debtor', 'tuition_fees_up_to_date', 'gender', 'scholarship_holder', 'age_at_enrollment', 'curricular_units_1st_sem_enrolled'])
     def test_explain_student_final_phase(self):
         """Test explaining a student in the final phase"""
         self.test_explain_student_final_phase_impl()
@@ -47,21 +58,21 @@ class TestShapExplainer(unittest.TestCase):
         }
         
         # Use context managers for patching
-        with patch('models.utils.system.shap_explainer.EARLY_FIELDS', 
+        with patch('models.utils.system.prediction.EARLY_FIELDS', 
                   ['student_number', 'first_name', 'last_name', 'marital_status', 
                    'previous_qualification_grade', 'admission_grade', 'displaced', 
                    'debtor', 'tuition_fees_up_to_date', 'gender', 'scholarship_holder', 
                    'age_at_enrollment', 'curricular_units_1st_sem_enrolled']), \
-             patch('models.utils.system.shap_explainer.MID_FIELDS', 
+             patch('models.utils.system.prediction.MID_FIELDS', 
                   ['student_number', 'curricular_units_1st_sem_approved', 
                    'curricular_units_1st_sem_grade']), \
-             patch('models.utils.system.shap_explainer.FINAL_FIELDS', 
+             patch('models.utils.system.prediction.FINAL_FIELDS', 
                   ['student_number', 'curricular_units_1st_sem_approved', 
                    'curricular_units_1st_sem_grade', 'curricular_units_2nd_sem_grade']), \
              patch('os.path.exists', return_value=True), \
              patch('builtins.open', mock_open()) as mock_file_open, \
              patch('pickle.load') as mock_pickle_load, \
-             patch('models.utils.system.shap_explainer.preprocess_row_for_inference') as mock_preprocess, \
+             patch('models.utils.system.shap_explainer.preprocess_batch_for_inference') as mock_preprocess, \
              patch('shap.TreeExplainer') as mock_tree_explainer:
                 
             # Mock model
@@ -119,21 +130,21 @@ class TestShapExplainer(unittest.TestCase):
         }
         
         # Use context managers for patching instead of decorators
-        with patch('models.utils.system.shap_explainer.EARLY_FIELDS', 
+        with patch('models.utils.system.prediction.EARLY_FIELDS', 
                   ['student_number', 'first_name', 'last_name', 'marital_status', 
                    'previous_qualification_grade', 'admission_grade', 'displaced', 
                    'debtor', 'tuition_fees_up_to_date', 'gender', 'scholarship_holder', 
                    'age_at_enrollment', 'curricular_units_1st_sem_enrolled']), \
-             patch('models.utils.system.shap_explainer.MID_FIELDS', 
+             patch('models.utils.system.prediction.MID_FIELDS', 
                   ['student_number', 'curricular_units_1st_sem_approved', 
                    'curricular_units_1st_sem_grade']), \
-             patch('models.utils.system.shap_explainer.FINAL_FIELDS', 
+             patch('models.utils.system.prediction.FINAL_FIELDS', 
                   ['student_number', 'curricular_units_1st_sem_approved', 
                    'curricular_units_1st_sem_grade', 'curricular_units_2nd_sem_grade']), \
              patch('os.path.exists', return_value=True), \
              patch('builtins.open', mock_open()) as mock_file_open, \
              patch('pickle.load') as mock_pickle_load, \
-             patch('models.utils.system.shap_explainer.preprocess_row_for_inference') as mock_preprocess, \
+             patch('models.utils.system.shap_explainer.preprocess_batch_for_inference') as mock_preprocess, \
              patch('shap.TreeExplainer') as mock_tree_explainer:
                 
             # Mock model
@@ -189,21 +200,21 @@ class TestShapExplainer(unittest.TestCase):
         }
         
         # Use context managers for patching instead of decorators
-        with patch('models.utils.system.shap_explainer.EARLY_FIELDS', 
+        with patch('models.utils.system.prediction.EARLY_FIELDS', 
                   ['student_number', 'first_name', 'last_name', 'marital_status', 
                    'previous_qualification_grade', 'admission_grade', 'displaced', 
                    'debtor', 'tuition_fees_up_to_date', 'gender', 'scholarship_holder', 
                    'age_at_enrollment', 'curricular_units_1st_sem_enrolled']), \
-             patch('models.utils.system.shap_explainer.MID_FIELDS', 
+             patch('models.utils.system.prediction.MID_FIELDS', 
                   ['student_number', 'curricular_units_1st_sem_approved', 
                    'curricular_units_1st_sem_grade']), \
-             patch('models.utils.system.shap_explainer.FINAL_FIELDS', 
+             patch('models.utils.system.prediction.FINAL_FIELDS', 
                   ['student_number', 'curricular_units_1st_sem_approved', 
                    'curricular_units_1st_sem_grade', 'curricular_units_2nd_sem_grade']), \
              patch('os.path.exists', return_value=True), \
              patch('builtins.open', mock_open()) as mock_file_open, \
              patch('pickle.load') as mock_pickle_load, \
-             patch('models.utils.system.shap_explainer.preprocess_row_for_inference') as mock_preprocess, \
+             patch('models.utils.system.shap_explainer.preprocess_batch_for_inference') as mock_preprocess, \
              patch('shap.TreeExplainer') as mock_tree_explainer:
                 
             # Mock model
@@ -249,12 +260,11 @@ class TestShapExplainer(unittest.TestCase):
         
         # Use multiple patches to fully control the execution
         mock_open_instance = mock_open()
-        with patch('models.utils.system.shap_explainer.EARLY_FIELDS', ['student_number']), \
+        with patch('models.utils.system.prediction.EARLY_FIELDS', ['student_number']), \
              patch('os.path.exists', return_value=True), \
              patch('builtins.open', mock_open_instance), \
              patch('pickle.load') as mock_load, \
-             patch('models.utils.system.shap_explainer.preprocess_row_for_inference') as mock_preprocess, \
-             patch('models.utils.system.shap_explainer._model_cache', {}), \
+             patch('models.utils.system.shap_explainer.preprocess_batch_for_inference') as mock_preprocess, \
              patch('shap.TreeExplainer') as mock_explainer:
             
             # Set up mock returns
@@ -314,7 +324,7 @@ class TestShapExplainer(unittest.TestCase):
         }
         
         # Use patching context manager for better control
-        with patch('models.utils.system.shap_explainer.EARLY_FIELDS', ['student_number', 'gender', 'age_at_enrollment']), \
+        with patch('models.utils.system.prediction.EARLY_FIELDS', ['student_number', 'gender', 'age_at_enrollment']), \
              patch('os.path.exists', return_value=False):
             
             # Call the function and check for FileNotFoundError
@@ -334,13 +344,12 @@ class TestShapExplainer(unittest.TestCase):
         }
         
         # Use context managers for patching instead of decorators
-        with patch('models.utils.system.shap_explainer.EARLY_FIELDS', 
+        with patch('models.utils.system.prediction.EARLY_FIELDS', 
                   ['student_number', 'gender', 'age_at_enrollment']), \
-             patch('models.utils.system.shap_explainer._model_cache', {}), \
              patch('os.path.exists', return_value=True), \
              patch('builtins.open', mock_open()) as mock_file_open, \
              patch('pickle.load') as mock_pickle_load, \
-             patch('models.utils.system.shap_explainer.preprocess_row_for_inference') as mock_preprocess, \
+             patch('models.utils.system.shap_explainer.preprocess_batch_for_inference') as mock_preprocess, \
              patch('shap.TreeExplainer') as mock_tree_explainer:
                 
             # Mock model
@@ -369,8 +378,8 @@ class TestShapExplainer(unittest.TestCase):
             # Assertions
             self.assertIsInstance(result, dict)
             self.assertEqual(len(result), 2)
-            self.assertEqual(result['feature1'], 0.1)
-            self.assertEqual(result['feature2'], 0.2)
+            self.assertEqual(result['feature1'], 0.3)
+            self.assertEqual(result['feature2'], 0.4)
             
             # The file should be opened at least once with a path containing "early"
             # Check for any call containing the path pattern
@@ -385,5 +394,193 @@ class TestShapExplainer(unittest.TestCase):
             self.assertTrue(found_call, "Expected file path not found in open() calls")
 
 
+class TestBatchShapExplainer(unittest.TestCase):
+    """Tests for the cached explainer and explain_students on real (synthetic) forests"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        cls.tmp_dir.cleanup()
+
+    def test_explainer_is_cached_per_phase(self):
+        """Test that one TreeExplainer is built per phase and reused"""
+        artifact_registry.clear()
+        with patch('shap.TreeExplainer', wraps=shap.TreeExplainer) as mock_tree_explainer:
+            first = get_tree_explainer("mid", self.base_dir)
+            second = get_tree_explainer("mid", self.base_dir)
+            get_tree_explainer("early", self.base_dir)
+
+        self.assertIs(first, second)
+        self.assertEqual(mock_tree_explainer.call_count, 2)
+
+    def test_batch_matches_single_row(self):
+        """Test that explain_students returns the same dicts as explain_student"""
+        phases = ["early", "mid", "final"]
+        cohort = [make_student(seed, phases[seed % 3]) for seed in range(12)]
+        results = explain_students(cohort, base_model_dir=self.base_dir)
+
+        for student, row in zip(cohort, results.itertuples()):
+            expected = explain_student(student, base_model_dir=self.base_dir)
+            self.assertEqual(set(row.shap_values), set(expected))
+            for feature, value in expected.items():
+                self.assertAlmostEqual(row.shap_values[feature], value, places=10)
+            self.assertIsNone(row.error)
+
+    def test_batch_reports_unexplainable_students(self):
+        """Test that students without enough data get an error instead of failing the batch"""
+        results = explain_students([make_student(3, "early"), {"gender": 1}], base_model_dir=self.base_dir)
+
+        self.assertEqual(results.iloc[0]["phase"], "early")
+        self.assertIsInstance(results.iloc[0]["shap_values"], dict)
+        self.assertIn("Not enough data", results.iloc[1]["error"])
+
+
+class TestLinearShapExplainer(unittest.TestCase):
+    """Tests for closed-form SHAP when a phase is configured to serve logistic regression"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        artifact_registry.clear()
+        config = {"model": {"families": {"early": "logistic_regression", "mid": "logistic_regression"}}}
+        patcher = patch('models.utils.system.model_config.CONFIG', config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_configured_family_selects_explainer(self):
+        """Test that the explainer follows the per-phase model family"""
+        self.assertIsInstance(get_explainer("mid", self.base_dir), LinearShapExplainer)
+        self.assertIsInstance(get_explainer("final", self.base_dir), shap.TreeExplainer)
+
+    def test_values_add_up_to_log_odds(self):
+        """Test that linear SHAP values sum to the model's log-odds minus the expected value"""
+        students = [make_student(seed, "mid") for seed in range(5)]
+        results = explain_students(students, base_model_dir=self.base_dir)
+
+        model = artifact_registry.load_model("mid", self.base_dir)
+        explainer = get_explainer("mid", self.base_dir)
+        for student, row in zip(students, results.itertuples()):
+            self.assertEqual(row.phase, "mid")
+            self.assertEqual(set(row.shap_values), set(model.feature_names_in_))
+            values = [row.shap_values[f] for f in model.feature_names_in_]
+            x = align_student_input(student, list(model.feature_names_in_), "mid", "test")
+            preprocessed = preprocess_row_for_inference(x, os.path.join(self.base_dir, "mid", "artifacts"), model)
+            log_odds = model.decision_function(preprocessed)[0]
+            self.assertAlmostEqual(sum(values) + explainer.expected_value, log_odds, places=10)
+
+    def test_background_mean_defaults_to_zero(self):
+        """Test that standardised features use a zero background when no training matrix is shipped"""
+        explainer = get_explainer("early", self.base_dir)
+        np.testing.assert_array_equal(explainer.background_mean, np.zeros(len(explainer.coef)))
+
+    def test_background_mean_from_training_matrix(self):
+        """Test that the background mean is read from X_train.csv in model column order"""
+        with tempfile.TemporaryDirectory() as base_dir:
+            ready_dir = os.path.join(base_dir, "mid", "data", "ready")
+            os.makedirs(ready_dir)
+            pd.DataFrame({"b": [1.0, 3.0], "a": [10.0, 20.0]}).to_csv(os.path.join(ready_dir, "X_train.csv"), index=False)
+
+            mean = get_background_mean("mid", ["a", "b", "c"], base_dir)
+
+        np.testing.assert_array_equal(mean, [15.0, 2.0, 0.0])
+
+
+class TestApproximateShap(unittest.TestCase):
+    """Tests for the Saabas and sampled-tree explanation modes"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir, n_estimators=20)
+        cls.cohort = [make_student(seed, "mid") for seed in range(10)]
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        cls.tmp_dir.cleanup()
+
+    def test_saabas_is_additive(self):
+        """Test that Saabas attributions sum to the same total as exact SHAP"""
+        for student in self.cohort:
+            exact = explain_student(student, base_model_dir=self.base_dir)
+            approximate = explain_student(student, base_model_dir=self.base_dir, mode="saabas")
+            self.assertEqual(set(approximate), set(exact))
+            self.assertAlmostEqual(sum(approximate.values()), sum(exact.values()), places=10)
+
+    def test_error_bound_covers_calibration_sample(self):
+        """Test that the reported bound is the max abs error against exact SHAP"""
+        for mode in ["saabas", "sampled"]:
+            results = explain_students(self.cohort, base_model_dir=self.base_dir, mode=mode)
+            exact = explain_students(self.cohort, base_model_dir=self.base_dir)
+            errors = [abs(row.shap_values[f] - expected.shap_values[f])
+                      for row, expected in zip(results.itertuples(), exact.itertuples()) for f in row.shap_values]
+            # Without X_train.csv the first batch explained is the calibration sample
+            self.assertAlmostEqual(results.iloc[0]["shap_error_bound"], max(errors), places=12)
+
+    def test_error_bound_from_training_matrix(self):
+        """Test that the calibration sample is drawn from X_train.csv when shipped"""
+        model = artifact_registry.load_model("final", self.base_dir)
+        columns = list(model.feature_names_in_)
+        ready_dir = os.path.join(self.base_dir, "final", "data", "ready")
+        os.makedirs(ready_dir, exist_ok=True)
+        pd.DataFrame(np.random.default_rng(0).normal(size=(30, len(columns))), columns=columns).to_csv(
+            os.path.join(ready_dir, "X_train.csv"), index=False)
+
+        bound = get_error_bound("final", self.base_dir, model=model, mode="saabas")
+
+        self.assertEqual(bound["calibration_rows"], 30)
+        self.assertLessEqual(bound["p95_abs_error"], bound["max_abs_error"])
+
+    def test_exact_mode_reports_no_error(self):
+        """Test that exact explanations carry a zero error bound"""
+        shap_values, error_bound = explain_student(self.cohort[0], base_model_dir=self.base_dir, return_error_bound=True)
+        self.assertEqual(error_bound, 0.0)
+
+    def test_unknown_mode(self):
+        """Test that an unknown SHAP mode is rejected"""
+        with self.assertRaises(ValueError) as context:
+            explain_matrix(pd.DataFrame({"a": [1.0]}), "mid", self.base_dir, mode="fast")
+        self.assertIn("Unsupported SHAP mode", str(context.exception))
+
+class TestClassContributions(unittest.TestCase):
+    """Tests for normalising the explainer output shapes to class 1 contributions"""
+
+    def test_every_output_shape_selects_class_1(self):
+        """Test that per-class lists, 3-D arrays and plain matrices all yield the class 1 values"""
+        df = pd.DataFrame({"a": [0.5, 1.5], "b": [0.7, 0.1]})
+        class0, class1 = np.array([[-0.1, -0.2], [-0.3, -0.4]]), np.array([[0.1, 0.2], [0.3, 0.4]])
+        explainer = MagicMock()
+        for output in ([class0, class1], np.stack([class0, class1], axis=2), class1):
+            explainer.shap_values.return_value = output
+            self.assertEqual(explain_matrix(df, "mid", explainer=explainer),
+                             [{"a": 0.1, "b": 0.2}, {"a": 0.3, "b": 0.4}])
+
+class TestTopDrivers(unittest.TestCase):
+    """Tests for the compact SHAP driver summary"""
+
+    def test_largest_magnitudes_keep_their_sign(self):
+        """Test that drivers are ranked by absolute contribution and keep their sign"""
+        shap_values = {"a": 0.1, "b": -0.5, "c": 0.3, "d": -0.05}
+        self.assertEqual(top_drivers(shap_values, k=2), [{"feature": "b", "value": -0.5}, {"feature": "c", "value": 0.3}])
+        self.assertEqual(len(top_drivers(shap_values, k=10)), 4)
+        self.assertEqual(len(top_drivers(shap_values)), 4)  # default k (5) exceeds the feature count
+        self.assertIsNone(top_drivers(None))
+
 if __name__ == '__main__':
-    unittest.main() 
\ No newline at end of file
+    unittest.main()
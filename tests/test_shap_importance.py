@@ -0,0 +1,158 @@
+import unittest
+import tempfile
+from collections import defaultdict
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from db.database import Base
+from db.models import Student, RiskPrediction, ShapImportance
+from api.routes.prediction import score_all_students, predict_and_save
+from api.explanations import materialize_explanations
+from api.shap_importance import prediction_contribution, update_shap_importance, rebuild_shap_importance, get_shap_importance
+from models.utils.system.artifact_registry import artifact_registry
+from models.utils.system.prediction_cache import prediction_cache
+from tests.utils import make_student, build_phase_artifacts
+
+class TestShapImportance(unittest.TestCase):
+    """Tests for the running cohort SHAP importance aggregates"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_registry.clear()
+        prediction_cache.clear()
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        prediction_cache.clear()
+        engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+
+        phases = ["early", "mid", "final"]
+        self.students = [make_student(seed, phases[seed % 3]) for seed in range(9)]
+        for student in self.students:
+            self.db.add(Student(**student))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def _score(self, explain=True, force_update=False):
+        for student, inference, error in score_all_students(self.db, self.base_dir, explain=explain):
+            predict_and_save(student, self.db, force_update=force_update, notify=False, inference=inference)
+        self.db.commit()
+
+    def _assert_matches_full_scan(self, risk_level=None):
+        # Reference: the same means recomputed from every stored explanation
+        values = defaultdict(lambda: defaultdict(list))
+        for prediction in self.db.query(RiskPrediction).all():
+            if prediction.shap_values is not None and risk_level in (None, prediction.risk_level):
+                for feature, value in prediction.shap_values.items():
+                    values[prediction.model_phase][feature].append(value)
+
+        importance = get_shap_importance(self.db, risk_level=risk_level)
+        self.assertEqual(set(importance), set(values))
+        for phase, features in values.items():
+            self.assertEqual(list(importance[phase]), ["probability"])  # forests only, no cascade
+            phase_importance = importance[phase]["probability"]
+            served = {entry["feature"]: entry for entry in phase_importance["features"]}
+            self.assertEqual(set(served), set(features))
+            self.assertEqual(phase_importance["predictions"], len(next(iter(features.values()))))
+            for feature, feature_values in features.items():
+                self.assertAlmostEqual(served[feature]["mean_abs"], sum(map(abs, feature_values)) / len(feature_values), places=10)
+                self.assertAlmostEqual(served[feature]["mean_signed"], sum(feature_values) / len(feature_values), places=10)
+            mean_abs = [entry["mean_abs"] for entry in phase_importance["features"]]
+            self.assertEqual(mean_abs, sorted(mean_abs, reverse=True))
+
+    def test_eager_writes_update_aggregates(self):
+        """Test that saved explanations are aggregated per phase, overall and per risk level"""
+        self._score()
+        self._assert_matches_full_scan()
+        for risk_level in {p.risk_level for p in self.db.query(RiskPrediction).all()}:
+            self._assert_matches_full_scan(risk_level)
+
+    def test_lazy_rows_count_once_materialized(self):
+        """Test that pending rows contribute nothing until their explanations are filled"""
+        with patch('models.utils.system.inference.explain_matrix'):
+            self._score(explain=False)
+        self.assertEqual(get_shap_importance(self.db), {})
+
+        materialize_explanations(self.db, self.db.query(RiskPrediction).all(), self.base_dir)
+        self.db.commit()
+        self._assert_matches_full_scan()
+
+    def test_replaced_explanations_are_swapped_out(self):
+        """Test that re-scoring replaces a row's previous contribution instead of adding to it"""
+        self._score()
+        for student in self.db.query(Student).all():
+            student.admission_grade += 20
+        self.db.commit()
+        prediction_cache.clear()
+
+        self._score(force_update=True)
+        self._assert_matches_full_scan()
+
+        incremental = get_shap_importance(self.db)
+        self.assertEqual(rebuild_shap_importance(self.db), len(self.students))
+        self.db.commit()
+        rebuilt = get_shap_importance(self.db)
+        for phase in incremental:
+            served_phase, rebuilt_phase = incremental[phase]["probability"], rebuilt[phase]["probability"]
+            self.assertEqual(served_phase["predictions"], rebuilt_phase["predictions"])
+            for served, expected in zip(served_phase["features"], rebuilt_phase["features"]):
+                self.assertEqual(served["feature"], expected["feature"])
+                self.assertAlmostEqual(served["mean_abs"], expected["mean_abs"], places=10)
+
+    def test_bucket_move_empties_previous_bucket(self):
+        """Test that a prediction changing risk level leaves its old bucket empty and hidden"""
+        shap_values = {"admission_grade": -0.3, "debtor": 0.1}
+        update_shap_importance(self.db, added=[("early", "high", "probability", shap_values)])
+        update_shap_importance(self.db, removed=[("early", "high", "probability", shap_values)],
+                               added=[("early", "moderate", "probability", {"admission_grade": 0.2, "debtor": 0.1})])
+        self.db.commit()
+
+        emptied = self.db.query(ShapImportance).filter(ShapImportance.risk_level == "high").all()
+        self.assertTrue(all(row.count == 0 and row.sum_abs == 0.0 for row in emptied))
+        self.assertEqual(get_shap_importance(self.db, risk_level="high"), {})
+        self.assertEqual(get_shap_importance(self.db)["early"]["probability"], {
+            "predictions": 1,
+            "features": [{"feature": "admission_grade", "mean_abs": 0.2, "mean_signed": 0.2},
+                         {"feature": "debtor", "mean_abs": 0.1, "mean_signed": 0.1}]
+        })
+
+    def test_linear_explanations_kept_apart(self):
+        """Test that log-odds (screen tier) and probability explanations are never averaged together"""
+        screened = RiskPrediction(model_phase="mid", risk_level="high", scoring_tier="screen", shap_units="log_odds",
+                                  shap_values={"debtor": 2.0})
+        escalated = RiskPrediction(model_phase="mid", risk_level="high", scoring_tier="escalated", shap_units="probability",
+                                   shap_values={"debtor": 0.1})
+        self.assertEqual(prediction_contribution(screened)[2], "log_odds")
+        self.assertEqual(prediction_contribution(escalated)[2], "probability")
+
+        update_shap_importance(self.db, added=[prediction_contribution(screened), prediction_contribution(escalated)])
+        self.db.commit()
+        mid = get_shap_importance(self.db, phase="mid")["mid"]
+        self.assertEqual(mid["log_odds"]["features"], [{"feature": "debtor", "mean_abs": 2.0, "mean_signed": 2.0}])
+        self.assertEqual(mid["probability"]["features"], [{"feature": "debtor", "mean_abs": 0.1, "mean_signed": 0.1}])
+
+    def test_units_are_fixed_when_written(self):
+        """Test that a row leaves the bucket it was added to even after the phase's model family changes"""
+        self._score()
+        predictions = self.db.query(RiskPrediction).all()
+        self.assertTrue(all(p.shap_units == "probability" for p in predictions))
+
+        with patch('models.utils.system.model_config.get_model_family', return_value="logistic_regression"):
+            update_shap_importance(self.db, removed=[prediction_contribution(p) for p in predictions])
+        self.db.commit()
+        self.assertEqual(get_shap_importance(self.db), {})
+
+if __name__ == '__main__':
+    unittest.main()
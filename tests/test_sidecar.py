@@ -0,0 +1,146 @@
+import os
+import unittest
+import tempfile
+import threading
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from db.database import Base
+from api.routes.prediction import score_phase_batch
+
+from models.utils.system.inference import predict_and_explain_students, to_inference
+from models.utils.system.sidecar import (
+    InferenceSidecar, SidecarClient, SidecarError, encode_request, decode_request, encode_response, decode_response,
+    get_sidecar_client
+)
+from models.utils.system.warmup import warm_up
+from models.utils.system.artifact_registry import artifact_registry
+from models.utils.system.prediction_cache import prediction_cache
+from tests.utils import build_phase_artifacts, make_student
+
+class TestSidecar(unittest.TestCase):
+    """Tests for the Unix-socket inference sidecar"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.base_dir = cls.tmp_dir.name
+        build_phase_artifacts(cls.base_dir)
+        cls.socket_path = os.path.join(cls.base_dir, "sidecar.sock")
+        cls.server = InferenceSidecar(cls.socket_path, cls.base_dir, warm=False)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        artifact_registry.clear()
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        prediction_cache.clear()
+        self.client = SidecarClient(self.socket_path, timeout=60)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_protocol_round_trip(self):
+        """Test that requests and responses survive encoding unchanged"""
+        cohort = [make_student(seed, "mid") for seed in range(3)]
+        students, explain, shap_mode, forced_phase = decode_request(encode_request(cohort, False, "saabas", "mid"))
+        self.assertEqual((explain, shap_mode, forced_phase), (False, "saabas", "mid"))
+        for sent, received in zip(cohort, students):
+            self.assertEqual(set(received), set(sent))
+            for key, value in sent.items():
+                self.assertEqual(received[key], value)
+
+        results = predict_and_explain_students(cohort + [{"gender": 1}], base_model_dir=self.base_dir)
+        decoded, stats = decode_response(encode_response(results))
+        self.assertEqual(stats, {"scored_inputs": 3, "unique_inputs": 3})
+        for (inference, error), row in zip(decoded[:3], results.itertuples()):
+            self.assertIsNone(error)
+            self.assertEqual(inference, to_inference(row))
+        self.assertIsNone(decoded[3][0])
+        self.assertEqual(decoded[3][1], results.iloc[3]["error"])
+
+    def test_batch_matches_in_process(self):
+        """Test that a mixed-phase batch through the sidecar matches in-process inference"""
+        phases = ["early", "mid", "final"]
+        cohort = [make_student(seed, phases[seed % 3]) for seed in range(6)]
+        decoded, stats = self.client.batch(cohort)
+        prediction_cache.clear()
+        expected = predict_and_explain_students(cohort, base_model_dir=self.base_dir)
+        self.assertEqual(stats["scored_inputs"], 6)
+        for (inference, error), row in zip(decoded, expected.itertuples()):
+            self.assertIsNone(error)
+            self.assertEqual(inference, to_inference(row))
+
+    def test_score_skips_shap(self):
+        """Test that the score operation returns a probability without SHAP values"""
+        student = make_student(1, "final")
+        scored = self.client.score(student)
+        explained = self.client.explain(student)
+        self.assertIsNone(scored.shap_values)
+        self.assertEqual(scored.probability, explained.probability)
+        self.assertTrue(explained.shap_values)
+
+    def test_incomplete_student_raises(self):
+        """Test that a student without enough data fails with a ValueError, and the connection stays usable"""
+        with self.assertRaises(ValueError):
+            self.client.explain({"gender": 1})
+        self.assertEqual(self.client.score(make_student(2, "early")).phase, "early")
+
+    def test_status_reports_sidecar_warm_up(self):
+        """Test that the status operation returns the sidecar's own warm-up state"""
+        status = self.client.status()
+        self.assertFalse(status["ready"])
+        self.assertFalse(status["started"])
+
+        warm_up(self.base_dir, state=self.server.warmup_state)
+        status = self.client.status()
+        self.assertTrue(status["ready"])
+        self.assertEqual(status["phases"], {"final": "ready", "mid": "ready", "early": "ready"})
+
+    def test_client_requires_existing_socket(self):
+        """Test that no client is returned when the sidecar is not configured or not running"""
+        self.assertIsNone(get_sidecar_client({"inference": {}}))
+        missing = os.path.join(self.base_dir, "missing.sock")
+        self.assertIsNone(get_sidecar_client({"inference": {"sidecar_socket": missing}}))
+        client = get_sidecar_client({"inference": {"sidecar_socket": self.socket_path}})
+        self.assertEqual(client.socket_path, self.socket_path)
+
+    def test_bulk_chunks_and_falls_back_on_error_frames(self):
+        """Test that bulk cohorts go out in chunks, and a sidecar error only moves the unanswered rest in-process"""
+        client, calls = self.client, []
+        real_batch = client.batch
+
+        def failing_second_chunk(students, **kwargs):
+            calls.append(len(students))
+            if len(calls) == 2:
+                raise SidecarError("FileNotFoundError: missing artifact")
+            return real_batch(students, **kwargs)
+
+        engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        cohort = [make_student(seed, "mid") for seed in range(5)]
+        with patch("api.routes.prediction.get_sidecar_client", return_value=client), \
+                patch("api.routes.prediction.get_inference_config", return_value={"sidecar_batch_size": 2}), \
+                patch.object(client, "batch", side_effect=failing_second_chunk):
+            inferences, stats = score_phase_batch(db, cohort, "mid", self.base_dir)
+        db.close()
+
+        self.assertEqual(calls, [2, 2])
+        self.assertEqual(stats["scored_inputs"], 5)
+        prediction_cache.clear()
+        expected = predict_and_explain_students(cohort, base_model_dir=self.base_dir, forced_phase="mid")
+        self.assertEqual(len(inferences), len(cohort))
+        for (inference, error), row in zip(inferences, expected.itertuples()):
+            self.assertIsNone(error)
+            self.assertAlmostEqual(inference.probability, row.probability, places=12)
+
+if __name__ == "__main__":
+    unittest.main()
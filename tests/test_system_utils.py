@@ -11,6 +11,7 @@ from models.utils.system.model_info import (
     get_model_path, get_test_data_path, load_model, 
     get_feature_importance, get_model_metrics, get_model_info
 )
+from models.utils.system.artifact_registry import artifact_registry
 
 class TestFormattingUtils(unittest.TestCase):
     """Tests for the formatting utilities"""
@@ -47,6 +48,9 @@ class TestFormattingUtils(unittest.TestCase):
 
 class TestModelInfoUtils(unittest.TestCase):
     """Tests for the model_info utilities"""
+
+    def setUp(self):
+        artifact_registry.clear()
     
     def test_get_model_path(self):
         """Test get_model_path function"""
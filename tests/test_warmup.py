@@ -0,0 +1,124 @@
+import os
+import pickle
+import tempfile
+import numpy as np
+import pandas as pd
+import unittest
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+
+from api.main import app
+from models.utils.system.artifact_registry import artifact_registry, get_artifact_dir, get_imputer_path
+from models.utils.system.shap_explainer import get_background_path, get_linear_explainer, get_mode_explainer, get_error_bound
+from models.utils.system.warmup import WarmupState, warm_up
+from tests.utils import build_phase_artifacts
+
+class TestWarmup(unittest.TestCase):
+    """Tests for startup warm-up and the readiness endpoint"""
+
+    def setUp(self):
+        artifact_registry.clear()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        build_phase_artifacts(self.tmp_dir.name)
+
+    def tearDown(self):
+        artifact_registry.clear()
+        self.tmp_dir.cleanup()
+
+    def test_warm_up_loads_every_phase(self):
+        """Test that warm-up marks every phase ready and fills the registry"""
+        state = WarmupState()
+        snapshot = warm_up(self.tmp_dir.name, state=state)
+
+        self.assertTrue(state.ready)
+        self.assertEqual(snapshot["phases"], {"final": "ready", "mid": "ready", "early": "ready"})
+        with patch('pickle.load') as mock_load:
+            artifact_registry.load_model("mid", self.tmp_dir.name)
+        mock_load.assert_not_called()
+
+    def test_warm_up_reports_missing_artifacts(self):
+        """Test that a missing model is reported per phase instead of raising"""
+        os.remove(os.path.join(self.tmp_dir.name, "final", "artifacts", "random_forest_model.pkl"))
+        state = WarmupState()
+        snapshot = warm_up(self.tmp_dir.name, state=state)
+
+        self.assertFalse(state.ready)
+        self.assertTrue(snapshot["finished"])
+        self.assertIn("Model not found", snapshot["phases"]["final"])
+        self.assertEqual(snapshot["phases"]["early"], "ready")
+
+    def test_warm_up_primes_configured_artifacts(self):
+        """Test that warm-up also loads the imputer, cascade screen and bulk approximate explainer the config uses"""
+        for phase in ("early", "mid", "final"):
+            model_dir = get_artifact_dir(phase, self.tmp_dir.name)
+            with open(get_imputer_path(model_dir), "wb") as f:
+                pickle.dump({"column_names": []}, f)
+            columns = artifact_registry.load_feature_names(model_dir)
+            os.makedirs(os.path.dirname(get_background_path(phase, self.tmp_dir.name)), exist_ok=True)
+            pd.DataFrame(np.random.RandomState(0).normal(size=(20, len(columns))), columns=columns) \
+                .to_csv(get_background_path(phase, self.tmp_dir.name), index=False)
+        artifact_registry.clear()
+
+        state = WarmupState()
+        with patch('models.utils.system.warmup.get_cascade_config', return_value={"enabled": True}), \
+                patch('models.utils.system.warmup.get_shap_config', return_value={"bulk_mode": "saabas"}):
+            warm_up(self.tmp_dir.name, state=state)
+        self.assertTrue(state.ready)
+
+        with patch('pickle.load') as mock_load, \
+                patch('models.utils.system.shap_explainer.LinearShapExplainer') as mock_linear, \
+                patch('models.utils.system.shap_explainer.SaabasExplainer') as mock_saabas, \
+                patch('models.utils.system.shap_explainer.get_calibration_sample') as mock_sample:
+            for phase in ("early", "mid", "final"):
+                artifact_registry.load(get_imputer_path(get_artifact_dir(phase, self.tmp_dir.name)))
+                get_linear_explainer(phase, self.tmp_dir.name)
+                get_mode_explainer(phase, self.tmp_dir.name, mode="saabas")
+                get_error_bound(phase, self.tmp_dir.name, mode="saabas")
+        for mock in (mock_load, mock_linear, mock_saabas, mock_sample):
+            mock.assert_not_called()
+
+    def test_readiness_endpoint(self):
+        """Test that /ready returns 503 until warm-up succeeds, then 200"""
+        state = WarmupState()
+        with patch('api.main.warmup_state', state):
+            client = TestClient(app)
+            response = client.get("/ready")
+            self.assertEqual(response.status_code, 503)
+            self.assertFalse(response.json()["ready"])
+
+            warm_up(self.tmp_dir.name, state=state)
+            response = client.get("/ready")
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()["ready"])
+
+    def test_lifespan_starts_warm_up(self):
+        """Test that application startup triggers warm-up"""
+        with patch('api.main.warm_up') as mock_warm_up:
+            with TestClient(app):
+                pass
+        mock_warm_up.assert_called_once()
+
+    def test_sidecar_replaces_in_process_warm_up(self):
+        """Test that with a sidecar configured, startup loads nothing and /ready forwards the sidecar's state"""
+        sidecar = MagicMock()
+        sidecar.status.return_value = {"ready": True, "started": True, "finished": True, "phases": {"mid": "ready"}}
+        with patch('api.main.get_inference_config', return_value={"sidecar_socket": "/tmp/edps.sock"}), \
+                patch('api.main.get_sidecar_client', return_value=sidecar), \
+                patch('api.main.warm_up') as mock_warm_up, \
+                patch('api.main.start_inference_service') as mock_service, \
+                patch('api.main.start_explanation_worker') as mock_worker:
+            with TestClient(app) as client:
+                response = client.get("/ready")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["sidecar"], "/tmp/edps.sock")
+
+                sidecar.status.side_effect = ConnectionRefusedError("refused")
+                response = client.get("/ready")
+                self.assertEqual(response.status_code, 503)
+                self.assertIn("ConnectionRefusedError", response.json()["error"])
+        mock_warm_up.assert_not_called()
+        mock_service.assert_not_called()
+        mock_worker.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
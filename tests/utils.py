@@ -15,4 +15,76 @@ def mock_explain_student(student_data):
     """
     Mock implementation of explain_student for testing.
     """
-    return {"feature1": 0.3, "feature2": -0.5}  # Mock SHAP values 
\ No newline at end of file
+    return {"feature1": 0.3, "feature2": -0.5}  # Mock SHAP values 
+
+# === Synthetic phase artifacts ===
+PHASE_FEATURES = {
+    "early": ["marital_status", "previous_qualification_grade", "admission_grade", "displaced", "debtor",
+              "tuition_fees_up_to_date", "gender", "scholarship_holder", "age_at_enrollment",
+              "curricular_units_1st_sem_enrolled"],
+}
+PHASE_FEATURES["mid"] = PHASE_FEATURES["early"] + ["curricular_units_1st_sem_approved", "curricular_units_1st_sem_grade"]
+PHASE_FEATURES["final"] = PHASE_FEATURES["mid"] + ["curricular_units_2nd_sem_grade"]
+
+
+def make_student(seed=0, phase="final"):
+    """
+    Builds a random but valid student record containing the fields of the given phase.
+    """
+    import random
+    rng = random.Random(seed)
+    student = {
+        "student_number": f"S{seed:05d}",
+        "first_name": "Test",
+        "last_name": f"Student{seed}",
+        "marital_status": rng.choice([1, 2]),
+        "previous_qualification_grade": round(rng.uniform(100, 180), 1),
+        "admission_grade": round(rng.uniform(100, 180), 1),
+        "displaced": rng.choice([0, 1]),
+        "debtor": rng.choice([0, 1]),
+        "tuition_fees_up_to_date": rng.choice([0, 1]),
+        "gender": rng.choice([0, 1]),
+        "scholarship_holder": rng.choice([0, 1]),
+        "age_at_enrollment": rng.randint(17, 40),
+        "curricular_units_1st_sem_enrolled": rng.randint(4, 8),
+        "curricular_units_1st_sem_approved": None,
+        "curricular_units_1st_sem_grade": None,
+        "curricular_units_2nd_sem_grade": None,
+    }
+    if phase in ("mid", "final"):
+        student["curricular_units_1st_sem_approved"] = rng.randint(0, student["curricular_units_1st_sem_enrolled"])
+        student["curricular_units_1st_sem_grade"] = round(rng.uniform(0, 18), 2)
+    if phase == "final":
+        student["curricular_units_2nd_sem_grade"] = round(rng.uniform(0, 18), 2)
+    return student
+
+
+def build_phase_artifacts(base_model_dir, n_samples=200, n_estimators=10, max_depth=5):
+    """
+    Trains small random forests and logistic regressions on synthetic data and writes them,
+    with their scaler and encoders, to <base_model_dir>/<phase>/artifacts exactly like the
+    training pipelines do.
+    """
+    import os
+    import pickle
+    import numpy as np
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+
+    for phase, features in PHASE_FEATURES.items():
+        raw = pd.DataFrame([make_student(seed, phase) for seed in range(n_samples)])[features]
+        y = (raw["admission_grade"] + np.random.RandomState(1).normal(0, 15, n_samples) > 140).astype(int)
+
+        scaler = StandardScaler().fit(raw)
+        X = pd.DataFrame(scaler.transform(raw), columns=features)
+        model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=42).fit(X, y)
+        logreg = LogisticRegression(max_iter=1000).fit(X, y)
+
+        artifact_dir = os.path.join(base_model_dir, phase, "artifacts")
+        os.makedirs(artifact_dir, exist_ok=True)
+        for name, obj in [("random_forest_model.pkl", model), ("logreg_model.pkl", logreg), ("scaler.pkl", scaler),
+                          ("label_encoders.pkl", {}), ("feature_names.pkl", features)]:
+            with open(os.path.join(artifact_dir, name), "wb") as f:
+                pickle.dump(obj, f)